@@ -0,0 +1,231 @@
+import pandas as pd
+
+# Resoluciones de los agregados OHLCV (minutos por barra)
+RESOLUTIONS = {"5m": 5, "15m": 15, "1h": 60, "1d": 1440}
+
+ROLLUP_TABLE = "stock_rollups"
+# first_ts/last_ts: primer y último minuto incluidos, para combinar barras que llegan tarde
+ROLLUP_COLUMNS = ["ticker", "resolution", "bucket", "open", "high", "low", "close", "volume", "first_ts", "last_ts"]
+
+def bucket_start(timestamps, resolution):
+    """Inicio del bucket (UTC) de cada timestamp para la resolución dada"""
+    return timestamps.dt.floor(f"{RESOLUTIONS[resolution]}min")
+
+def rollup_frame(df, resolution):
+    """
+    Agrega barras de 1 minuto (timestamp, open, high, low, close, volume[, ticker])
+    a la resolución pedida, de forma vectorizada. Devuelve bucket + OHLCV por ticker
+    """
+    keys = ["ticker", "bucket"] if "ticker" in df.columns else ["bucket"]
+    bars = df.assign(bucket=bucket_start(df["timestamp"], resolution)).sort_values("timestamp")
+
+    rolled = bars.groupby(keys, sort=True, observed=True).agg(
+        open=("open", "first"),
+        high=("high", "max"),
+        low=("low", "min"),
+        close=("close", "last"),
+        volume=("volume", "sum"),
+        first=("timestamp", "min"),
+        last=("timestamp", "max")
+    )
+    return rolled.reset_index()
+
+def complete_rollup_rows(bars, start, end, resolutions=tuple(RESOLUTIONS)):
+    """
+    Filas de stock_rollups calculadas desde cero con todas las barras de [start, end)
+    (p. ej. una ventana del relleno histórico). Solo se devuelven los buckets que caen
+    enteros dentro del rango, así que guardarlas con un upsert que sobrescribe es idempotente
+    """
+    rows = []
+    for resolution in resolutions:
+        width = pd.Timedelta(minutes=RESOLUTIONS[resolution])
+        rolled = rollup_frame(bars, resolution)
+        rolled = rolled[(rolled["bucket"] >= start) & (rolled["bucket"] + width <= end)]
+        if rolled.empty:
+            continue
+        rolled = rolled.assign(
+            ticker=rolled["ticker"].astype(object),
+            resolution=resolution,
+            bucket=rolled["bucket"].map(pd.Timestamp.isoformat),
+            volume=rolled["volume"].astype("int64"),
+            first_ts=rolled["first"].map(pd.Timestamp.isoformat),
+            last_ts=rolled["last"].map(pd.Timestamp.isoformat)
+        )
+        rows.extend(rolled[ROLLUP_COLUMNS].to_dict(orient="records"))
+    return rows
+
+def choose_resolution(start, end, max_bars=500):
+    """
+    Resolución más fina con la que el rango [start, end) cabe en `max_bars` barras
+    ('1m' = datos crudos), para que rangos largos cuesten un trabajo casi constante
+    """
+    span_minutes = (end - start) / pd.Timedelta(minutes=1)
+    if span_minutes <= max_bars:
+        return "1m"
+    for resolution, minutes in RESOLUTIONS.items():
+        if span_minutes / minutes <= max_bars:
+            return resolution
+    return "1d"
+
+def read_rollups(supabase, ticker, resolution, start=None, end=None):
+    """
+    Lee los agregados de un ticker a una resolución (orden cronológico)
+    """
+    query = supabase.table(ROLLUP_TABLE)\
+        .select("bucket, open, high, low, close, volume")\
+        .eq("ticker", ticker)\
+        .eq("resolution", resolution)
+    if start is not None:
+        query = query.gte("bucket", start.isoformat())
+    if end is not None:
+        query = query.lt("bucket", end.isoformat())
+    rows = query.order("bucket").execute().data
+
+    df = pd.DataFrame(rows, columns=["bucket", "open", "high", "low", "close", "volume"])
+    df["bucket"] = pd.to_datetime(df["bucket"], utc=True)
+    return df.rename(columns={"bucket": "timestamp"})
+
+class RollupStore:
+    """
+    Agregados OHLCV mantenidos de forma incremental por el worker de ingesta
+
+    Cada barra nueva de 1 minuto solo modifica el bucket que la contiene en cada
+    resolución (normalmente el bucket abierto); nunca se recalcula desde las barras
+    crudas. Los buckets modificados se guardan en Supabase (tabla stock_rollups)
+    con un upsert, y los buckets cerrados antiguos se liberan de memoria.
+    """
+
+    def __init__(self, resolutions=tuple(RESOLUTIONS), keep_buckets=2):
+        self.resolutions = list(resolutions)
+        self.keep_buckets = keep_buckets
+        self._buckets = {resolution: {} for resolution in self.resolutions}
+        self._dirty = set()
+
+    def _store(self, resolution, rows):
+        for row in rows:
+            bucket = pd.Timestamp(row["bucket"]).tz_convert("UTC")
+            self._buckets[resolution][(row["ticker"], bucket)] = {
+                "open": float(row["open"]),
+                "high": float(row["high"]),
+                "low": float(row["low"]),
+                "close": float(row["close"]),
+                "volume": int(row["volume"]),
+                "first": pd.Timestamp(row["first_ts"]).tz_convert("UTC"),
+                "last": pd.Timestamp(row["last_ts"]).tz_convert("UTC")
+            }
+
+    def _load(self, supabase, resolution, tickers, buckets=None, since=None):
+        query = supabase.table(ROLLUP_TABLE)\
+            .select(", ".join(ROLLUP_COLUMNS))\
+            .eq("resolution", resolution)\
+            .in_("ticker", list(tickers))
+        if buckets is not None:
+            query = query.in_("bucket", [b.isoformat() for b in buckets])
+        if since is not None:
+            query = query.gte("bucket", since.isoformat())
+        self._store(resolution, query.execute().data)
+
+    def seed(self, supabase, tickers, now=None):
+        """
+        Carga los buckets abiertos de cada resolución (una consulta por resolución)
+        para que el worker continúe los agregados tras un reinicio
+        """
+        now = now or pd.Timestamp.now(tz="UTC")
+        for resolution in self.resolutions:
+            since = now.floor(f"{RESOLUTIONS[resolution]}min")
+            self._load(supabase, resolution, tickers, since=since)
+
+    def update(self, bars, supabase=None):
+        """
+        Incorpora barras nuevas de 1 minuto (columnas ticker, timestamp, open, high, low,
+        close, volume). Solo se tocan los buckets que contienen esas barras; los que no
+        están en memoria (p. ej. huecos rellenados tarde) se leen antes de Supabase
+        Devuelve el número de buckets modificados
+        """
+        if bars.empty:
+            return 0
+
+        bars = bars.assign(timestamp=pd.to_datetime(bars["timestamp"], utc=True))
+        changed = 0
+
+        for resolution in self.resolutions:
+            buckets = self._buckets[resolution]
+            partials = rollup_frame(bars, resolution)
+
+            missing = [
+                (ticker, bucket) for ticker, bucket in zip(partials["ticker"], partials["bucket"])
+                if (ticker, bucket) not in buckets
+            ]
+            if missing and supabase is not None:
+                self._load(
+                    supabase, resolution,
+                    tickers={ticker for ticker, _ in missing},
+                    buckets={bucket for _, bucket in missing}
+                )
+
+            for partial in partials.itertuples(index=False):
+                key = (partial.ticker, partial.bucket)
+                current = buckets.get(key)
+
+                if current is None:
+                    buckets[key] = {
+                        "open": partial.open, "high": partial.high, "low": partial.low,
+                        "close": partial.close, "volume": int(partial.volume),
+                        "first": partial.first, "last": partial.last
+                    }
+                else:
+                    current["high"] = max(current["high"], partial.high)
+                    current["low"] = min(current["low"], partial.low)
+                    current["volume"] += int(partial.volume)
+                    if partial.first < current["first"]:
+                        current["open"], current["first"] = partial.open, partial.first
+                    if partial.last > current["last"]:
+                        current["close"], current["last"] = partial.close, partial.last
+
+                self._dirty.add((resolution, key))
+                changed += 1
+
+        return changed
+
+    def dirty_rows(self):
+        """Filas de stock_rollups pendientes de guardar"""
+        rows = []
+        for resolution, (ticker, bucket) in sorted(self._dirty, key=lambda item: (item[0], item[1][0], item[1][1])):
+            current = self._buckets[resolution][(ticker, bucket)]
+            rows.append({
+                "ticker": ticker,
+                "resolution": resolution,
+                "bucket": bucket.isoformat(),
+                "open": float(current["open"]),
+                "high": float(current["high"]),
+                "low": float(current["low"]),
+                "close": float(current["close"]),
+                "volume": int(current["volume"]),
+                "first_ts": current["first"].isoformat(),
+                "last_ts": current["last"].isoformat()
+            })
+        return rows
+
+    def flush(self, supabase, chunk_size=500):
+        """
+        Guarda los buckets modificados (upsert que sobrescribe) y libera los cerrados antiguos
+        Devuelve el número de filas escritas
+        """
+        rows = self.dirty_rows()
+        for start in range(0, len(rows), chunk_size):
+            supabase.table(ROLLUP_TABLE)\
+                .upsert(rows[start:start + chunk_size], on_conflict="ticker,resolution,bucket")\
+                .execute()
+        self._dirty.clear()
+        self.evict()
+        return len(rows)
+
+    def evict(self, now=None):
+        """Libera los buckets ya cerrados más antiguos que `keep_buckets` periodos"""
+        now = now or pd.Timestamp.now(tz="UTC")
+        for resolution in self.resolutions:
+            width = pd.Timedelta(minutes=RESOLUTIONS[resolution])
+            cutoff = now.floor(width) - self.keep_buckets * width
+            buckets = self._buckets[resolution]
+            for key in [key for key in buckets if key[1] < cutoff and (resolution, key) not in self._dirty]:
+                del buckets[key]
@@ -1,178 +1,17 @@
 import streamlit as st
-import pandas as pd
-import yfinance as yf
-import plotly.graph_objs as go
-from streamlit_autorefresh import st_autorefresh
-from supabase import create_client, Client
-from dotenv import load_dotenv, find_dotenv
+import logging
 import os
-from datetime import datetime, timedelta
 
-# Función para cargar variables de entorno de forma robusta
-def load_environment_variables():
-    """Carga las variables de entorno desde .env de forma segura"""
-    
-    # Obtener el directorio del script actual
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    env_path = os.path.join(script_dir, '.env')
-    
-    # Intentar múltiples métodos para cargar el .env
-    loaded = False
-    
-    # Método 1: Usar la ruta específica
-    if os.path.exists(env_path):
-        loaded = load_dotenv(dotenv_path=env_path)
-    
-    # Método 2: Usar find_dotenv() si el método 1 falla
-    if not loaded:
-        dotenv_path = find_dotenv()
-        if dotenv_path:
-            loaded = load_dotenv(dotenv_path)
-    
-    # Método 3: Buscar en el directorio actual
-    if not loaded:
-        current_dir_env = os.path.join(os.getcwd(), '.env')
-        if os.path.exists(current_dir_env):
-            loaded = load_dotenv(dotenv_path=current_dir_env)
-    
-    # Obtener variables
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_KEY")
-    
-    return url, key
+from arranque import StartupProfiler
 
-def safe_insert_to_supabase(supabase, data_row):
-    """
-    Función segura para insertar datos en Supabase
-    """
-    try:
-        # Convertir la fila a dictionary de forma segura
-        row_dict = data_row.to_dict()
-        
-        # Extraer timestamp correctamente
-        timestamp = row_dict.get('Datetime')
-        
-        # Verificar si el timestamp es válido
-        if timestamp is None or pd.isna(timestamp):
-            return False, f"Timestamp es None o NaN: {timestamp}"
-        
-        # Convertir timestamp a string ISO con zona horaria
-        try:
-            # Convertir a pandas datetime si no lo es ya
-            if not isinstance(timestamp, pd.Timestamp):
-                timestamp = pd.to_datetime(timestamp)
-            
-            # Asegurar que tenga zona horaria (UTC por defecto)
-            if timestamp.tz is None:
-                timestamp = timestamp.tz_localize('UTC')
-            
-            # Convertir a string ISO
-            timestamp_str = timestamp.isoformat()
-            
-        except Exception as e:
-            return False, f"Error al convertir timestamp: {str(e)}"
-        
-        # Preparar datos para inserción
-        insert_data = {
-            "ticker": "AAPL",
-            "timestamp": timestamp_str,
-            "open": float(row_dict.get('Open', 0)),
-            "high": float(row_dict.get('High', 0)),
-            "low": float(row_dict.get('Low', 0)),
-            "close": float(row_dict.get('Close', 0)),
-            "volume": int(row_dict.get('Volume', 0))
-        }
-        
-        # Validar que los datos no sean 0 o None
-        if all(insert_data[key] > 0 for key in ['open', 'high', 'low', 'close', 'volume']):
-            # Verificar si ya existe este registro (evitar duplicados)
-            existing = supabase.table("apple_stock_data")\
-                .select("id")\
-                .eq("timestamp", timestamp_str)\
-                .execute()
-            
-            if len(existing.data) > 0:
-                return True, "Registro ya existe (sin duplicar)"
-            
-            # Insertar en Supabase
-            result = supabase.table("apple_stock_data").insert(insert_data).execute()
-            return True, f"Inserción exitosa: {timestamp_str}"
-        else:
-            return False, f"Datos inválidos (valores cero): {insert_data}"
-            
-    except Exception as e:
-        return False, f"Error en inserción: {str(e)}"
-
-def insert_all_data_to_supabase(supabase, data):
-    """
-    Inserta TODOS los datos descargados en Supabase (no solo el último)
-    """
-    success_count = 0
-    error_count = 0
-    
-    for index, row in data.iterrows():
-        success, message = safe_insert_to_supabase(supabase, row)
-        if success:
-            success_count += 1
-        else:
-            error_count += 1
-    
-    return success_count, error_count
-
-def apply_global_filters(df, date_range, time_range, price_min, price_max, volume_min, volume_max):
-    """
-    Aplica filtros globales al DataFrame
-    """
-    filtered_df = df.copy()
-    
-    # Filtro por rango de fechas
-    if date_range:
-        filtered_df = filtered_df[
-            (filtered_df['timestamp'].dt.date >= date_range[0]) & 
-            (filtered_df['timestamp'].dt.date <= date_range[1])
-        ]
-    
-    # Filtro por horario
-    if time_range:
-        filtered_df = filtered_df[
-            (filtered_df['timestamp'].dt.time >= time_range[0]) & 
-            (filtered_df['timestamp'].dt.time <= time_range[1])
-        ]
-    
-    # Filtro por precio de cierre
-    if price_min is not None and price_max is not None:
-        filtered_df = filtered_df[
-            (filtered_df['close'] >= price_min) & 
-            (filtered_df['close'] <= price_max)
-        ]
-    
-    # Filtro por volumen
-    if volume_min is not None and volume_max is not None:
-        filtered_df = filtered_df[
-            (filtered_df['volume'] >= volume_min) & 
-            (filtered_df['volume'] <= volume_max)
-        ]
-    
-    return filtered_df
+logger = logging.getLogger(__name__)
 
-# Cargar variables de entorno
-url, key = load_environment_variables()
+@st.cache_resource
+def get_startup_profiler():
+    """Perfil del primer rerun del proceso: importaciones, shell y primer render"""
+    return StartupProfiler()
 
-# Verificar que las variables no sean None
-if not url or not key:
-    st.error("❌ Error de configuración: Variables de entorno no encontradas")
-    st.info("📝 Asegúrate de que existe un archivo .env con SUPABASE_URL y SUPABASE_KEY")
-    st.stop()
-
-# Crear conexión a Supabase
-try:
-    supabase: Client = create_client(url, key)
-except Exception as e:
-    st.error(f"❌ Error al conectar con Supabase: {e}")
-    st.stop()
-
-# Auto refrescar cada 60 segundos
-st_autorefresh(interval=60000, key="data_refresh")
+startup = get_startup_profiler()
 
 # Configurar página
 st.set_page_config(
@@ -181,72 +20,176 @@ st.set_page_config(
     layout="wide"
 )
 
-st.title("📊 Histórico de AAPL en Tiempo Real")
+# Página base (shell) antes de las importaciones pesadas y la primera carga de datos:
+# en un arranque en frío el navegador ya muestra algo mientras el resto se carga
+shell = st.empty()
+if "arranque_completo" not in st.session_state:
+    with shell.container():
+        st.title("📊 Histórico en Tiempo Real")
+        st.caption("⏳ Cargando datos…")
+startup.mark("shell")
+
+with startup.importing("pandas"):
+    import pandas as pd
+with startup.importing("plotly"):
+    import plotly.graph_objs as go
+from datetime import datetime, timedelta
 
-# 1) OPTIMIZACIÓN: Descargar solo los últimos 30 minutos de datos
+with startup.importing("modulos_del_proyecto"):
+    from agregados import choose_resolution, read_rollups, rollup_frame
+    from cache_local import CacheLocal
+    from cache_vistas import ViewCache, arrow_table, data_version, filter_key
+    from configuracion import get_supabase_client, load_tickers
+    from consultas import date_range_bounds, fetch_filtered, DEFAULT_ROW_BUDGET
+    from datos_compartidos import SharedFetcher
+    from filtros import apply_global_filters, TREND_OPTIONS
+    from graficas import (
+        build_line_figure, build_candlestick_figure, build_histogram_figure, payload_fingerprint, table_fingerprint,
+        DEFAULT_TARGET_POINTS
+    )
+    from indicadores import compute_indicators, IndicatorEngine
+    from ingesta import read_status, worker_health
+    from metricas import PipelineMetrics
+
+# Días hacia atrás que se pueden elegir en el filtro de fechas (consulta en el servidor)
+HISTORIAL_MAX_DIAS = 365
+
+# Segundos entre actualizaciones en vivo (rerun completo o solo el fragmento de datos)
+LIVE_REFRESH_S = 60
+
+@st.cache_resource
+def get_supabase():
+    """Cliente de Supabase único por proceso (sin leer .env ni crear el cliente en cada rerun)"""
+    with startup.importing("supabase"):
+        return get_supabase_client()
+
+@st.cache_resource
+def get_local_cache():
+    """Caché local única por proceso, compartida por todas las sesiones"""
+    return CacheLocal()
+
+@st.cache_resource
+def get_shared_fetcher(download):
+    """Descarga de Yahoo y lectura de Supabase una vez por intervalo, compartidas por todas las sesiones"""
+    return SharedFetcher(get_local_cache(), download=download)
+
+@st.cache_resource
+def get_view_cache():
+    """Filtrados, tablas y gráficas memoizados por (versión de los datos, filtros), para todas las sesiones"""
+    return ViewCache()
+
+@st.cache_resource
+def get_metrics():
+    """Métricas por etapa acumuladas entre reruns (p50/p95, errores, exportación)"""
+    return PipelineMetrics()
+
+@st.cache_resource
+def get_indicator_engine():
+    """Indicadores técnicos por ticker: las barras nuevas se añaden en streaming"""
+    return IndicatorEngine()
+
+# Crear conexión a Supabase (verifica que existan las variables de entorno)
 try:
-    # Reducir la cantidad de datos descargados
-    data = yf.download(tickers='AAPL', period='1d', interval='1m')
+    supabase = get_supabase()
+except ValueError:
+    shell.empty()
+    st.error("❌ Error de configuración: Variables de entorno no encontradas")
+    st.info("📝 Asegúrate de que existe un archivo .env con SUPABASE_URL y SUPABASE_KEY")
+    st.stop()
+except Exception as e:
+    shell.empty()
+    st.error(f"❌ Error al conectar con Supabase: {e}")
+    st.stop()
+
+# Modo de ingesta: por defecto el dashboard solo lee (INGESTA_EMBEBIDA=1 para descargar desde aquí)
+INGESTA_EMBEBIDA = os.getenv("INGESTA_EMBEBIDA", "0") == "1"
+
+# Métricas de esta ejecución: tiempo, filas y bytes por etapa
+metrics = get_metrics()
+# Una ejecución cortada (st.stop, st.rerun o una excepción) no llega al run.finish()
+# del final: se registra como interrumpida al empezar la siguiente de la sesión
+previous_run = st.session_state.get("metricas_ejecucion")
+if previous_run is not None and not previous_run.finished:
+    previous_run.finish(interrupted=True)
+run = metrics.start_run()
+st.session_state["metricas_ejecucion"] = run
+show_debug = st.sidebar.checkbox("🐞 Panel de diagnóstico", value=False, key="debug_panel")
+
+# Actualización en vivo por fragmentos: solo se vuelve a ejecutar la vista de datos
+# (st.fragment); sin ella, st_autorefresh vuelve a ejecutar el script entero
+live_updates = st.sidebar.checkbox("⚡ Actualización en vivo por fragmentos", value=True, key="live_updates")
+if not live_updates:
+    from streamlit_autorefresh import st_autorefresh
+
+    # Auto refrescar cada 60 segundos
+    st_autorefresh(interval=LIVE_REFRESH_S * 1000, key="data_refresh")
+
+# Selección de ticker (lista configurable con TICKERS o tickers.txt)
+tickers = load_tickers()
+ticker = st.selectbox("Ticker", options=tickers, key="ticker_select") if len(tickers) > 1 else tickers[0]
+
+shell.empty()
+st.title(f"📊 Histórico de {ticker} en Tiempo Real")
+
+# 1) Datos compartidos entre sesiones: una descarga por intervalo y ticker, no una por pestaña
+# (la ingesta la hace el worker, supabase/insertar_datos_yfinance.py; en modo embebido
+# el fetcher también descarga de Yahoo e inserta las últimas barras)
+shared_fetcher = get_shared_fetcher(INGESTA_EMBEBIDA)
+with run.stage("datos_compartidos") as sample:
+    snapshot = shared_fetcher.get(supabase, ticker, run=run)
+    sample["filas"] = len(snapshot.data)
+data = snapshot.yahoo
+df = snapshot.data
+
+if INGESTA_EMBEBIDA:
+    # Modo sin worker: mostrar el resultado de la última descarga compartida
+    if "descarga_yahoo" in snapshot.errors:
+        st.error(f"❌ Error al descargar datos de Yahoo Finance: {snapshot.errors['descarga_yahoo']}")
+        st.stop()
     
     # Verificar que los datos no estén vacíos
     if data.empty:
         st.warning("⚠️ No se pudieron obtener datos de Yahoo Finance")
         st.stop()
     
-    # CORRECCIÓN: Aplanar el MultiIndex de las columnas
-    if isinstance(data.columns, pd.MultiIndex):
-        # Aplanar las columnas del MultiIndex
-        data.columns = [col[0] for col in data.columns]
-    
-    # Resetear índice para obtener Datetime como columna
-    data = data.reset_index()
-    
-    # OPTIMIZACIÓN: Solo tomar los últimos 30 registros para procesamiento
-    data = data.tail(30)
-    
-    # Mostrar información sobre los datos descargados
     st.success(f"✅ Descargados {len(data)} registros más recientes de Yahoo Finance")
-    
-except Exception as e:
-    st.error(f"❌ Error al descargar datos de Yahoo Finance: {e}")
-    st.stop()
-
-# 2) OPTIMIZACIÓN: Solo insertar los últimos 3 registros más recientes
-if not data.empty:
-    try:
-        # Tomar solo los últimos 3 registros para insertar (más rápido)
-        recent_data = data.tail(3)
-        
-        success_count, error_count = insert_all_data_to_supabase(supabase, recent_data)
-        
-        if success_count > 0:
-            st.success(f"✅ {success_count} registros insertados")
-        
-    except Exception as e:
+    if snapshot.inserted > 0:
+        st.success(f"✅ {snapshot.inserted} registros insertados")
+    if "insercion" in snapshot.errors:
         st.warning("⚠️ Error en inserción, continuando con visualización...")
+else:
+    # 2) Mostrar salud y retraso del worker de ingesta
+    with run.stage("estado_worker"):
+        worker_status = read_status()
+        health, heartbeat_age, bar_lag = worker_health(worker_status)
+    lag_text = f" · última barra hace {bar_lag / 60:.1f} min" if bar_lag is not None else ""
+    if worker_status and worker_status.get("ultimo_resultado"):
+        last_cycle = worker_status["ultimo_resultado"]
+        lag_text += f" · ciclo de {last_cycle.get('tickers', 1)} tickers en {last_cycle.get('duracion_s', 0)}s"
+    if worker_status and worker_status.get("spool_pendientes"):
+        lag_text += f" · {worker_status['spool_pendientes']:,} barras pendientes en el spool"
+    
+    if health == "ok":
+        st.caption(f"🟢 Ingesta activa · último ciclo hace {heartbeat_age:.0f}s{lag_text}")
+    elif health == "retrasado":
+        st.warning(f"🟡 Ingesta retrasada · último ciclo hace {heartbeat_age:.0f}s{lag_text}")
+    elif health == "caido":
+        st.error(f"🔴 Ingesta detenida · último ciclo hace {heartbeat_age / 60:.1f} min{lag_text}")
+    else:
+        st.info("📝 Sin estado del worker de ingesta. Ejecuta: python supabase/insertar_datos_yfinance.py")
+
+# 3) OPTIMIZACIÓN: La caché local compartida solo pide a Supabase las filas nuevas
+local_cache = get_local_cache()
+stats = local_cache.stats
+st.caption(
+    f"⚡ Caché local: {local_cache.hit_ratio():.0%} aciertos · "
+    f"{stats['consultas_delta']} consultas delta · {stats['filas_delta']} filas nuevas · "
+    f"{stats['filas_servidas']} filas servidas desde memoria · "
+    f"{shared_fetcher.reads_per_fetch():.1f} lecturas de sesión por descarga"
+)
 
-# 3) OPTIMIZACIÓN: Consulta más eficiente - aumentar a 100 registros para mejores filtros
-try:
-    # Consultar más registros para tener mejor rango de filtros
-    resp = supabase.table("apple_stock_data")\
-        .select("timestamp, open, high, low, close, volume")\
-        .order("timestamp", desc=True)\
-        .limit(100)\
-        .execute()
-    
-    rows = resp.data
-    df = pd.DataFrame(rows)
-    
-    # Convertir timestamp de forma más eficiente
-    if not df.empty and "timestamp" in df.columns:
-        df["timestamp"] = pd.to_datetime(df["timestamp"])
-        df = df.sort_values("timestamp", ascending=False).reset_index(drop=True)
-        
-except Exception as e:
-    df = pd.DataFrame()
-
-# 4) OPTIMIZACIÓN: Fallback más rápido
-if df.empty:
+# 4) OPTIMIZACIÓN: Fallback más rápido (solo en modo embebido)
+if df.empty and not data.empty:
     # Usar datos de Yahoo Finance directamente (más rápido)
     df = data.copy()
     df = df.rename(columns={
@@ -267,284 +210,665 @@ st.subheader("🔍 Filtros Globales")
 # Crear columnas para organizar filtros
 col1, col2, col3 = st.columns(3)
 
+# Rango de fechas de la caché local (lo que se puede filtrar sin ir a Supabase)
+cached_df = df
+today = datetime.now().date()
+min_date = cached_df['timestamp'].dt.date.min() if not cached_df.empty else today
+max_date = cached_df['timestamp'].dt.date.max() if not cached_df.empty else today
+
 with col1:
     st.markdown("**📅 Filtros de Tiempo**")
     
-    # Filtro por fecha
-    if not df.empty:
-        min_date = df['timestamp'].dt.date.min()
-        max_date = df['timestamp'].dt.date.max()
-        
-        date_range = st.date_input(
-            "Rango de fechas",
-            value=(min_date, max_date),
-            min_value=min_date,
-            max_value=max_date,
-            key="date_filter"
-        )
-        
-        # Filtro por horario
-        time_range = st.select_slider(
-            "Rango de horas",
-            options=[f"{i:02d}:00" for i in range(24)],
-            value=("09:00", "23:00"),
-            key="time_filter"
-        )
-        
-        # Convertir strings de tiempo a objetos time
-        time_start = datetime.strptime(time_range[0], "%H:%M").time()
-        time_end = datetime.strptime(time_range[1], "%H:%M").time()
-        time_range = (time_start, time_end)
-    else:
-        date_range = None
-        time_range = None
+    # Filtro por fecha: se puede ampliar más allá de la caché (se consulta en el servidor)
+    date_range = st.date_input(
+        "Rango de fechas",
+        value=(min_date, max_date),
+        min_value=today - timedelta(days=HISTORIAL_MAX_DIAS),
+        max_value=max(today, max_date),
+        key="date_filter"
+    )
+    
+    # Filtro por horario
+    time_range = st.select_slider(
+        "Rango de horas",
+        options=[f"{i:02d}:00" for i in range(24)],
+        value=("09:00", "23:00"),
+        key="time_filter"
+    )
+    
+    # Convertir strings de tiempo a objetos time
+    time_start = datetime.strptime(time_range[0], "%H:%M").time()
+    time_end = datetime.strptime(time_range[1], "%H:%M").time()
+    time_range = (time_start, time_end)
 
 with col2:
     st.markdown("**💰 Filtros de Precio**")
     
+    # Rango de precios de cierre (vacío = sin límite); se aplica en el servidor
+    price_col1, price_col2 = st.columns(2)
+    price_min = price_col1.number_input(
+        "Cierre mínimo (USD)",
+        value=None,
+        min_value=0.0,
+        step=0.01,
+        placeholder=f"{cached_df['close'].min():.2f}" if not cached_df.empty else "",
+        key="price_min_filter"
+    )
+    price_max = price_col2.number_input(
+        "Cierre máximo (USD)",
+        value=None,
+        min_value=0.0,
+        step=0.01,
+        placeholder=f"{cached_df['close'].max():.2f}" if not cached_df.empty else "",
+        key="price_max_filter"
+    )
+    price_range = (price_min, price_max)
+
+with col3:
+    st.markdown("**📊 Filtros de Volumen**")
+    
+    # Rango de volumen (vacío = sin límite); se aplica en el servidor
+    volume_col1, volume_col2 = st.columns(2)
+    volume_min = volume_col1.number_input(
+        "Volumen mínimo",
+        value=None,
+        min_value=0,
+        step=1000,
+        placeholder=f"{int(cached_df['volume'].min()):,}" if not cached_df.empty else "",
+        key="volume_min_filter"
+    )
+    volume_max = volume_col2.number_input(
+        "Volumen máximo",
+        value=None,
+        min_value=0,
+        step=1000,
+        placeholder=f"{int(cached_df['volume'].max()):,}" if not cached_df.empty else "",
+        key="volume_max_filter"
+    )
+    volume_range = (volume_min, volume_max)
+    
+    # Filtro por tendencia (comparar con precio anterior)
+    trend_filter = st.selectbox(
+        "Filtrar por tendencia",
+        options=TREND_OPTIONS,
+        key="trend_filter"
+    )
+    
+    # Filtro por RSI (14); el rango completo no filtra
+    rsi_range = st.slider(
+        "Rango de RSI",
+        min_value=0.0,
+        max_value=100.0,
+        value=(0.0, 100.0),
+        step=1.0,
+        key="rsi_filter"
+    )
+
+date_range = date_range if len(date_range) == 2 else None
+
+# Si el rango de fechas empieza antes de la caché, el rango se consulta en Supabase
+# (predicados gte/lte + paginación keyset) en lugar de filtrar solo lo que hay en memoria.
+# Precio y volumen se filtran después, en local: los indicadores (SMA, RSI, VWAP...)
+# necesitan la serie completa del rango, sin los huecos que dejarían esos predicados
+server_filtered = False
+truncated = False
+if date_range and date_range[0] < min_date:
+    with run.stage("consulta_filtrada") as sample:
+        try:
+            df, truncated = fetch_filtered(
+                supabase,
+                tickers=[ticker],
+                date_range=date_range
+            )
+            server_filtered = True
+            sample["filas"] = len(df)
+            st.caption(f"🔎 {len(df):,} filas del rango de fechas consultadas en Supabase")
+            if truncated:
+                st.warning(
+                    f"⚠️ Resultado limitado a {DEFAULT_ROW_BUDGET:,} filas: se muestran las más recientes, "
+                    f"del {df['timestamp'].min():%Y-%m-%d %H:%M} al {df['timestamp'].max():%Y-%m-%d %H:%M} UTC "
+                    f"(faltan las anteriores). Reduce el rango de fechas para verlas."
+                )
+        except Exception as e:
+            run.error("consulta_filtrada", e)
+            st.warning(f"⚠️ Error en la consulta filtrada, mostrando datos en caché: {e}")
+
+# Indicadores técnicos (SMA, EMA, Bollinger, VWAP, RSI, ATR) como columnas del DataFrame
+if not df.empty:
+    with run.stage("indicadores", rows=len(df)):
+        if server_filtered:
+            df = compute_indicators(df)
+        else:
+            df = get_indicator_engine().extend(ticker, df)
+
+with col2:
     if not df.empty:
-        price_min_val = float(df['close'].min())
-        price_max_val = float(df['close'].max())
-        
-        price_range = st.slider(
-            "Rango de precios de cierre (USD)",
-            min_value=price_min_val,
-            max_value=price_max_val,
-            value=(price_min_val, price_max_val),
-            step=0.01,
-            key="price_filter"
-        )
-        
         # Filtro por volatilidad (diferencia entre High y Low)
         df['volatility'] = df['high'] - df['low']
         volatility_min = float(df['volatility'].min())
         volatility_max = float(df['volatility'].max())
         
+        volatility_bounds = (volatility_min, max(volatility_max, volatility_min + 0.01))
         volatility_range = st.slider(
             "Rango de volatilidad (High-Low)",
-            min_value=volatility_min,
-            max_value=volatility_max,
-            value=(volatility_min, volatility_max),
+            min_value=volatility_bounds[0],
+            max_value=volatility_bounds[1],
+            value=volatility_bounds,
             step=0.01,
             key="volatility_filter"
         )
+        # El rango completo no filtra (así las barras nuevas no quedan fuera de los límites)
+        if volatility_range == volatility_bounds:
+            volatility_range = None
     else:
-        price_range = (0, 1000)
-        volatility_range = (0, 100)
-
-with col3:
-    st.markdown("**📊 Filtros de Volumen**")
-    
-    if not df.empty:
-        volume_min_val = int(df['volume'].min())
-        volume_max_val = int(df['volume'].max())
-        
-        volume_range = st.slider(
-            "Rango de volumen",
-            min_value=volume_min_val,
-            max_value=volume_max_val,
-            value=(volume_min_val, volume_max_val),
-            step=1000,
-            key="volume_filter"
-        )
-        
-        # Filtro por tendencia (comparar con precio anterior)
-        trend_filter = st.selectbox(
-            "Filtrar por tendencia",
-            options=["Todos", "Subida", "Bajada", "Estable"],
-            key="trend_filter"
-        )
-    else:
-        volume_range = (0, 1000000)
-        trend_filter = "Todos"
+        volatility_range = None
 
 # Botón para limpiar filtros
 if st.button("🗑️ Limpiar todos los filtros"):
     # Limpiar session state de filtros específicos
-    filter_keys = ["date_filter", "time_filter", "price_filter", "volatility_filter", "volume_filter", "trend_filter"]
+    filter_keys = ["date_filter", "time_filter", "price_min_filter", "price_max_filter", "volatility_filter",
+                   "volume_min_filter", "volume_max_filter", "trend_filter", "rsi_filter"]
     for key in filter_keys:
         if key in st.session_state:
             del st.session_state[key]
     st.rerun()
 
-# ===== APLICAR FILTROS =====
-if not df.empty:
-    # Aplicar filtros básicos
-    filtered_df = apply_global_filters(
-        df, 
-        date_range if len(date_range) == 2 else None,
-        time_range,
-        price_range[0],
-        price_range[1],
-        volume_range[0],
-        volume_range[1]
-    )
-    
-    # Aplicar filtro de volatilidad
-    if 'volatility' in filtered_df.columns:
-        filtered_df = filtered_df[
-            (filtered_df['volatility'] >= volatility_range[0]) & 
-            (filtered_df['volatility'] <= volatility_range[1])
-        ]
-    
-    # Aplicar filtro de tendencia
-    if trend_filter != "Todos" and len(filtered_df) > 1:
-        filtered_df = filtered_df.sort_values('timestamp').reset_index(drop=True)
-        filtered_df['price_change'] = filtered_df['close'].diff()
-        
-        if trend_filter == "Subida":
-            filtered_df = filtered_df[filtered_df['price_change'] > 0]
-        elif trend_filter == "Bajada":
-            filtered_df = filtered_df[filtered_df['price_change'] < 0]
-        elif trend_filter == "Estable":
-            filtered_df = filtered_df[filtered_df['price_change'] == 0]
-    
-    # Mostrar estadísticas de filtros
+def render_diagnostics(run, snapshot):
+    """Tiempos por etapa de esta ejecución, p50/p95 acumulados y coste por refresco"""
     st.markdown("---")
-    col_stats1, col_stats2, col_stats3 = st.columns(3)
-    
-    with col_stats1:
-        st.metric("📊 Registros originales", len(df))
-    with col_stats2:
-        st.metric("🔍 Registros filtrados", len(filtered_df))
-    with col_stats3:
-        percentage = (len(filtered_df) / len(df)) * 100 if len(df) > 0 else 0
-        st.metric("📈 Porcentaje mostrado", f"{percentage:.1f}%")
-    
-    # Usar datos filtrados para el resto de la aplicación
-    display_df = filtered_df.sort_values("timestamp", ascending=False).reset_index(drop=True)
-else:
-    display_df = df
+    st.subheader("🐞 Diagnóstico del Pipeline")
 
-st.markdown("---")
+    st.markdown(
+        f"**Esta ejecución** ({run.kind} #{run.number}, {run.total_seconds() * 1000:,.0f} ms · "
+        f"CPU {run.cpu_seconds() * 1000:,.0f} ms · {run.bytes_sent() / 1024:,.1f} KB hasta aquí)"
+    )
+    st.dataframe(pd.DataFrame([
+        {
+            "etapa": sample["etapa"],
+            "ms": round(sample["segundos"] * 1000, 1),
+            "filas": sample["filas"],
+            "KB": round(sample["bytes"] / 1024, 1) if sample["bytes"] else None,
+            "caché": sample.get("cache")
+        }
+        for sample in run.stages
+    ]), use_container_width=True)
+
+    summary = metrics.summary()
+    if summary["total"]["n"]:
+        st.markdown("**Reruns anteriores** (últimas muestras por etapa)")
+        st.dataframe(pd.DataFrame([
+            {
+                "etapa": name,
+                "n": stats["n"],
+                "p50 ms": round(stats["p50"] * 1000, 1) if stats["p50"] is not None else None,
+                "p95 ms": round(stats["p95"] * 1000, 1) if stats["p95"] is not None else None,
+                "errores": stats["errores"]
+            }
+            for name, stats in summary.items()
+        ]), use_container_width=True)
+
+    refreshes = metrics.refresh_summary()
+    if refreshes:
+        st.markdown("**Coste por refresco** (rerun completo del script vs fragmento en vivo)")
+        st.dataframe(pd.DataFrame([
+            {
+                "tipo": kind,
+                "n": stats["n"],
+                "p50 ms": round(stats["p50_s"] * 1000, 1),
+                "CPU p50 ms": round(stats["cpu_p50_s"] * 1000, 1),
+                "CPU p95 ms": round(stats["cpu_p95_s"] * 1000, 1),
+                "KB enviados p50": round(stats["bytes_p50"] / 1024, 1)
+            }
+            for kind, stats in refreshes.items()
+        ]), use_container_width=True)
+
+    fetcher_stats = shared_fetcher.stats
+    recent_reads = shared_fetcher.recent_reads_per_fetch()
+    st.markdown(
+        f"**Datos compartidos** (instantánea v{snapshot.version}"
+        f"{', esperada mientras otra sesión refrescaba' if snapshot.waited else ''}): "
+        f"{fetcher_stats['descargas']} descargas · {fetcher_stats['lecturas']} lecturas de sesión · "
+        f"{fetcher_stats['esperas']} esperas ({fetcher_stats['esperas_agotadas']} agotadas) · "
+        f"{fetcher_stats['errores']} errores · "
+        f"{shared_fetcher.reads_per_fetch():.1f} lecturas por descarga"
+        + (f" (últimas: {', '.join(str(reads) for reads in recent_reads[-10:])})" if recent_reads else "")
+    )
 
-# 5) CORRECCIÓN: Mostrar tabla filtrada
-st.subheader(f"📋 Datos Filtrados ({len(display_df)} registros)")
+    view_cache = get_view_cache()
+    cache_stats = view_cache.stats
+    run_hits = sum(sample.get("cache") == "acierto" for sample in run.stages)
+    run_lookups = sum(sample.get("cache") is not None for sample in run.stages)
+    st.markdown(
+        f"**Caché de vistas**: {view_cache.hit_ratio():.0%} aciertos "
+        f"({cache_stats['aciertos']} de {cache_stats['aciertos'] + cache_stats['fallos']}; "
+        f"{run_hits} de {run_lookups} en esta ejecución) · {len(view_cache)} entradas · "
+        f"{view_cache.memory_bytes() / 1024 ** 2:,.1f} de {view_cache.max_bytes / 1024 ** 2:,.0f} MB · "
+        f"{cache_stats['expulsiones']} expulsiones"
+    )
 
-if not display_df.empty:
-    # Mostrar tabla con columnas adicionales calculadas
-    table_df = display_df.copy()
-    if 'volatility' in table_df.columns:
-        table_df['volatility'] = table_df['volatility'].round(2)
-    
-    st.dataframe(table_df, use_container_width=True)
-    
-    # 6) Métricas rápidas y visualizaciones con datos filtrados
-    required_cols = ["open", "close", "high", "low", "volume"]
-    if all(col in display_df.columns for col in required_cols):
-        # Tomar el primer registro (más reciente de los filtrados)
-        ultimo = display_df.iloc[0]
-        c1, c2, c3, c4, c5 = st.columns(5)
-        c1.metric("📈 Open", f"{float(ultimo['open']):.2f} USD")
-        c2.metric("📉 Close", f"{float(ultimo['close']):.2f} USD")
-        c3.metric("🔺 High", f"{float(ultimo['high']):.2f} USD")
-        c4.metric("🔻 Low", f"{float(ultimo['low']):.2f} USD")
-        c5.metric("📊 Volume", f"{int(ultimo['volume']):,}")
+    report = startup.report()
+    if startup.finished:
+        within = "✅ dentro del" if report["dentro_presupuesto"] else "⚠️ fuera del"
+        st.markdown(
+            f"**Arranque en frío**: shell a los {report['hasta_shell_ms']:,.0f} ms · primer render a los "
+            f"{report['hasta_primer_render_ms']:,.0f} ms ({within} presupuesto de {report['presupuesto_ms']:,.0f} ms)"
+            + (f" · {report['proceso_antes_del_script_ms'] / 1000:,.1f} s de proceso antes del script"
+               if report["proceso_antes_del_script_ms"] is not None else "")
+        )
+    else:
+        st.markdown("**Arranque en frío** (primer render en curso)")
+    if report["importaciones"]:
+        st.dataframe(pd.DataFrame(report["importaciones"]), use_container_width=True)
 
-        st.markdown("---")
+    for error in run.errors:
+        st.error(f"❌ {error['etapa']}: {error['error']}")
+    if metrics.export_path:
+        st.caption(f"📤 Exportando métricas ({metrics.export_format}) a {metrics.export_path}")
 
-        # 7) Para las gráficas, reordenar cronológicamente (más antiguo primero)
-        df_for_charts = display_df.sort_values("timestamp", ascending=True).copy()
-        
-        # Gráfica de línea de Close con datos filtrados
-        st.subheader("📈 Precio Close - Datos Filtrados")
-        fig_line = go.Figure(go.Scatter(
-            x=df_for_charts["timestamp"],
-            y=df_for_charts["close"],
-            mode="lines+markers",
-            name="Close",
-            line=dict(width=3, color="#00ff88")
-        ))
-        fig_line.update_layout(
-            xaxis_title="Hora",
-            yaxis_title="Precio USD",
-            template="plotly_dark",
-            height=500
-        )
-        st.plotly_chart(fig_line, use_container_width=True)
-
-        # 8) Candlestick con datos filtrados
-        with st.expander("📊 Ver Gráfica Candlestick - Datos Filtrados"):
-            fig_candle = go.Figure(data=[go.Candlestick(
-                x=df_for_charts["timestamp"],
-                open=df_for_charts["open"],
-                high=df_for_charts["high"],
-                low=df_for_charts["low"],
-                close=df_for_charts["close"]
-            )])
-            fig_candle.update_layout(
-                title="Precio de Apple (AAPL) - Datos Filtrados",
-                xaxis_title="Hora",
-                yaxis_title="Precio USD",
-                xaxis_rangeslider_visible=True,
-                template="plotly_dark",
-                height=500
-            )
-            st.plotly_chart(fig_candle, use_container_width=True)
+def sent_bytes(stage, size, digest):
+    """
+    Bytes que viajan al navegador: Streamlit solo envía una referencia de los elementos
+    grandes que el navegador ya tiene, así que uno idéntico al de la ejecución anterior no cuenta
+    """
+    digests = st.session_state.setdefault("payload_digests", {})
+    unchanged = digests.get(stage) == digest and size >= st.get_option("global.minCachedMessageSize")
+    digests[stage] = digest
+    return 0 if unchanged else size
 
-        st.markdown("---")
+def render_data_view(df, volatility_range, run, snapshot, live_since=None, server_filtered=False):
+    """
+    Filtros aplicados, métricas, tabla y gráficas (lo que depende de los datos nuevos)
+    `live_since`: última barra de la recarga completa, en los refrescos del fragmento
+    Todo lo derivado se memoiza en la caché de vistas por (versión de los datos, filtros)
+    """
+    view_cache = get_view_cache()
+    version = data_version(ticker, snapshot.version, df, "servidor" if server_filtered else "cache")
+    filters = filter_key(
+        date_range=date_range, time_range=time_range, price_range=price_range, volume_range=volume_range,
+        volatility_range=volatility_range, trend_filter=trend_filter, rsi_range=rsi_range
+    )
 
-        # 9) Volumen por hora con datos filtrados
-        st.subheader("📊 Volumen Acumulado por Hora - Datos Filtrados")
-        df_for_charts["hora"] = df_for_charts["timestamp"].dt.strftime("%H:%M")
-        vol_hora = df_for_charts.groupby("hora")["volume"].sum().reset_index()
-        vol_hora = vol_hora.sort_values("hora")
-        
-        fig_vol = go.Figure(go.Bar(
-            x=vol_hora["hora"],
-            y=vol_hora["volume"],
-            name="Volumen",
-            marker_color="#ff6b6b"
-        ))
-        fig_vol.update_layout(
-            title="Volumen de Transacciones por Hora",
-            xaxis_title="Hora",
-            yaxis_title="Volumen",
-            template="plotly_white",
-            height=400
-        )
-        st.plotly_chart(fig_vol, use_container_width=True)
+    def cached(stage, key, build, sample, size=None):
+        # Busca (stage, versión, filtros, *key) y anota en la etapa si fue acierto o fallo
+        value, hit = view_cache.get((stage, version, filters) + key, build, size=size)
+        sample["cache"] = "acierto" if hit else "fallo"
+        return value
+
+    # ===== APLICAR FILTROS =====
+    if not df.empty:
+        def filter_view():
+            # Todos los filtros (incluidos volatilidad y tendencia) en una sola máscara
+            filtered_df = apply_global_filters(
+                df, 
+                date_range,
+                time_range,
+                price_range[0],
+                price_range[1],
+                volume_range[0],
+                volume_range[1],
+                volatility_range=volatility_range,
+                trend_filter=trend_filter,
+                indicator_ranges={"rsi": rsi_range} if rsi_range != (0.0, 100.0) else None
+            )
+            return filtered_df.sort_values("timestamp", ascending=False).reset_index(drop=True)
 
+        with run.stage("filtros") as sample:
+            # Usar datos filtrados (más reciente primero) para el resto de la aplicación
+            display_df = cached("filtros", (), filter_view, sample)
+            sample["filas"] = len(display_df)
+    
+        # Mostrar estadísticas de filtros
         st.markdown("---")
+        col_stats1, col_stats2, col_stats3 = st.columns(3)
+    
+        with col_stats1:
+            st.metric("📊 Registros originales", len(df))
+        with col_stats2:
+            st.metric("🔍 Registros filtrados", len(display_df))
+        with col_stats3:
+            percentage = (len(display_df) / len(df)) * 100 if len(df) > 0 else 0
+            st.metric("📈 Porcentaje mostrado", f"{percentage:.1f}%")
+    else:
+        display_df = df
 
-        # 10) Gráfica de volatilidad
-        if 'volatility' in df_for_charts.columns:
-            st.subheader("📊 Volatilidad (High-Low) - Datos Filtrados")
-            fig_volatility = go.Figure(go.Scatter(
-                x=df_for_charts["timestamp"],
-                y=df_for_charts["volatility"],
-                mode="lines+markers",
-                name="Volatilidad",
-                line=dict(width=2, color="#ff9f43")
-            ))
-            fig_volatility.update_layout(
-                title="Volatilidad del Precio (High - Low)",
-                xaxis_title="Hora",
-                yaxis_title="Volatilidad USD",
-                template="plotly_white",
-                height=400
+    st.markdown("---")
+
+    # 5) CORRECCIÓN: Mostrar tabla filtrada
+    st.subheader(f"📋 Datos Filtrados ({len(display_df)} registros)")
+
+    if not display_df.empty:
+        def build_tables():
+            # Tabla con columnas adicionales calculadas, ya convertida a Arrow
+            table_df = display_df.copy()
+            if 'volatility' in table_df.columns:
+                table_df['volatility'] = table_df['volatility'].round(2)
+
+            new_rows = table_df.iloc[:0]
+            if live_since is not None:
+                # Fragmento en vivo: las barras llegadas después de la última recarga van en su
+                # propia tabla, así la tabla anterior no cambia y no se vuelve a enviar
+                is_new = (table_df["timestamp"] > live_since).to_numpy()
+                new_rows = table_df[is_new].reset_index(drop=True)
+                table_df = table_df[~is_new].reset_index(drop=True)
+            return {
+                name: (arrow_table(frame), len(frame), table_fingerprint(frame))
+                for name, frame in (("tabla_nuevas", new_rows), ("tabla", table_df))
+            }
+
+        with run.stage("preparar_tablas") as sample:
+            tables = cached("tablas", (live_since,), build_tables, sample)
+
+        new_rows, new_count, new_fingerprint = tables["tabla_nuevas"]
+        if new_count:
+            st.caption(f"🆕 {new_count} barras nuevas desde la última recarga")
+            with run.stage("tabla_nuevas", rows=new_count, bytes=sent_bytes("tabla_nuevas", *new_fingerprint)):
+                st.dataframe(new_rows, use_container_width=True)
+
+        table, table_count, table_fp = tables["tabla"]
+        with run.stage("tabla", rows=table_count, bytes=sent_bytes("tabla", *table_fp)):
+            st.dataframe(table, use_container_width=True)
+    
+        # 6) Métricas rápidas y visualizaciones con datos filtrados
+        required_cols = ["open", "close", "high", "low", "volume"]
+        if all(col in display_df.columns for col in required_cols):
+            # Tomar el primer registro (más reciente de los filtrados)
+            ultimo = display_df.iloc[0]
+            c1, c2, c3, c4, c5 = st.columns(5)
+            c1.metric("📈 Open", f"{float(ultimo['open']):.2f} USD")
+            c2.metric("📉 Close", f"{float(ultimo['close']):.2f} USD")
+            c3.metric("🔺 High", f"{float(ultimo['high']):.2f} USD")
+            c4.metric("🔻 Low", f"{float(ultimo['low']):.2f} USD")
+            c5.metric("📊 Volume", f"{int(ultimo['volume']):,}")
+
+            st.markdown("---")
+
+            # 7) Para las gráficas, orden cronológico (más antiguo primero; vista sin copia)
+            df_for_charts = display_df.iloc[::-1]
+        
+            # Opciones de renderizado: downsampling (LTTB / velas agregadas) y WebGL
+            with st.expander("⚙️ Opciones de gráficas"):
+                render_col1, render_col2, render_col3 = st.columns(3)
+                downsample = render_col1.checkbox("Reducir puntos (LTTB / velas agregadas)", value=True, key="downsample")
+                target_points = render_col2.number_input(
+                    "Puntos por gráfica", min_value=100, max_value=20000,
+                    value=DEFAULT_TARGET_POINTS, step=100, key="target_points"
+                )
+                measure_payload = render_col3.checkbox("Medir tamaño del payload", value=False, key="measure_payload")
+        
+            chart_options = (downsample, target_points, measure_payload)
+
+            def cached_figure(stage, build, *key):
+                # Figura + info (puntos, bytes, huella) memoizadas; el tamaño es el del JSON
+                def build_with_fingerprint():
+                    # La huella (bytes enviados, tamaño en la caché) se calcula una vez por figura
+                    # construida; graficas.py solo serializa la figura si se pide medir el payload
+                    fig, info = build()
+                    if "huella" not in info:
+                        info["bytes_despues"], info["huella"] = payload_fingerprint(fig)
+                    return fig, info
+
+                with run.stage(f"construir_{stage}") as sample:
+                    return cached(stage, chart_options + key, build_with_fingerprint, sample,
+                                  size=lambda entry: entry[1]["bytes_despues"])
+
+            def show_chart(fig, info, stage):
+                # Serialización y envío de la figura al navegador
+                with run.stage(stage, rows=info["puntos"], bytes=sent_bytes(stage, info["bytes_despues"], info["huella"])):
+                    st.plotly_chart(fig, use_container_width=True)
+                if measure_payload:
+                    text = f"🧮 {info['puntos']:,} de {info['puntos_originales']:,} puntos · {info['bytes_despues'] / 1024:,.1f} KB"
+                    if "bytes_antes" in info:
+                        text += f" (sin reducir: {info['bytes_antes'] / 1024:,.1f} KB)"
+                    st.caption(text)
+        
+            # Gráfica de línea de Close con datos filtrados (e indicadores superpuestos)
+            st.subheader("📈 Precio Close - Datos Filtrados")
+            indicator_options = {
+                "SMA 20": [("sma", "SMA 20", dict(width=1.5, color="#f9ca24"))],
+                "EMA 20": [("ema", "EMA 20", dict(width=1.5, color="#e056fd"))],
+                "Bandas de Bollinger": [
+                    ("bb_upper", "Bollinger sup.", dict(width=1, color="#7ed6df", dash="dot")),
+                    ("bb_lower", "Bollinger inf.", dict(width=1, color="#7ed6df", dash="dot"))
+                ],
+                "VWAP": [("vwap", "VWAP", dict(width=1.5, color="#ff7979"))],
+                "RSI 14": [],
+                "ATR 14": []
+            }
+            selected_indicators = st.multiselect(
+                "Indicadores técnicos",
+                options=list(indicator_options),
+                key="indicator_overlays"
             )
-            st.plotly_chart(fig_volatility, use_container_width=True)
-
-        # 11) Histograma de cierres con datos filtrados
-        st.subheader("📊 Distribución de Precios de Cierre - Datos Filtrados")
-        fig_hist = go.Figure(go.Histogram(
-            x=df_for_charts["close"],
-            nbinsx=20,
-            marker_color="#4834d4"
-        ))
-        fig_hist.update_layout(
-            title="Histograma de Precios de Cierre",
-            xaxis_title="Precio USD",
-            yaxis_title="Frecuencia",
-            template="plotly_white",
-            height=400
-        )
-        st.plotly_chart(fig_hist, use_container_width=True)
+            overlays = [
+                overlay for name in selected_indicators for overlay in indicator_options[name]
+                if overlay[0] in df_for_charts.columns
+            ]
+            fig_line, info = cached_figure("grafica_close", lambda: build_line_figure(
+                df_for_charts, "close", "Close",
+                line=dict(width=3, color="#00ff88"),
+                layout=dict(
+                    xaxis_title="Hora",
+                    yaxis_title="Precio USD",
+                    template="plotly_dark",
+                    height=500
+                ),
+                target_points=target_points, downsample=downsample, measure=measure_payload,
+                overlays=overlays
+            ), tuple(selected_indicators))
+            show_chart(fig_line, info, "grafica_close")
+        
+            # RSI y ATR en gráficas propias (escala distinta al precio)
+            for label, column, color in (("RSI 14", "rsi", "#f0932b"), ("ATR 14", "atr", "#6ab04c")):
+                if label in selected_indicators and column in df_for_charts.columns:
+                    if df_for_charts[column].isna().all():
+                        continue
+                    fig_indicator, info = cached_figure(f"grafica_{column}", lambda: build_line_figure(
+                        df_for_charts.dropna(subset=[column]), column, label,
+                        line=dict(width=2, color=color),
+                        layout=dict(
+                            title=label,
+                            xaxis_title="Hora",
+                            yaxis_title=label,
+                            template="plotly_dark",
+                            height=300
+                        ),
+                        target_points=target_points, downsample=downsample, measure=measure_payload
+                    ))
+                    show_chart(fig_indicator, info, f"grafica_{column}")
+
+            # 8) Candlestick con datos filtrados
+            with st.expander("📊 Ver Gráfica Candlestick - Datos Filtrados"):
+                fig_candle, info = cached_figure("grafica_velas", lambda: build_candlestick_figure(
+                    df_for_charts,
+                    layout=dict(
+                        title=f"Precio de {ticker} - Datos Filtrados",
+                        xaxis_title="Hora",
+                        yaxis_title="Precio USD",
+                        xaxis_rangeslider_visible=True,
+                        template="plotly_dark",
+                        height=500
+                    ),
+                    target_points=target_points, downsample=downsample, measure=measure_payload
+                ))
+                if info["minutos_por_vela"] > 1:
+                    st.caption(f"🕯️ Velas de {info['minutos_por_vela']} minutos")
+                show_chart(fig_candle, info, "grafica_velas")
+
+            st.markdown("---")
+
+            # 9) Volumen por hora con datos filtrados (buckets de 1 hora reales, no por minuto)
+            st.subheader("📊 Volumen Acumulado por Hora - Datos Filtrados")
+            def build_volume_figure():
+                vol_hora = rollup_frame(df_for_charts, "1h")
+                fig_vol = go.Figure(go.Bar(
+                    x=vol_hora["bucket"],
+                    y=vol_hora["volume"],
+                    name="Volumen",
+                    marker_color="#ff6b6b"
+                ))
+                fig_vol.update_layout(
+                    title="Volumen de Transacciones por Hora",
+                    xaxis_title="Hora",
+                    yaxis_title="Volumen",
+                    template="plotly_white",
+                    height=400
+                )
+                size, digest = payload_fingerprint(fig_vol)
+                return fig_vol, {"puntos": len(vol_hora), "bytes_despues": size, "huella": digest}
+
+            # La agrupación por hora solo depende de los datos filtrados
+            with run.stage("construir_grafica_volumen") as sample:
+                fig_vol, info = cached("grafica_volumen", (), build_volume_figure, sample,
+                                       size=lambda entry: entry[1]["bytes_despues"])
+            with run.stage("grafica_volumen", rows=info["puntos"],
+                           bytes=sent_bytes("grafica_volumen", info["bytes_despues"], info["huella"])):
+                st.plotly_chart(fig_vol, use_container_width=True)
+
+            st.markdown("---")
+
+            # 10) Gráfica de volatilidad
+            if 'volatility' in df_for_charts.columns:
+                st.subheader("📊 Volatilidad (High-Low) - Datos Filtrados")
+                fig_volatility, info = cached_figure("grafica_volatilidad", lambda: build_line_figure(
+                    df_for_charts, "volatility", "Volatilidad",
+                    line=dict(width=2, color="#ff9f43"),
+                    layout=dict(
+                        title="Volatilidad del Precio (High - Low)",
+                        xaxis_title="Hora",
+                        yaxis_title="Volatilidad USD",
+                        template="plotly_white",
+                        height=400
+                    ),
+                    target_points=target_points, downsample=downsample, measure=measure_payload
+                ))
+                show_chart(fig_volatility, info, "grafica_volatilidad")
+
+            # 11) Histograma de cierres con datos filtrados (bins calculados en el servidor)
+            st.subheader("📊 Distribución de Precios de Cierre - Datos Filtrados")
+            fig_hist, info = cached_figure("grafica_histograma", lambda: build_histogram_figure(
+                df_for_charts["close"],
+                layout=dict(
+                    title="Histograma de Precios de Cierre",
+                    xaxis_title="Precio USD",
+                    yaxis_title="Frecuencia",
+                    template="plotly_white",
+                    height=400
+                ),
+                downsample=downsample, measure=measure_payload
+            ))
+            show_chart(fig_hist, info, "grafica_histograma")
+
+            # 12) Resumen OHLCV del rango a la resolución que le corresponde (agregados del worker)
+            if date_range:
+                range_start, range_end = date_range_bounds(date_range)
+                resolution = choose_resolution(range_start, range_end)
+            
+                if resolution != "1m":
+                    st.markdown("---")
+                    st.subheader(f"📆 Resumen OHLCV del Rango ({resolution})")
+                    def rollup_figure(rollups_df):
+                        fig_rollup = go.Figure(data=[go.Candlestick(
+                            x=rollups_df["timestamp"],
+                            open=rollups_df["open"],
+                            high=rollups_df["high"],
+                            low=rollups_df["low"],
+                            close=rollups_df["close"]
+                        )])
+                        fig_rollup.update_layout(
+                            xaxis_title="Fecha",
+                            yaxis_title="Precio USD",
+                            xaxis_rangeslider_visible=False,
+                            template="plotly_dark",
+                            height=400
+                        )
+                        size, digest = payload_fingerprint(fig_rollup)
+                        return fig_rollup, {"puntos": len(rollups_df), "bytes_despues": size, "huella": digest}
+
+                    def local_rollups():
+                        # Sin tabla de agregados: se calculan con las filas ya cargadas
+                        return rollup_frame(df_for_charts, resolution).rename(columns={"bucket": "timestamp"})
+
+                    def build_rollup_figure():
+                        rollups_df = read_rollups(supabase, ticker, resolution, range_start, range_end)
+                        return rollup_figure(rollups_df if not rollups_df.empty else local_rollups())
+
+                    with run.stage("agregados") as sample:
+                        try:
+                            # Un error de lectura no se guarda en la caché: el siguiente rerun reintenta
+                            fig_rollup, info = cached("agregados", (resolution,), build_rollup_figure, sample,
+                                                      size=lambda entry: entry[1]["bytes_despues"])
+                        except Exception as e:
+                            run.error("agregados", e)
+                            sample["cache"] = "fallo"
+                            fig_rollup, info = rollup_figure(local_rollups())
+                        sample["filas"] = info["puntos"]
+
+                    with run.stage("grafica_agregados", rows=info["puntos"],
+                                   bytes=sent_bytes("grafica_agregados", info["bytes_despues"], info["huella"])):
+                        st.plotly_chart(fig_rollup, use_container_width=True)
 
+        else:
+            st.warning("⚠️ Datos incompletos en la base de datos.")
+            st.info("📊 Columnas disponibles: " + ", ".join(display_df.columns.tolist()))
     else:
-        st.warning("⚠️ Datos incompletos en la base de datos.")
-        st.info("📊 Columnas disponibles: " + ", ".join(display_df.columns.tolist()))
+        st.warning("⚠️ No hay datos que coincidan con los filtros seleccionados.")
+        st.info("💡 Intenta ajustar los filtros para obtener más resultados.")
+
+    if show_debug:
+        render_diagnostics(run, snapshot)
+
+# ===== VISTA DE DATOS: rerun completo o fragmento en vivo =====
+if live_updates:
+    @st.fragment(run_every=LIVE_REFRESH_S)
+    def live_data_view(base_df, volatility_range, server_filtered, truncated, live_since):
+        # Dentro del rerun completo se usa su propia ejecución. En los refrescos solo se
+        # ejecuta esta función: los filtros conservan su estado sin reconstruir los widgets
+        if not run.finished:
+            render_data_view(base_df, volatility_range, run, snapshot, server_filtered=server_filtered)
+            return
+
+        live_run = metrics.start_run(kind="fragmento")
+        try:
+            with live_run.stage("datos_compartidos") as sample:
+                live_snapshot = shared_fetcher.get(supabase, ticker, run=live_run)
+                sample["filas"] = len(live_snapshot.data)
+
+            df = base_df
+            if not live_snapshot.data.empty:
+                # Los indicadores solo procesan las barras nuevas (streaming)
+                with live_run.stage("indicadores", rows=len(live_snapshot.data)):
+                    live_df = get_indicator_engine().extend(ticker, live_snapshot.data)
+                if server_filtered and truncated:
+                    # Resultado recortado al tope de filas: se muestra tal cual, sin añadirle barras
+                    df = base_df.copy(deep=False)
+                elif server_filtered:
+                    # Resultado de la consulta en el servidor + las barras llegadas después
+                    newest = base_df["timestamp"].max() if not base_df.empty else None
+                    new_rows = live_df if newest is None else live_df[live_df["timestamp"] > newest]
+                    df = pd.concat([new_rows, base_df], ignore_index=True)
+                else:
+                    df = live_df
+                df["volatility"] = df["high"] - df["low"]
+
+            render_data_view(df, volatility_range, live_run, live_snapshot, live_since, server_filtered)
+        except BaseException:
+            # También StopException/RerunException: la ejecución del fragmento queda registrada
+            live_run.finish(interrupted=True)
+            raise
+        live_run.finish()
+
+    live_data_view(df, volatility_range, server_filtered, truncated, df["timestamp"].max() if not df.empty else None)
 else:
-    st.warning("⚠️ No hay datos que coincidan con los filtros seleccionados.")
-    st.info("💡 Intenta ajustar los filtros para obtener más resultados.")
+    render_data_view(df, volatility_range, run, snapshot, server_filtered=server_filtered)
+
+run.finish()
+
+# Primer render completo del proceso: cerrar el perfil de arranque y avisar si se pasa del presupuesto
+if startup.finish():
+    report = startup.report()
+    if not report["dentro_presupuesto"]:
+        logger.warning(
+            "Arranque en frío: primer render a los %.0f ms (presupuesto %.0f ms)",
+            report["hasta_primer_render_ms"], report["presupuesto_ms"]
+        )
+st.session_state["arranque_completo"] = True
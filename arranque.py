@@ -0,0 +1,112 @@
+"""
+Perfil del arranque en frío del dashboard
+
+El primer rerun de un proceso nuevo (reinicio, réplica recién escalada) paga todas las
+importaciones pesadas y la primera carga de datos. StartupProfiler mide ese primer
+rerun: cuándo se pinta la página base (shell), cuánto cuesta cada importación y cuándo
+termina el primer render completo, y lo compara con un presupuesto.
+
+Solo cuenta la primera ejecución completa del proceso; después no mide nada (los
+módulos ya están en sys.modules y las importaciones son gratis).
+
+Configuración:
+    ARRANQUE_PRESUPUESTO_MS=2500      presupuesto hasta el primer render (desde el inicio del script)
+    ARRANQUE_PERFIL_PATH=arranque.json  exporta el informe al terminar el primer render
+
+Este módulo solo importa la biblioteca estándar: se importa antes que nada pesado.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+STARTUP_BUDGET_MS = float(os.getenv("ARRANQUE_PRESUPUESTO_MS", "2500"))
+PROFILE_PATH = os.getenv("ARRANQUE_PERFIL_PATH")
+
+def process_uptime_s():
+    """Segundos desde que arrancó el proceso (Linux, /proc); None si no se puede saber"""
+    try:
+        with open("/proc/self/stat") as f:
+            # El nombre del proceso va entre paréntesis y puede contener espacios
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+class StartupProfiler:
+    """
+    Fases del primer rerun del proceso: importaciones (importing) y marcas (mark),
+    en milisegundos desde el inicio del script
+    """
+
+    def __init__(self, budget_ms=STARTUP_BUDGET_MS, export_path=PROFILE_PATH):
+        self.budget_ms = budget_ms
+        self.export_path = export_path
+        self._started = time.perf_counter()
+        # Tiempo del proceso antes del script: arranque del servidor e import de streamlit
+        self.process_uptime_s = process_uptime_s()
+        self.phases = []
+        self.marks = {}
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def _elapsed_ms(self):
+        return (time.perf_counter() - self._started) * 1000
+
+    @contextmanager
+    def importing(self, name):
+        """Mide las importaciones del bloque como fase `name` (solo la primera vez y si cargan algo)"""
+        if self.finished:
+            yield
+            return
+        loaded = len(sys.modules)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                if not self.finished and len(sys.modules) > loaded:
+                    self.phases.append({
+                        "fase": name,
+                        "ms": round(elapsed_ms, 1),
+                        "modulos": len(sys.modules) - loaded
+                    })
+
+    def mark(self, name):
+        """Anota el instante de `name` (shell, primer_render...) la primera vez que se alcanza"""
+        with self._lock:
+            if not self.finished and name not in self.marks:
+                self.marks[name] = round(self._elapsed_ms(), 1)
+
+    def finish(self):
+        """Cierra el perfil tras el primer render completo y lo exporta si está configurado"""
+        with self._lock:
+            if self.finished:
+                return False
+            self.marks.setdefault("primer_render", round(self._elapsed_ms(), 1))
+            self.finished = True
+        if self.export_path:
+            tmp_path = f"{self.export_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.report(), f, indent=2)
+            os.replace(tmp_path, self.export_path)
+        return True
+
+    def report(self):
+        first_render = self.marks.get("primer_render")
+        return {
+            "proceso_antes_del_script_ms": round(self.process_uptime_s * 1000, 1)
+                if self.process_uptime_s is not None else None,
+            "hasta_shell_ms": self.marks.get("shell"),
+            "hasta_primer_render_ms": first_render,
+            "importaciones_ms": round(sum(phase["ms"] for phase in self.phases), 1),
+            "importaciones": list(self.phases),
+            "marcas": dict(self.marks),
+            "presupuesto_ms": self.budget_ms,
+            "dentro_presupuesto": first_render is not None and first_render <= self.budget_ms
+        }
@@ -0,0 +1,168 @@
+"""
+Benchmark del arranque en frío del dashboard
+
+Lanza el dashboard en un proceso de Python nuevo (AppTest de Streamlit, sin navegador)
+contra el servidor REST local de Supabase con datos sintéticos, y mide:
+
+- Tiempo hasta la página base (shell) y hasta el primer render completo, desde el inicio
+  del script (StartupProfiler, arranque.py), y el coste de cada fase de importación
+- Tiempo de importación por paquete (python -X importtime, tiempo propio sumado por
+  paquete raíz): qué dependencias pesan en el arranque
+- Tiempo total del proceso (intérprete + streamlit + primer render)
+
+Con --presupuesto-ms termina con exit 1 si la mediana del primer render lo supera.
+
+Uso:
+    python benchmarks/bench_arranque.py
+    python benchmarks/bench_arranque.py --repeticiones 5 --presupuesto-ms 2500 --salida arranque.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from statistics import median
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from arranque import STARTUP_BUDGET_MS
+
+from sinteticos import synthetic_ohlcv
+from supabase_local import LocalStore, serve
+
+# Proceso hijo: un rerun del dashboard como lo haría una sesión nueva
+CHILD = """
+import sys
+from streamlit.testing.v1 import AppTest
+
+at = AppTest.from_file(sys.argv[1], default_timeout=float(sys.argv[2])).run()
+for exception in at.exception:
+    print(f"❌ {exception.message}", file=sys.stderr)
+sys.exit(1 if at.exception else 0)
+"""
+
+def parse_importtime(stderr):
+    """Salida de -X importtime -> {paquete raíz: ms de importación propios}"""
+    packages = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            # Cabecera
+            continue
+        packages[name.strip().split(".")[0]] += int(self_us) / 1000
+    return dict(packages)
+
+def cold_start(url, timeout_s=120):
+    """
+    Un arranque en frío en un proceso nuevo
+    Devuelve (informe de StartupProfiler, ms por paquete, ms totales del proceso)
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        profile_path = os.path.join(tmp, "arranque.json")
+        env = dict(
+            os.environ,
+            SUPABASE_URL=url,
+            SUPABASE_KEY="local.supabase.key",
+            CACHE_DIR=os.path.join(tmp, "cache"),
+            ARRANQUE_PERFIL_PATH=profile_path,
+            PYTHONPATH=ROOT
+        )
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", CHILD, os.path.join(ROOT, "app_streamlit.py"), str(timeout_s)],
+            cwd=ROOT, env=env, capture_output=True, text=True
+        )
+        total_ms = (time.perf_counter() - started) * 1000
+
+        if result.returncode != 0 or not os.path.exists(profile_path):
+            errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+            raise RuntimeError("El dashboard no completó el primer render:\n" + "\n".join(errors[-20:]))
+
+        with open(profile_path, encoding="utf-8") as f:
+            report = json.load(f)
+    return report, parse_importtime(result.stderr), total_ms
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del arranque en frío del dashboard (sin red)")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Arranques en frío (se informa la mediana)")
+    parser.add_argument("--filas", type=int, default=3_000, help="Barras sintéticas del ticker en Supabase local")
+    parser.add_argument("--presupuesto-ms", type=float, default=STARTUP_BUDGET_MS,
+                        help="Máximo hasta el primer render (exit 1 si se supera)")
+    parser.add_argument("--paquetes", type=int, default=12, help="Paquetes más lentos de importar a mostrar")
+    parser.add_argument("--salida", default=None, help="Guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    # Barras recientes (la caché local descarta las antiguas), en el servidor REST local
+    start = pd.Timestamp.now(tz="UTC").floor("min") - pd.Timedelta(minutes=args.filas)
+    store = LocalStore()
+    store.load("apple_stock_data", synthetic_ohlcv(args.filas, ("AAPL",), start=start))
+    server, url = serve(store)
+
+    runs = []
+    try:
+        for number in range(args.repeticiones):
+            report, packages, total_ms = cold_start(url)
+            runs.append({"perfil": report, "paquetes_ms": packages, "proceso_ms": total_ms})
+            print(f"arranque {number + 1}: shell {report['hasta_shell_ms']:,.0f} ms · "
+                  f"primer render {report['hasta_primer_render_ms']:,.0f} ms · proceso {total_ms:,.0f} ms")
+    finally:
+        server.shutdown()
+
+    def med(values):
+        return median(values) if values else None
+
+    shell_ms = med([run["perfil"]["hasta_shell_ms"] for run in runs])
+    first_render_ms = med([run["perfil"]["hasta_primer_render_ms"] for run in runs])
+    process_ms = med([run["proceso_ms"] for run in runs])
+
+    phases = defaultdict(list)
+    for run in runs:
+        for phase in run["perfil"]["importaciones"]:
+            phases[phase["fase"]].append(phase["ms"])
+    packages = defaultdict(list)
+    for run in runs:
+        for name, ms in run["paquetes_ms"].items():
+            packages[name].append(ms)
+    slowest = sorted(((name, med(values)) for name, values in packages.items()), key=lambda item: -item[1])
+
+    print(f"\nMediana de {len(runs)} arranques en frío")
+    print(f"{'hasta la shell':<32} {shell_ms:>10,.1f} ms")
+    print(f"{'hasta el primer render':<32} {first_render_ms:>10,.1f} ms")
+    print(f"{'proceso completo':<32} {process_ms:>10,.1f} ms")
+
+    print(f"\n{'fase de importación (script)':<32} {'ms':>10}")
+    for name, values in phases.items():
+        print(f"{name:<32} {med(values):>10.1f}")
+
+    print(f"\n{'paquete (-X importtime)':<32} {'ms':>10}")
+    for name, ms in slowest[:args.paquetes]:
+        print(f"{name:<32} {ms:>10.1f}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({
+                "hasta_shell_ms": shell_ms,
+                "hasta_primer_render_ms": first_render_ms,
+                "proceso_ms": process_ms,
+                "presupuesto_ms": args.presupuesto_ms,
+                "fases_ms": {name: med(values) for name, values in phases.items()},
+                "paquetes_ms": dict(slowest),
+                "arranques": runs
+            }, f, indent=2)
+        print(f"\nResultados guardados en {args.salida}")
+
+    if first_render_ms > args.presupuesto_ms:
+        print(f"\n⚠️ Primer render a los {first_render_ms:,.0f} ms: supera el presupuesto de {args.presupuesto_ms:,.0f} ms")
+        sys.exit(1)
+    print(f"\n✅ Primer render dentro del presupuesto de {args.presupuesto_ms:,.0f} ms")
+
+if __name__ == "__main__":
+    main()
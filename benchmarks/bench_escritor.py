@@ -0,0 +1,82 @@
+"""
+Benchmark del escritor async (escritor_async.py) contra el servidor REST local
+
+Compara el upsert en lote en serie (supabase-py, un bloque detrás de otro) con el
+escritor async (pool persistente, N peticiones en vuelo, reintentos). El servidor
+local puede añadir latencia por petición y responder 503 a una fracción de ellas.
+Al final se comprueba que la tabla tiene exactamente las filas esperadas.
+
+Uso:
+    python benchmarks/bench_escritor.py --filas 50000 --latencia-ms 20 --errores 0.05
+    python benchmarks/bench_escritor.py --en-vuelo 1 4 16 --lote 500
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from escritor_async import AsyncSupabaseWriter
+from ingesta import insert_all_data_to_supabase
+
+from sinteticos import synthetic_ohlcv
+from supabase_local import LocalStore, serve
+
+TABLE = "apple_stock_data"
+
+def yf_frame(rows, tickers):
+    """Barras sintéticas con las columnas de yfinance (Datetime, Open..., Ticker)"""
+    df = synthetic_ohlcv(rows // len(tickers), tickers)
+    return df.rename(columns={
+        "ticker": "Ticker", "timestamp": "Datetime", "open": "Open", "high": "High",
+        "low": "Low", "close": "Close", "volume": "Volume"
+    })
+
+def main():
+    from supabase import create_client
+
+    parser = argparse.ArgumentParser(description="Escritor async vs upsert en serie contra Supabase local")
+    parser.add_argument("--filas", type=int, default=20_000)
+    parser.add_argument("--tickers", type=int, default=10)
+    parser.add_argument("--lote", type=int, default=500, help="Filas por petición")
+    parser.add_argument("--en-vuelo", type=int, nargs="+", default=[1, 4, 8], help="Peticiones simultáneas")
+    parser.add_argument("--latencia-ms", type=float, default=20.0, help="Latencia simulada por petición")
+    parser.add_argument("--errores", type=float, default=0.0, help="Fracción de peticiones con 503")
+    args = parser.parse_args()
+
+    tickers = [f"T{i:03d}" for i in range(args.tickers)]
+    data = yf_frame(args.filas, tickers)
+    expected = len(data)
+
+    print(f"{len(data):,} filas · lote {args.lote} · latencia {args.latencia_ms:.0f} ms · errores {args.errores:.0%}")
+    print(f"{'modo':<22} {'segundos':>9} {'filas/s':>10} {'reintentos':>11} {'fallidas':>9} {'filas en BD':>12}")
+
+    # Referencia: upsert en lote en serie con el cliente de supabase-py
+    store = LocalStore()
+    server, url = serve(store, latency_s=args.latencia_ms / 1000, error_rate=args.errores)
+    started = time.perf_counter()
+    _, failed = insert_all_data_to_supabase(create_client(url, "local.supabase.key"), data, chunk_size=args.lote)
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    print(f"{'serie (supabase-py)':<22} {elapsed:>9.2f} {(expected - failed) / elapsed:>10,.0f} "
+          f"{0:>11} {failed:>9} {store.row_count(TABLE):>12,}")
+
+    for in_flight in args.en_vuelo:
+        store = LocalStore()
+        server, url = serve(store, latency_s=args.latencia_ms / 1000, error_rate=args.errores)
+        writer = AsyncSupabaseWriter(url, "local.supabase.key", batch_size=args.lote,
+                                     max_in_flight=in_flight, backoff_base=0.05, seed=0)
+        try:
+            writer.write(data)
+        finally:
+            writer.close()
+            server.shutdown()
+
+        stats = writer.stats
+        status = "" if store.row_count(TABLE) == expected - stats["filas_fallidas"] else "  ⚠️ filas inesperadas"
+        print(f"{f'async ({in_flight} en vuelo)':<22} {stats['segundos']:>9.2f} {writer.rows_per_second():>10,.0f} "
+              f"{stats['reintentos']:>11} {stats['filas_fallidas']:>9} {store.row_count(TABLE):>12,}{status}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark del motor de filtros (filtros.py) frente a la implementación anterior
+
+Uso:
+    python benchmarks/bench_filtros.py                     # 10k, 1M y 10M filas
+    python benchmarks/bench_filtros.py --filas 10000 100000 --legacy-max 100000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, time as dtime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filtros import apply_global_filters
+
+def synthetic_frame(rows, seed=0):
+    """Barras de 1 minuto sintéticas, más reciente primero (como en el dashboard)"""
+    rng = np.random.default_rng(seed)
+    close = 190 + np.cumsum(rng.normal(0, 0.05, rows)).round(2)
+    spread = rng.uniform(0, 0.5, rows)
+    df = pd.DataFrame({
+        "timestamp": pd.date_range("2024-01-02 14:30", periods=rows, freq="min", tz="UTC"),
+        "open": close,
+        "high": close + spread,
+        "low": close - spread,
+        "close": close,
+        "volume": rng.integers(1_000, 500_000, rows)
+    })
+    return df.iloc[::-1].reset_index(drop=True)
+
+def legacy_filters(df, date_range, time_range, price_min, price_max, volume_min, volume_max,
+                   volatility_range, trend_filter):
+    """Implementación anterior: copia + un filtrado por paso con .dt.date/.dt.time"""
+    filtered_df = df.copy()
+    filtered_df['volatility'] = filtered_df['high'] - filtered_df['low']
+    filtered_df = filtered_df[
+        (filtered_df['timestamp'].dt.date >= date_range[0]) &
+        (filtered_df['timestamp'].dt.date <= date_range[1])
+    ]
+    filtered_df = filtered_df[
+        (filtered_df['timestamp'].dt.time >= time_range[0]) &
+        (filtered_df['timestamp'].dt.time <= time_range[1])
+    ]
+    filtered_df = filtered_df[(filtered_df['close'] >= price_min) & (filtered_df['close'] <= price_max)]
+    filtered_df = filtered_df[(filtered_df['volume'] >= volume_min) & (filtered_df['volume'] <= volume_max)]
+    filtered_df = filtered_df[
+        (filtered_df['volatility'] >= volatility_range[0]) &
+        (filtered_df['volatility'] <= volatility_range[1])
+    ]
+    if trend_filter != "Todos" and len(filtered_df) > 1:
+        filtered_df = filtered_df.sort_values('timestamp').reset_index(drop=True)
+        filtered_df['price_change'] = filtered_df['close'].diff()
+        filtered_df = filtered_df[filtered_df['price_change'] > 0]
+    return filtered_df
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de apply_global_filters")
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--legacy-max", type=int, default=1_000_000,
+                        help="Tamaño máximo para medir la implementación anterior (muy lenta)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    filters = dict(
+        date_range=(date(2024, 1, 3), date(2030, 1, 1)),
+        time_range=(dtime(9, 0), dtime(23, 0)),
+        price_min=0, price_max=10_000,
+        volume_min=10_000, volume_max=450_000,
+        volatility_range=(0.05, 0.45),
+        trend_filter="Subida"
+    )
+
+    print(f"{'filas':>12} {'nuevo (s)':>10} {'ns/fila':>8} {'anterior (s)':>13} {'aceleración':>12}")
+    for rows in args.filas:
+        df = synthetic_frame(rows)
+
+        new_s, new_result = best_of(lambda: apply_global_filters(df, **filters), args.repeticiones)
+        line = f"{rows:>12,} {new_s:>10.4f} {new_s / rows * 1e9:>8.1f}"
+
+        if rows <= args.legacy_max:
+            legacy_s, legacy_result = best_of(lambda: legacy_filters(df, **filters), 1)
+            assert len(legacy_result) == len(new_result), "Resultados distintos"
+            line += f" {legacy_s:>13.4f} {legacy_s / new_s:>11.1f}x"
+
+        print(line)
+
+if __name__ == "__main__":
+    main()
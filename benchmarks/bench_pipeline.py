@@ -0,0 +1,261 @@
+"""
+Benchmark de las etapas del pipeline con datos sintéticos y Supabase local
+
+Etapas: normalización de la descarga (vectorizada y fila a fila), inserción fila a fila (con y sin índice local de
+duplicados) y en lote, consulta + parseo, filtros, indicadores y construcción/serialización
+de gráficas. No usa red: Yahoo Finance se sustituye por sinteticos.FakeYahoo y Supabase
+por supabase_local (cliente en proceso o servidor REST local con el cliente real).
+
+Uso:
+    python benchmarks/bench_pipeline.py                                # 1k, 10k y 100k filas
+    python benchmarks/bench_pipeline.py --filas 10000 --backend rest --salida base.json
+    python benchmarks/bench_pipeline.py --salida nuevo.json --comparar base.json --umbral 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, time as dtime, timezone
+from statistics import median
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from consultas import fetch_filtered
+from dedup import DedupIndex
+from filtros import apply_global_filters
+from graficas import build_candlestick_figure, build_histogram_figure, build_line_figure, payload_bytes
+from indicadores import compute_indicators
+from ingesta import insert_all_data_to_supabase
+from normalizacion import normalize_download
+from obtener_datos import _split_by_ticker
+
+from sinteticos import FakeYahoo, synthetic_ohlcv
+from supabase_local import LocalStore, LocalSupabase, serve
+
+TABLE = "apple_stock_data"
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def measure(func, repeat, setup=None):
+    """Ejecuta `func` `repeat` veces (con `setup` antes de cada una, fuera del tiempo)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        started = time.perf_counter()
+        result = func(arg) if setup else func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), median(timings), result
+
+class Backend:
+    """Supabase local en proceso ('memoria') o servidor REST + cliente real ('rest')"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.servers = []
+
+    def client(self, store):
+        if self.kind == "memoria":
+            return LocalSupabase(store)
+        from supabase import create_client
+        server, url = serve(store)
+        self.servers.append(server)
+        return create_client(url, "local.supabase.key")
+
+    def close(self):
+        for server in self.servers:
+            server.shutdown()
+        self.servers = []
+
+def yf_rows(raw, tickers):
+    """Descarga multi-símbolo -> un solo DataFrame con columna Ticker (como el worker)"""
+    frames = _split_by_ticker(raw, tickers)
+    return pd.concat([frame.assign(Ticker=ticker) for ticker, frame in frames.items()], ignore_index=True)
+
+def normalize_row_by_row(data):
+    """Conversión y validación fila a fila, como safe_insert_to_supabase (referencia)"""
+    records = []
+    for _, row in data.iterrows():
+        row_dict = row.to_dict()
+        timestamp = pd.to_datetime(row_dict["Datetime"])
+        if timestamp.tz is None:
+            timestamp = timestamp.tz_localize("UTC")
+        record = {
+            "ticker": row_dict["Ticker"],
+            "timestamp": timestamp.isoformat(),
+            "open": float(row_dict["Open"]),
+            "high": float(row_dict["High"]),
+            "low": float(row_dict["Low"]),
+            "close": float(row_dict["Close"]),
+            "volume": int(row_dict["Volume"])
+        }
+        if all(record[key] > 0 for key in ["open", "high", "low", "close", "volume"]):
+            records.append(record)
+    return records
+
+def run_size(rows, args, backend):
+    tickers = [f"T{i:03d}" for i in range(args.tickers)]
+    per_ticker = max(rows // len(tickers), 1)
+    repeat = args.repeticiones
+    results = []
+
+    def record(stage, n, timing, **extra):
+        best, med, _ = timing
+        results.append({
+            "etapa": stage,
+            "tamano": rows,
+            "filas": n,
+            "segundos": round(best, 6),
+            "mediana_s": round(med, 6),
+            "filas_por_s": round(n / best, 1) if best > 0 else None,
+            **extra
+        })
+
+    # 1) Normalización de la descarga multi-símbolo (yf.download sustituido por datos sintéticos):
+    #    etapa vectorizada sobre la descarga cruda y, como referencia, fila a fila sobre una muestra
+    raw = FakeYahoo(bars=per_ticker, now="2024-01-10 21:00").download(tickers, group_by="ticker")
+    record("normalizacion", per_ticker * len(tickers), measure(lambda: normalize_download(raw), repeat))
+    data = yf_rows(raw, tickers)
+
+    sample = data.iloc[:min(len(data), args.max_fila_a_fila)]
+    record("normalizacion_fila_a_fila", len(sample), measure(lambda: normalize_row_by_row(sample), repeat))
+
+    # 2) Inserción fila a fila (select + insert por fila) sobre la misma muestra
+    record("insercion_fila_a_fila", len(sample),
+           measure(lambda sb: insert_all_data_to_supabase(sb, sample, batch=False),
+                   repeat, setup=lambda: backend.client(LocalStore())))
+
+    # 2b) Fila a fila con el índice local de duplicados (sin select por fila)
+    record("insercion_fila_a_fila_indice", len(sample),
+           measure(lambda sb: insert_all_data_to_supabase(sb, sample, batch=False, dedup=DedupIndex()),
+                   repeat, setup=lambda: backend.client(LocalStore())))
+
+    # 3) Inserción en lote (upsert por bloques de 500)
+    record("insercion_lote", len(data),
+           measure(lambda sb: insert_all_data_to_supabase(sb, data, batch=True),
+                   repeat, setup=lambda: backend.client(LocalStore())))
+
+    # 4) Consulta filtrada + parseo (paginación keyset y DataFrame tipado) de `rows` barras de un ticker
+    store = LocalStore()
+    history = synthetic_ohlcv(rows, tickers[:1], start="2024-01-02 14:30")
+    store.load(TABLE, history)
+    client = backend.client(store)
+    timing = measure(lambda: fetch_filtered(client, tickers[:1], row_budget=sys.maxsize)[0], repeat)
+    record("consulta_parseo", len(timing[2]), timing)
+    df = timing[2]
+
+    # 5) Filtros globales (una sola máscara)
+    filters = dict(
+        date_range=(df["timestamp"].min().date(), df["timestamp"].max().date()),
+        time_range=(dtime(9, 0), dtime(23, 0)),
+        price_min=None, price_max=None,
+        volume_min=10_000, volume_max=None,
+        volatility_range=(0.0, float("inf")),
+        trend_filter="Subida"
+    )
+    record("filtros", len(df), measure(lambda: apply_global_filters(df, **filters), repeat))
+
+    # 6) Indicadores técnicos en lote
+    record("indicadores", len(df), measure(lambda: compute_indicators(df), repeat))
+
+    # 7) Gráficas: construcción + serialización a JSON (lo que se envía al navegador)
+    chrono = df.iloc[::-1].reset_index(drop=True)
+    layout = dict(template="plotly_dark", height=500)
+
+    def figures():
+        figs = [
+            build_line_figure(chrono, "close", "Close", dict(width=3), layout)[0],
+            build_candlestick_figure(chrono, layout)[0],
+            build_histogram_figure(chrono["close"], layout)[0]
+        ]
+        return sum(payload_bytes(fig) for fig in figs)
+
+    timing = measure(figures, repeat)
+    record("graficas", len(chrono), timing, bytes=timing[2])
+
+    backend.close()
+    return results
+
+def compare(results, baseline_path, threshold):
+    """Compara con otro JSON de resultados; devuelve las regresiones por encima de `threshold`"""
+    with open(baseline_path) as f:
+        baseline = {(r["etapa"], r["tamano"]): r for r in json.load(f)["resultados"]}
+
+    regressions = []
+    print(f"\n{'etapa':<30} {'filas':>9} {'base (s)':>10} {'nuevo (s)':>10} {'cambio':>8}")
+    for result in results:
+        base = baseline.get((result["etapa"], result["tamano"]))
+        if base is None or not base["segundos"]:
+            continue
+        change = result["segundos"] / base["segundos"] - 1
+        flag = "  ⚠️" if change > threshold else ""
+        print(f"{result['etapa']:<30} {result['filas']:>9,} {base['segundos']:>10.4f} "
+              f"{result['segundos']:>10.4f} {change:>+7.0%}{flag}")
+        if change > threshold:
+            regressions.append(result)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de las etapas del pipeline (sin red)")
+    parser.add_argument("--filas", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--tickers", type=int, default=5, help="Tickers de la descarga multi-símbolo")
+    parser.add_argument("--backend", choices=["memoria", "rest"], default="memoria",
+                        help="Supabase local en proceso o servidor REST local con el cliente real")
+    parser.add_argument("--max-fila-a-fila", type=int, default=1_000,
+                        help="Filas máximas para medir la inserción fila a fila (muy lenta)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--salida", default=None, help="Guardar los resultados en JSON")
+    parser.add_argument("--comparar", default=None, help="JSON de resultados anterior para detectar regresiones")
+    parser.add_argument("--umbral", type=float, default=0.25, help="Empeoramiento máximo tolerado (0.25 = +25%%)")
+    args = parser.parse_args()
+
+    backend = Backend(args.backend)
+    results = []
+    print(f"{'etapa':<30} {'filas':>9} {'mejor (s)':>10} {'mediana (s)':>12} {'filas/s':>12}")
+    for rows in args.filas:
+        for result in run_size(rows, args, backend):
+            results.append(result)
+            print(f"{result['etapa']:<30} {result['filas']:>9,} {result['segundos']:>10.4f} "
+                  f"{result['mediana_s']:>12.4f} {result['filas_por_s'] or 0:>12,.0f}")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "backend": args.backend,
+            "repeticiones": args.repeticiones,
+            "tickers": args.tickers,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "plataforma": platform.platform()
+        },
+        "resultados": results
+    }
+
+    if args.salida:
+        with open(args.salida, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResultados guardados en {args.salida}")
+
+    if args.comparar:
+        regressions = compare(results, args.comparar, args.umbral)
+        if regressions:
+            print(f"\n{len(regressions)} etapas empeoran más de un {args.umbral:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+"""
+Reproducción acelerada de barras grabadas: prueba de carga del camino en vivo sin red
+
+Las barras de 1 minuto de un archivo local (CSV o Parquet) se sirven con un reloj
+simulado que avanza `--velocidad` veces más rápido que el real (o una barra por ciclo,
+lo más rápido posible, con --velocidad max), y recorren el mismo código que en producción:
+
+- Ingesta: run_ingestion_cycle (marcas de agua, barras cerradas, índice de duplicados,
+  upsert en lote y agregados opcionales) una vez por minuto simulado, como el worker
+- Almacenamiento: Supabase local (supabase_local.py), en proceso o servidor REST + cliente real
+- Dashboard: cada pantalla es una sesión en su propio hilo que refresca un ticker cada
+  `--refresco` segundos simulados con SharedFetcher + CacheLocal (consulta delta),
+  IndicatorEngine (streaming) y las gráficas de línea y velas con su huella de payload
+  (con --velocidad max, sin pausa entre refrescos)
+
+Para cada barra se mide la latencia real de extremo a extremo: desde que la barra cierra
+en el reloj simulado hasta que aparece en una pantalla, separada en ingesta (cerrada ->
+guardada) y dashboard (guardada -> mostrada). Las barras del historial inicial no cuentan.
+
+Uso:
+    python benchmarks/reproduccion.py --grabar barras.parquet --tickers 5 --filas 390
+    python benchmarks/reproduccion.py --archivo barras.parquet --velocidad 100 --tickers 50
+    python benchmarks/reproduccion.py --velocidad max --tickers 500 --minutos 120 --backend rest --salida carga.json
+"""
+import argparse
+import bisect
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from agregados import RollupStore
+from cache_local import CacheLocal
+from datos_compartidos import SharedFetcher
+from dedup import DedupIndex
+from graficas import build_candlestick_figure, build_line_figure, payload_fingerprint
+from indicadores import IndicatorEngine
+from ingesta import run_ingestion_cycle
+from marcas_agua import BAR_INTERVAL
+
+from sinteticos import synthetic_ohlcv
+from supabase_local import LocalStore, LocalSupabase, serve
+
+TABLE = "apple_stock_data"
+RECORD_COLUMNS = ["ticker", "timestamp", "open", "high", "low", "close", "volume"]
+YF_COLUMNS = {"timestamp": "Datetime", "open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+
+# Igual que el dashboard: segundos entre refrescos en vivo (LIVE_REFRESH_S) y segundos
+# tras el inicio del minuto a los que corre el worker (--offset)
+DEFAULT_REFRESH_S = 60
+WORKER_OFFSET_S = 5
+
+def load_recording(path, default_ticker="AAPL"):
+    """
+    Barras grabadas (CSV o Parquet) -> formato de apple_stock_data en orden cronológico
+    Acepta las columnas de la tabla (ticker, timestamp, open...) o las de yfinance
+    (Ticker, Datetime, Open...); sin columna de ticker, todas son de `default_ticker`
+    """
+    if path.endswith((".parquet", ".pq")):
+        bars = pd.read_parquet(path)
+    else:
+        bars = pd.read_csv(path)
+
+    bars = bars.rename(columns=str.lower).rename(columns={"datetime": "timestamp", "date": "timestamp"})
+    if "ticker" not in bars.columns:
+        bars["ticker"] = default_ticker
+    missing = [column for column in RECORD_COLUMNS if column not in bars.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas en {path}: {', '.join(missing)}")
+
+    bars = bars[RECORD_COLUMNS].assign(
+        ticker=bars["ticker"].astype(str),
+        timestamp=pd.to_datetime(bars["timestamp"], utc=True)
+    )
+    return bars.sort_values(["timestamp", "ticker"], kind="stable", ignore_index=True)
+
+def scale_tickers(bars, count):
+    """
+    Los primeros `count` tickers de la grabación; si tiene menos, se repiten con sufijo
+    (AAPL, MSFT, AAPL_1, MSFT_1...) para simular más símbolos con los mismos precios
+    """
+    names = list(dict.fromkeys(bars["ticker"]))
+    if count <= len(names):
+        return bars[bars["ticker"].isin(names[:count])].reset_index(drop=True)
+
+    by_ticker = dict(tuple(bars.groupby("ticker", sort=False)))
+    frames = []
+    for i in range(count):
+        source = names[i % len(names)]
+        name = source if i < len(names) else f"{source}_{i // len(names)}"
+        frames.append(by_ticker[source].assign(ticker=name))
+    scaled = pd.concat(frames, ignore_index=True)
+    return scaled.sort_values(["timestamp", "ticker"], kind="stable", ignore_index=True)
+
+class ReplayClock:
+    """
+    Reloj simulado. Con `speedup` avanza speedup segundos de mercado por segundo real;
+    sin él (lo más rápido posible) solo avanza con advance(), un ciclo del worker cada vez
+    """
+
+    def __init__(self, start, speedup=None):
+        self.start = start
+        self.speedup = speedup
+        self._wall_start = time.perf_counter()
+        # Modo sin esperas: instante simulado y real de cada avance
+        self._virtual = [start]
+        self._wall = [self._wall_start]
+
+    def now(self):
+        if self.speedup:
+            # Resolución de microsegundos, como pd.Timestamp.now()
+            elapsed = pd.Timedelta(seconds=(time.perf_counter() - self._wall_start) * self.speedup)
+            return (self.start + elapsed).floor("us")
+        return self._virtual[-1]
+
+    def advance(self, to):
+        self._virtual.append(to)
+        self._wall.append(time.perf_counter())
+
+    def wall_at(self, virtual):
+        """Instante real (perf_counter) en el que el reloj simulado alcanzó `virtual`"""
+        if self.speedup:
+            return self._wall_start + (virtual - self.start).total_seconds() / self.speedup
+        index = bisect.bisect_left(self._virtual, virtual)
+        return self._wall[min(index, len(self._wall) - 1)]
+
+    def wait_until(self, virtual):
+        """Espera (con velocidad) o salta (sin ella) hasta el instante simulado `virtual`"""
+        if self.speedup:
+            time.sleep(max(0.0, self.wall_at(virtual) - time.perf_counter()))
+        else:
+            self.advance(virtual)
+
+class RecordedSource:
+    """
+    Sustituto de obtener_datos_multiples: sirve las barras grabadas que ya empezaron en
+    el reloj simulado (la del minuto en curso incluida, como Yahoo), con columnas de yfinance
+    """
+
+    def __init__(self, bars, clock):
+        self.clock = clock
+        self._frames = {}
+        self._keys = {}
+        for ticker, frame in bars.groupby("ticker", sort=False):
+            frame = frame.drop(columns="ticker").rename(columns=YF_COLUMNS).reset_index(drop=True)
+            self._frames[ticker] = frame
+            self._keys[ticker] = pd.DatetimeIndex(frame["Datetime"])
+
+    def download(self, tickers, start=None, **kwargs):
+        now = self.clock.now()
+        start = start if start is not None else now - pd.Timedelta(days=1)
+        frames = {}
+        for ticker in tickers:
+            keys = self._keys.get(ticker)
+            if keys is None:
+                continue
+            first = keys.searchsorted(start, side="left")
+            last = keys.searchsorted(now, side="right")
+            if last > first:
+                frames[ticker] = self._frames[ticker].iloc[first:last]
+        return frames
+
+class LatencyRecorder:
+    """Latencias por barra (segundos reales): total, ingesta y dashboard"""
+
+    def __init__(self, clock, measured_from):
+        self.clock = clock
+        self.measured_from = measured_from
+        self.samples = {"total": [], "ingesta": [], "dashboard": []}
+        self._stored = {}
+        self._lock = threading.Lock()
+
+    def stored(self, marks, tickers):
+        """Tras un ciclo del worker: las barras hasta la marca de cada ticker ya están guardadas"""
+        wall = time.perf_counter()
+        with self._lock:
+            for ticker in tickers:
+                mark = marks.get(ticker)
+                history = self._stored.setdefault(ticker, ([], []))
+                if mark is not None and (not history[0] or mark > history[0][-1]):
+                    history[0].append(mark)
+                    history[1].append(wall)
+
+    def shown(self, ticker, timestamps):
+        """Barras que una pantalla acaba de mostrar por primera vez"""
+        wall = time.perf_counter()
+        with self._lock:
+            marks, walls = self._stored.get(ticker, ([], []))
+            for timestamp in timestamps:
+                closed = timestamp + BAR_INTERVAL
+                if closed <= self.measured_from:
+                    # Historial inicial: ya estaba cerrado antes de empezar la reproducción
+                    continue
+                released = self.clock.wall_at(closed)
+                index = bisect.bisect_left(marks, timestamp)
+                stored = walls[index] if index < len(walls) else wall
+                self.samples["total"].append(wall - released)
+                self.samples["ingesta"].append(stored - released)
+                self.samples["dashboard"].append(wall - stored)
+
+    def summary(self):
+        result = {}
+        for name, values in self.samples.items():
+            values = np.asarray(values) * 1000
+            result[name] = {
+                "n": int(len(values)),
+                **({f"p{q}_ms": float(np.percentile(values, q)) for q in (50, 90, 99)} if len(values) else {}),
+                "max_ms": float(values.max()) if len(values) else None
+            }
+        return result
+
+def screen_session(supabase, fetcher, ticker, refresh_wall_s, recorder, stop, last_bar, stats):
+    """
+    Una sesión del dashboard con el ticker `ticker` en pantalla: cada refresco lee la
+    instantánea compartida, actualiza los indicadores y construye las gráficas
+    """
+    engine = IndicatorEngine()
+    layout = dict(template="plotly_dark", height=500)
+    newest = None
+
+    while not stop.is_set():
+        started = time.perf_counter()
+        snapshot = fetcher.get(supabase, ticker)
+        df = snapshot.data
+        if not df.empty:
+            df = engine.extend(ticker, df)
+            df["volatility"] = df["high"] - df["low"]
+            chrono = df.iloc[::-1].reset_index(drop=True)
+            for fig, _ in (build_line_figure(chrono, "close", "Close", dict(width=3), layout),
+                           build_candlestick_figure(chrono, layout)):
+                payload_fingerprint(fig)
+
+            timestamps = df["timestamp"]
+            fresh = timestamps if newest is None else timestamps[timestamps > newest]
+            recorder.shown(ticker, list(fresh))
+            newest = timestamps.max()
+            stats["refrescos"] += 1
+            stats["segundos"].append(time.perf_counter() - started)
+            if newest >= last_bar:
+                return
+        stop.wait(max(0.0, refresh_wall_s - (time.perf_counter() - started)))
+
+def replay(bars, speedup=None, history_minutes=60, minutes=None, screens=1, refresh_s=DEFAULT_REFRESH_S,
+           backend="memoria", dedup=True, rollups=False, progress=None):
+    """
+    Reproduce `bars` (formato de apple_stock_data) desplazadas a partir de ahora
+    Devuelve las estadísticas de ingesta, de las pantallas y las latencias
+    """
+    # Barras desplazadas para que la reproducción empiece ahora (la caché local descarta lo antiguo)
+    offset = pd.Timestamp.now(tz="UTC").floor("min") - bars["timestamp"].min()
+    bars = bars.assign(timestamp=bars["timestamp"] + offset)
+    tickers = list(dict.fromkeys(bars["ticker"]))
+
+    begin = bars["timestamp"].min() + pd.Timedelta(minutes=history_minutes)
+    end = bars["timestamp"].max() + BAR_INTERVAL
+    if minutes is not None:
+        end = min(end, begin + pd.Timedelta(minutes=minutes))
+    bars = bars[bars["timestamp"] + BAR_INTERVAL <= end].reset_index(drop=True)
+    last_bars = bars.groupby("ticker")["timestamp"].max().to_dict()
+
+    store = LocalStore()
+    server = None
+    if backend == "rest":
+        from supabase import create_client
+        server, url = serve(store)
+        supabase = create_client(url, "local.supabase.key")
+    else:
+        supabase = LocalSupabase(store)
+
+    clock = ReplayClock(begin, speedup)
+    source = RecordedSource(bars, clock)
+    recorder = LatencyRecorder(clock, begin)
+    index = DedupIndex().seed(supabase, tickers) if dedup else None
+    rollup_store = RollupStore() if rollups else None
+    marks = {}
+
+    watched = tickers[:screens]
+    refresh_wall_s = refresh_s / speedup if speedup else 0.0
+    cache_dir = tempfile.TemporaryDirectory()
+    fetcher = SharedFetcher(CacheLocal(directory=cache_dir.name, ttl_s=refresh_wall_s), interval_s=refresh_wall_s)
+    stop = threading.Event()
+    screen_stats = {"refrescos": 0, "segundos": []}
+
+    cycles = []
+    started = time.perf_counter()
+    threads = []
+    try:
+        # Primer ciclo: el worker guarda el historial antes de que se abran las pantallas
+        tick = begin.floor("min") + pd.Timedelta(seconds=WORKER_OFFSET_S)
+        clock.wait_until(tick)
+        while True:
+            result = run_ingestion_cycle(supabase, tickers=tickers, marks=marks, rollups=rollup_store,
+                                         dedup=index, now=clock.now(), download=source.download)
+            recorder.stored(marks, watched)
+            result["retraso_s"] = max(0.0, time.perf_counter() - clock.wall_at(tick))
+            cycles.append(result)
+            if progress is not None:
+                progress(len(cycles), clock.now(), result)
+
+            if not threads:
+                for ticker in watched:
+                    thread = threading.Thread(
+                        target=screen_session, name=f"pantalla-{ticker}", daemon=True,
+                        args=(supabase, fetcher, ticker, refresh_wall_s, recorder, stop, last_bars[ticker], screen_stats)
+                    )
+                    thread.start()
+                    threads.append(thread)
+
+            done = all(ticker in marks and marks[ticker] >= last_bars[ticker] for ticker in tickers)
+            if done or clock.now() > end + 5 * BAR_INTERVAL:
+                break
+            # Siguiente ciclo: el próximo minuto simulado (o el primero que no haya pasado ya)
+            tick += BAR_INTERVAL
+            if speedup:
+                tick = max(tick, clock.now().floor("min") + pd.Timedelta(seconds=WORKER_OFFSET_S))
+            clock.wait_until(tick)
+
+        ingest_seconds = time.perf_counter() - started
+        # Las pantallas terminan al mostrar la última barra (como mucho un par de refrescos)
+        deadline = time.perf_counter() + 2 * refresh_wall_s + 30
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.perf_counter()))
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(5)
+        if server is not None:
+            server.shutdown()
+        cache_dir.cleanup()
+
+    durations = np.asarray([cycle["duracion_s"] for cycle in cycles[1:]] or [0.0])
+    replayed = bars[bars["timestamp"] + BAR_INTERVAL > begin]
+    return {
+        "tickers": len(tickers),
+        "pantallas": len(watched),
+        "velocidad": speedup,
+        "minutos": len(replayed["timestamp"].unique()),
+        "barras": len(bars),
+        "barras_reproducidas": len(replayed),
+        "filas_en_bd": store.row_count(TABLE),
+        "ciclos": len(cycles),
+        "ciclos_con_error": sum(cycle["error"] is not None for cycle in cycles),
+        "ciclos_atrasados": sum(cycle["retraso_s"] * (speedup or 0) > 60 for cycle in cycles[1:]),
+        "duplicadas": sum(cycle.get("duplicadas", 0) for cycle in cycles),
+        "ciclo_p50_ms": float(np.percentile(durations, 50) * 1000),
+        "ciclo_p95_ms": float(np.percentile(durations, 95) * 1000),
+        "segundos": ingest_seconds,
+        "barras_por_s": len(replayed) / ingest_seconds if ingest_seconds else None,
+        "refrescos": screen_stats["refrescos"],
+        "refresco_p50_ms": float(np.percentile(screen_stats["segundos"], 50) * 1000) if screen_stats["segundos"] else None,
+        "refresco_p95_ms": float(np.percentile(screen_stats["segundos"], 95) * 1000) if screen_stats["segundos"] else None,
+        "latencia": recorder.summary()
+    }
+
+def print_report(stats, backend):
+    speed = f"{stats['velocidad']:g}x" if stats["velocidad"] else "máxima"
+    print(f"\nReproducción: {stats['tickers']} tickers · {stats['minutos']} minutos · velocidad {speed} · "
+          f"backend {backend} · {stats['pantallas']} pantallas")
+    print(f"Ingesta: {stats['ciclos']} ciclos ({stats['ciclos_atrasados']} atrasados, "
+          f"{stats['ciclos_con_error']} con error) · ciclo p50 {stats['ciclo_p50_ms']:,.1f} ms, "
+          f"p95 {stats['ciclo_p95_ms']:,.1f} ms · {stats['barras_reproducidas']:,} barras en "
+          f"{stats['segundos']:.1f}s ({stats['barras_por_s']:,.0f} barras/s) · {stats['duplicadas']:,} duplicadas descartadas")
+    if stats["ciclo_p95_ms"]:
+        # Un ciclo por minuto simulado: el worker aguanta mientras el ciclo quepa en 60 s / velocidad
+        print(f"Velocidad sostenible estimada: ~{60_000 / stats['ciclo_p95_ms']:,.0f}x (60 s de mercado / ciclo p95)")
+    if stats["refrescos"]:
+        print(f"Dashboard: {stats['refrescos']:,} refrescos · p50 {stats['refresco_p50_ms']:,.1f} ms, "
+              f"p95 {stats['refresco_p95_ms']:,.1f} ms")
+
+    print(f"\n{'latencia (ms reales)':<32} {'n':>7} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+    labels = {"total": "barra cerrada -> pantalla", "ingesta": "barra cerrada -> guardada",
+              "dashboard": "guardada -> pantalla"}
+    for name, label in labels.items():
+        latency = stats["latencia"][name]
+        if latency["n"]:
+            print(f"{label:<32} {latency['n']:>7,} {latency['p50_ms']:>9,.1f} {latency['p90_ms']:>9,.1f} "
+                  f"{latency['p99_ms']:>9,.1f} {latency['max_ms']:>9,.1f}")
+
+    status = "✅" if stats["filas_en_bd"] == stats["barras"] else "⚠️"
+    print(f"\n{status} {stats['filas_en_bd']:,} filas en la base de datos de {stats['barras']:,} barras grabadas")
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproducción acelerada de barras grabadas por ingesta, Supabase y dashboard")
+    parser.add_argument("--archivo", default=None, help="Barras grabadas (CSV o Parquet); por defecto, sintéticas")
+    parser.add_argument("--grabar", default=None, help="Guardar barras sintéticas en este archivo y salir")
+    parser.add_argument("--filas", type=int, default=390, help="Barras sintéticas por ticker")
+    parser.add_argument("--velocidad", default="100", help="Minutos simulados por minuto real (10-1000) o 'max'")
+    parser.add_argument("--tickers", type=int, default=10, help="Tickers reproducidos (se repiten si la grabación tiene menos)")
+    parser.add_argument("--historial", type=int, default=60, help="Minutos ya guardados antes de empezar")
+    parser.add_argument("--minutos", type=int, default=None, help="Minutos a reproducir (por defecto, toda la grabación)")
+    parser.add_argument("--pantallas", type=int, default=1, help="Sesiones del dashboard, cada una con un ticker")
+    parser.add_argument("--refresco", type=float, default=DEFAULT_REFRESH_S, help="Segundos simulados entre refrescos del dashboard")
+    parser.add_argument("--backend", choices=["memoria", "rest"], default="memoria",
+                        help="Supabase local en proceso o servidor REST con el cliente real")
+    parser.add_argument("--sin-dedup", action="store_true", help="No usar el índice local de barras ya ingeridas")
+    parser.add_argument("--agregados", action="store_true", help="Mantener también los agregados 5m/15m/1h/1d")
+    parser.add_argument("--salida", default=None, help="Guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    if args.grabar:
+        bars = synthetic_ohlcv(args.filas, [f"T{i:03d}" for i in range(args.tickers)])
+        if args.grabar.endswith((".parquet", ".pq")):
+            bars.to_parquet(args.grabar, index=False)
+        else:
+            bars.to_csv(args.grabar, index=False)
+        print(f"{len(bars):,} barras de {args.tickers} tickers guardadas en {args.grabar}")
+        return
+
+    bars = load_recording(args.archivo) if args.archivo else synthetic_ohlcv(args.filas, ["AAPL"])
+    bars = scale_tickers(bars, args.tickers)
+    speedup = None if args.velocidad == "max" else float(args.velocidad)
+
+    end = "\r" if sys.stdout.isatty() else "\n"
+    last = {"segundos": float("-inf")}
+
+    def progress(cycle, now, result):
+        if time.perf_counter() - last["segundos"] >= 1.0:
+            last["segundos"] = time.perf_counter()
+            print(f"ciclo {cycle:,} · {now:%H:%M} simulado · {result['aceptados']:,} barras · "
+                  f"{result['duracion_s'] * 1000:,.0f} ms", end=end, flush=True)
+
+    stats = replay(bars, speedup=speedup, history_minutes=args.historial, minutes=args.minutos,
+                   screens=args.pantallas, refresh_s=args.refresco, backend=args.backend,
+                   dedup=not args.sin_dedup, rollups=args.agregados, progress=progress)
+    print_report(stats, args.backend)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({"backend": args.backend, **stats}, f, indent=2)
+        print(f"Resultados guardados en {args.salida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Generador de barras OHLCV sintéticas y sustituto local de yf.download
+
+Las barras son deterministas (misma semilla y ticker, mismos datos), con precios en
+paseo aleatorio, high/low coherentes con open/close y volumen entero positivo
+"""
+import zlib
+
+import numpy as np
+import pandas as pd
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+def _utc(value):
+    value = pd.Timestamp(value)
+    return value.tz_localize("UTC") if value.tz is None else value.tz_convert("UTC")
+
+def _ticker_seed(ticker, seed):
+    return zlib.crc32(ticker.encode()) ^ seed
+
+def synthetic_ohlcv(rows, tickers=("AAPL",), start="2024-01-02 14:30", seed=0, freq="min"):
+    """
+    `rows` barras de 1 minuto por ticker en formato de la tabla apple_stock_data
+    (ticker, timestamp UTC, open, high, low, close, volume), en orden cronológico
+    """
+    timestamps = pd.date_range(_utc(start), periods=rows, freq=freq)
+    frames = []
+    for ticker in tickers:
+        rng = np.random.default_rng(_ticker_seed(ticker, seed))
+        base = rng.uniform(20, 500)
+        close = np.maximum(base + np.cumsum(rng.normal(0, base * 0.0005, rows)), 1.0)
+        open_ = np.concatenate(([close[0]], close[:-1]))
+        spread = rng.uniform(0, base * 0.001, rows)
+        frames.append(pd.DataFrame({
+            "ticker": ticker,
+            "timestamp": timestamps,
+            "open": open_.round(2),
+            "high": (np.maximum(open_, close) + spread).round(2),
+            "low": (np.minimum(open_, close) - spread).round(2),
+            "close": close.round(2),
+            "volume": rng.integers(1_000, 500_000, rows)
+        }))
+    df = pd.concat(frames, ignore_index=True)
+    return df.sort_values(["timestamp", "ticker"], kind="stable", ignore_index=True)
+
+def to_supabase_rows(df):
+    """Filas JSON como las devuelve la API REST de Supabase"""
+    rows = df.assign(timestamp=df["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S+00:00"))
+    return rows.to_dict(orient="records")
+
+def synthetic_yf_download(tickers, rows, end=None, seed=0, group_by=None, tz="America/New_York"):
+    """
+    DataFrame con la misma forma que yf.download: índice Datetime (hora de Nueva York) y
+    columnas (Price, Ticker), o (Ticker, Price) con group_by='ticker'
+    """
+    if isinstance(tickers, str):
+        tickers = [tickers]
+    end = (_utc(end) if end is not None else pd.Timestamp.now(tz="UTC")).floor("min")
+    start = end - pd.Timedelta(minutes=rows - 1)
+
+    long = synthetic_ohlcv(rows, tickers, start=start, seed=seed)
+    long = long.rename(columns={c.lower(): c for c in OHLCV_COLUMNS})
+    wide = long.pivot(index="timestamp", columns="ticker", values=OHLCV_COLUMNS)
+    wide.index = wide.index.tz_convert(tz).rename("Datetime")
+    wide.columns = wide.columns.set_names(["Price", "Ticker"])
+
+    if group_by == "ticker":
+        wide = wide.swaplevel(axis=1)
+        wide = wide[[(ticker, price) for ticker in tickers for price in OHLCV_COLUMNS]]
+        wide.columns = wide.columns.set_names(["Ticker", "Price"])
+    return wide
+
+class FakeYahoo:
+    """
+    Sustituto de yf.download para benchmarks y pruebas: devuelve barras sintéticas
+    en lugar de llamar a Yahoo Finance. `bars` es el número de barras de period='1d'
+    """
+
+    def __init__(self, bars=390, seed=0, now=None):
+        self.bars = bars
+        self.seed = seed
+        self.now = now
+        self.calls = 0
+
+    def download(self, tickers, period=None, interval="1m", start=None, end=None, group_by=None, **kwargs):
+        self.calls += 1
+        now = _utc(self.now) if self.now is not None else pd.Timestamp.now(tz="UTC")
+        if end is not None:
+            now = min(now, _utc(end))
+
+        rows = self.bars
+        if start is not None:
+            start = _utc(start)
+            rows = int((now.floor("min") - start.ceil("min")) / pd.Timedelta(minutes=1)) + 1
+        if rows <= 0:
+            return pd.DataFrame()
+        return synthetic_yf_download(tickers, rows, end=now, seed=self.seed, group_by=group_by)
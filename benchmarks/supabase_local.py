@@ -0,0 +1,531 @@
+"""
+Sustituto local de Supabase para benchmarks y pruebas
+
+- LocalStore: tablas en memoria (DataFrame) con restricciones UNIQUE, filtros
+  vectorizados y el subconjunto de PostgREST que usa el proyecto (select con
+  eq/neq/gt/gte/lt/lte/in/or, order, limit, insert y upsert)
+- LocalSupabase: cliente en proceso con la misma interfaz encadenada que supabase-py
+- serve(): servidor REST local (/rest/v1/<tabla>) para usar el cliente real
+  create_client("http://127.0.0.1:<puerto>", ...) sin red
+
+Uso:
+    python benchmarks/supabase_local.py --puerto 54321 --filas 10000 --tickers AAPL,MSFT
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+
+# Restricciones UNIQUE de las tablas del proyecto (on_conflict de los upserts)
+UNIQUE_KEYS = {
+    "apple_stock_data": ("ticker", "timestamp"),
+    "stock_rollups": ("ticker", "resolution", "bucket")
+}
+
+TIMESTAMP_COLUMNS = {"timestamp", "bucket", "first_ts", "last_ts"}
+
+class LocalAPIError(Exception):
+    """Error con el formato de PostgREST (code, message)"""
+
+    def __init__(self, code, message, status=400):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status = status
+
+def _timestamp_key(value):
+    value = pd.Timestamp(value)
+    return (value.tz_localize("UTC") if value.tz is None else value).value
+
+def _timestamp_keys(series):
+    """Nanosegundos desde epoch de una columna de timestamps con zona (sin objetos Python)"""
+    values = series.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+    return values.view("i8").tolist()
+
+def _split_top_level(text):
+    """Separa por comas que no estén dentro de paréntesis ni comillas"""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == "," and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+def _unquote(value):
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+class _Table:
+    def __init__(self, name):
+        self.name = name
+        self.unique = UNIQUE_KEYS.get(name)
+        self.frame = pd.DataFrame()
+        self.pending = []
+        self.updates = {}
+        self.index = {}
+        self.next_id = 1
+
+    def _key(self, row):
+        return tuple(
+            _timestamp_key(row[column]) if column in TIMESTAMP_COLUMNS else row[column]
+            for column in self.unique
+        )
+
+    def _normalize(self, frame):
+        for column in frame.columns:
+            if column in TIMESTAMP_COLUMNS:
+                frame[column] = pd.to_datetime(frame[column], utc=True, format="ISO8601")
+        return frame
+
+    def materialize(self):
+        """Incorpora las filas pendientes al DataFrame (solo cuando se lee)"""
+        if self.pending:
+            new = self._normalize(pd.DataFrame(self.pending))
+            self.frame = new if self.frame.empty else pd.concat([self.frame, new], ignore_index=True)
+            self.pending = []
+        if self.updates:
+            for position, row in self.updates.items():
+                for column, value in row.items():
+                    if column in TIMESTAMP_COLUMNS:
+                        value = pd.Timestamp(value).tz_convert("UTC")
+                    self.frame.at[position, column] = value
+            self.updates = {}
+        return self.frame
+
+    def load(self, df):
+        """Carga masiva de un DataFrame (para sembrar benchmarks sin pasar por inserts)"""
+        frame = self._normalize(df.reset_index(drop=True).copy())
+        if "id" not in frame.columns:
+            frame.insert(0, "id", np.arange(self.next_id, self.next_id + len(frame)))
+        self.materialize()
+        offset = len(self.frame)
+        if self.unique:
+            keys = zip(*(
+                _timestamp_keys(frame[c]) if c in TIMESTAMP_COLUMNS else frame[c].tolist()
+                for c in self.unique
+            ))
+            for position, key in enumerate(keys, start=offset):
+                self.index[key] = position
+        self.frame = frame if self.frame.empty else pd.concat([self.frame, frame], ignore_index=True)
+        self.next_id += len(frame)
+
+    def __len__(self):
+        return len(self.frame) + len(self.pending)
+
+    def row_at(self, position):
+        """Fila por posición (materializada o pendiente) con las actualizaciones aplicadas"""
+        if position < len(self.frame):
+            row = self.frame.iloc[position].to_dict()
+        else:
+            row = dict(self.pending[position - len(self.frame)])
+        row.update(self.updates.get(position, {}))
+        for column in TIMESTAMP_COLUMNS & row.keys():
+            row[column] = pd.Timestamp(row[column]).tz_convert("UTC").strftime("%Y-%m-%dT%H:%M:%S+00:00")
+        return row
+
+    def write(self, rows, on_conflict=None, resolution=None):
+        """
+        Inserta filas (insert) o las combina (upsert). resolution: None (error si hay
+        duplicado), 'merge-duplicates' (sobrescribe) o 'ignore-duplicates' (descarta)
+        Devuelve las filas escritas
+        """
+        written = []
+        for row in rows:
+            row = dict(row)
+            key = self._key(row) if self.unique else None
+            position = self.index.get(key) if key is not None else None
+
+            if position is not None:
+                if resolution == "merge-duplicates":
+                    self.updates.setdefault(position, {}).update(row)
+                    written.append(row)
+                elif resolution != "ignore-duplicates":
+                    raise LocalAPIError(
+                        "23505",
+                        f'duplicate key value violates unique constraint "{self.name}_{"_".join(self.unique)}_key"',
+                        status=409
+                    )
+                continue
+
+            row.setdefault("id", self.next_id)
+            self.next_id += 1
+            if key is not None:
+                self.index[key] = len(self)
+            self.pending.append(row)
+            written.append(row)
+        return written
+
+class LocalStore:
+    """Base de datos en memoria compartida por el cliente en proceso y el servidor REST"""
+
+    def __init__(self):
+        self.tables = {}
+        self.lock = threading.Lock()
+        self.stats = {"consultas": 0, "escrituras": 0, "filas_leidas": 0, "filas_escritas": 0}
+
+    def table(self, name):
+        if name not in self.tables:
+            self.tables[name] = _Table(name)
+        return self.tables[name]
+
+    def load(self, name, df):
+        with self.lock:
+            self.table(name).load(df)
+
+    def row_count(self, name):
+        return len(self.tables[name]) if name in self.tables else 0
+
+    # ----- lectura -----
+
+    def _condition(self, frame, column, expression):
+        """Máscara de una condición PostgREST 'op.valor' sobre una columna"""
+        operator, _, raw = expression.partition(".")
+        negate = operator == "not"
+        if negate:
+            operator, _, raw = raw.partition(".")
+
+        series = frame[column]
+        if operator == "in":
+            values = [_unquote(v) for v in _split_top_level(raw.strip("()"))]
+            values = [self._convert(series, v) for v in values]
+            mask = series.isin(values).to_numpy()
+        elif operator == "is":
+            mask = series.isna().to_numpy() if raw == "null" else series.notna().to_numpy()
+        else:
+            value = self._convert(series, _unquote(raw))
+            if operator == "eq":
+                mask = (series == value).to_numpy()
+            elif operator == "neq":
+                mask = (series != value).to_numpy()
+            elif operator == "gt":
+                mask = (series > value).to_numpy()
+            elif operator == "gte":
+                mask = (series >= value).to_numpy()
+            elif operator == "lt":
+                mask = (series < value).to_numpy()
+            elif operator == "lte":
+                mask = (series <= value).to_numpy()
+            else:
+                raise LocalAPIError("PGRST100", f"Operador no soportado: {operator}")
+        return ~mask if negate else mask
+
+    def _convert(self, series, value):
+        if isinstance(series.dtype, pd.DatetimeTZDtype) or series.name in TIMESTAMP_COLUMNS:
+            value = pd.Timestamp(value)
+            return value.tz_localize("UTC") if value.tz is None else value
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            return float(value)
+        return value
+
+    def _logic(self, frame, expression, combine):
+        """or=(...) / and(...) con condiciones anidadas"""
+        masks = []
+        for part in _split_top_level(expression):
+            if part.startswith(("and(", "or(")):
+                name, _, inner = part.partition("(")
+                masks.append(self._logic(frame, inner[:-1], np.logical_and if name == "and" else np.logical_or))
+            else:
+                column, _, condition = part.partition(".")
+                masks.append(self._condition(frame, column, condition))
+        return combine.reduce(masks) if masks else np.ones(len(frame), dtype=bool)
+
+    def _lookup(self, table, params):
+        """
+        Atajo para select ... eq(clave única completa): búsqueda en el índice UNIQUE sin
+        materializar ni recorrer la tabla (como la comprobación de duplicados fila a fila)
+        Devuelve None si la consulta no es de ese tipo
+        """
+        filters = {key: value for key, value in params if key not in ("select", "limit")}
+        if not table.unique or set(filters) != set(table.unique):
+            return None
+        if not all(value.startswith("eq.") for value in filters.values()):
+            return None
+
+        key = tuple(
+            _timestamp_key(_unquote(filters[c][3:])) if c in TIMESTAMP_COLUMNS else _unquote(filters[c][3:])
+            for c in table.unique
+        )
+        position = table.index.get(key)
+        if position is None:
+            return []
+
+        row = table.row_at(position)
+        columns = next((value for key, value in params if key == "select"), "*")
+        if columns != "*":
+            row = {c.strip(): row.get(c.strip()) for c in columns.split(",")}
+        return [row]
+
+    def select(self, name, params):
+        """
+        Ejecuta un GET de PostgREST. `params`: lista de (clave, valor) como en la query string
+        """
+        with self.lock:
+            self.stats["consultas"] += 1
+            table = self.table(name)
+            rows = self._lookup(table, params)
+            if rows is not None:
+                self.stats["filas_leidas"] += len(rows)
+                return rows
+
+            frame = table.materialize()
+
+            columns, orders, limit, offset = None, [], None, 0
+            mask = np.ones(len(frame), dtype=bool)
+            for key, value in params:
+                if key == "select":
+                    columns = [c.strip() for c in value.split(",") if c.strip()]
+                elif key == "order":
+                    orders = [item.split(".") for item in value.split(",")]
+                elif key == "limit":
+                    limit = int(value)
+                elif key == "offset":
+                    offset = int(value)
+                elif key in ("or", "and"):
+                    mask &= self._logic(frame, value.strip()[1:-1], np.logical_or if key == "or" else np.logical_and)
+                elif key not in ("on_conflict", "columns"):
+                    if key not in frame.columns:
+                        if frame.empty:
+                            return []
+                        raise LocalAPIError("42703", f"column {name}.{key} does not exist")
+                    mask &= self._condition(frame, key, value)
+
+            result = frame[mask] if len(frame) else frame
+            if orders and len(result):
+                result = result.sort_values(
+                    [order[0] for order in orders],
+                    ascending=[len(order) < 2 or order[1] != "desc" for order in orders],
+                    kind="stable"
+                )
+            end = offset + limit if limit is not None else None
+            result = result.iloc[offset:end]
+            if columns and columns != ["*"]:
+                result = result[[c for c in columns if c in result.columns]]
+
+            rows = self._to_json_rows(result)
+            self.stats["filas_leidas"] += len(rows)
+            return rows
+
+    @staticmethod
+    def _to_json_rows(frame):
+        frame = frame.copy()
+        for column in frame.columns:
+            if isinstance(frame[column].dtype, pd.DatetimeTZDtype):
+                frame[column] = frame[column].dt.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+        return frame.to_dict(orient="records")
+
+    # ----- escritura -----
+
+    def write(self, name, rows, on_conflict=None, resolution=None):
+        if isinstance(rows, dict):
+            rows = [rows]
+        with self.lock:
+            self.stats["escrituras"] += 1
+            written = self.table(name).write(rows, on_conflict, resolution)
+            self.stats["filas_escritas"] += len(written)
+            return written
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+        self.count = None
+
+class _LocalQuery:
+    """Consulta encadenada con la interfaz de supabase-py que se traduce a parámetros PostgREST"""
+
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        self.params = []
+        self.orders = []
+        self.payload = None
+        self.on_conflict = None
+        self.resolution = None
+
+    def select(self, columns="*", **kwargs):
+        self.params.append(("select", columns.replace(" ", "")))
+        return self
+
+    def _filter(self, column, expression):
+        self.params.append((column, expression))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, f"eq.{value}")
+
+    def neq(self, column, value):
+        return self._filter(column, f"neq.{value}")
+
+    def gt(self, column, value):
+        return self._filter(column, f"gt.{value}")
+
+    def gte(self, column, value):
+        return self._filter(column, f"gte.{value}")
+
+    def lt(self, column, value):
+        return self._filter(column, f"lt.{value}")
+
+    def lte(self, column, value):
+        return self._filter(column, f"lte.{value}")
+
+    def in_(self, column, values):
+        return self._filter(column, "in.(" + ",".join(f'"{v}"' for v in values) + ")")
+
+    def or_(self, filters):
+        self.params.append(("or", f"({filters})"))
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append(f"{column}.{'desc' if desc else 'asc'}")
+        return self
+
+    def limit(self, size):
+        self.params.append(("limit", str(size)))
+        return self
+
+    def insert(self, rows, **kwargs):
+        self.payload = rows
+        return self
+
+    def upsert(self, rows, on_conflict="", ignore_duplicates=False, **kwargs):
+        self.payload = rows
+        self.on_conflict = on_conflict
+        self.resolution = "ignore-duplicates" if ignore_duplicates else "merge-duplicates"
+        return self
+
+    def execute(self):
+        if self.payload is not None:
+            return _Response(self.store.write(self.name, self.payload, self.on_conflict, self.resolution))
+        params = self.params + ([("order", ",".join(self.orders))] if self.orders else [])
+        return _Response(self.store.select(self.name, params))
+
+class LocalSupabase:
+    """Cliente en proceso: misma interfaz que supabase.Client para las tablas del proyecto"""
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else LocalStore()
+
+    def table(self, name):
+        return _LocalQuery(self.store, name)
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "SupabaseLocal/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload=None):
+        body = json.dumps(payload if payload is not None else []).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        parts = urlsplit(self.path)
+        prefix = "/rest/v1/"
+        if not parts.path.startswith(prefix):
+            self._send(404, {"code": "PGRST125", "message": f"Ruta no encontrada: {parts.path}"})
+            return None, None
+        return parts.path[len(prefix):], parse_qsl(parts.query, keep_blank_values=True)
+
+    def _inject_faults(self):
+        """Latencia y errores 503 simulados (configurables al arrancar el servidor)"""
+        if self.server.latency_s:
+            time.sleep(self.server.latency_s)
+        if self.server.error_rate and self.server.random.random() < self.server.error_rate:
+            self._send(503, {"code": "PGRST000", "message": "Servicio no disponible (simulado)"})
+            return True
+        return False
+
+    def do_GET(self):
+        name, params = self._route()
+        if name is None or self._inject_faults():
+            return
+        try:
+            self._send(200, self.server.store.select(name, params))
+        except LocalAPIError as e:
+            self._send(e.status, {"code": e.code, "message": e.message})
+
+    def do_POST(self):
+        name, params = self._route()
+        if name is None:
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"[]")
+        if self._inject_faults():
+            return
+
+        prefer = self.headers.get("Prefer", "")
+        resolution = next(
+            (item.split("=", 1)[1] for item in prefer.split(",") if item.strip().startswith("resolution=")),
+            None
+        )
+        on_conflict = dict(params).get("on_conflict")
+        try:
+            written = self.server.store.write(name, body, on_conflict, resolution)
+        except LocalAPIError as e:
+            self._send(e.status, {"code": e.code, "message": e.message, "details": None, "hint": None})
+            return
+        self._send(201, written if "return=representation" in prefer else [])
+
+def serve(store=None, host="127.0.0.1", port=0, latency_s=0.0, error_rate=0.0, seed=0):
+    """
+    Arranca el servidor REST local en un hilo. Devuelve (servidor, url base)
+    port=0 elige un puerto libre; server.shutdown() lo detiene
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.store = store if store is not None else LocalStore()
+    server.latency_s = latency_s
+    server.error_rate = error_rate
+    server.random = random.Random(seed)
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def main():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from sinteticos import synthetic_ohlcv
+
+    parser = argparse.ArgumentParser(description="Servidor REST local que imita Supabase (apple_stock_data)")
+    parser.add_argument("--puerto", type=int, default=54321)
+    parser.add_argument("--filas", type=int, default=10_000, help="Barras sintéticas por ticker a precargar")
+    parser.add_argument("--tickers", default="AAPL")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="Latencia añadida a cada petición")
+    parser.add_argument("--errores", type=float, default=0.0, help="Fracción de peticiones que responden 503")
+    args = parser.parse_args()
+
+    store = LocalStore()
+    tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+    if args.filas:
+        start = pd.Timestamp.now(tz="UTC").floor("min") - pd.Timedelta(minutes=args.filas)
+        store.load("apple_stock_data", synthetic_ohlcv(args.filas, tickers, start=start))
+
+    server, url = serve(store, port=args.puerto, latency_s=args.latencia_ms / 1000, error_rate=args.errores)
+    print(f"Supabase local en {url} ({store.row_count('apple_stock_data'):,} filas)")
+    print(f"Dashboard: SUPABASE_URL={url} SUPABASE_KEY=local.supabase.key streamlit run app_streamlit.py")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
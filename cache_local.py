@@ -0,0 +1,168 @@
+import pandas as pd
+import os
+import threading
+import time
+
+# Columnas de apple_stock_data que usa el dashboard y sus tipos ya convertidos
+COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+
+CACHE_DIR = os.getenv(
+    "CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+)
+
+def rows_to_frame(rows, columns=COLUMNS):
+    """
+    Convierte la respuesta de Supabase (lista de dicts) a un DataFrame ya tipado
+    """
+    df = pd.DataFrame(rows, columns=columns)
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+    df[PRICE_COLUMNS] = df[PRICE_COLUMNS].astype("float64")
+    df["volume"] = df["volume"].astype("int64")
+    return df
+
+class CacheLocal:
+    """
+    Caché local de apple_stock_data por ticker, compartida entre sesiones
+
+    - En memoria: DataFrame tipado y ordenado (más reciente primero)
+    - En disco: un Parquet por ticker para sobrevivir a reinicios
+    - Refresco delta: solo se piden las filas más nuevas que la última en caché
+    - Expulsión por tamaño (max_rows) y por antigüedad (max_age_s)
+    """
+
+    def __init__(self, directory=CACHE_DIR, ttl_s=30, max_rows=10000, max_age_s=7 * 24 * 3600, page_size=1000):
+        self.directory = directory
+        self.ttl_s = ttl_s
+        self.max_rows = max_rows
+        self.max_age_s = max_age_s
+        self.page_size = page_size
+
+        self._frames = {}
+        self._refreshed_at = {}
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "consultas_delta": 0,
+            "filas_delta": 0,
+            "filas_servidas": 0,
+            "filas_expulsadas": 0
+        }
+
+    def _path(self, ticker):
+        return os.path.join(self.directory, f"{ticker}.parquet")
+
+    def _load_from_disk(self, ticker):
+        try:
+            return pd.read_parquet(self._path(ticker))
+        except Exception:
+            # Sin archivo o sin pyarrow: se empieza con la caché vacía
+            return None
+
+    def _save_to_disk(self, ticker, frame):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self._path(ticker)}.tmp"
+            frame.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self._path(ticker))
+        except Exception:
+            # La caché en disco es opcional (requiere pyarrow)
+            pass
+
+    def _fetch_newer(self, supabase, ticker, newest):
+        """
+        Descarga solo las filas posteriores a `newest` (o las últimas max_rows si no hay caché)
+        """
+        if newest is None:
+            # Carga en frío en páginas de page_size (la API REST corta cada respuesta a 1000
+            # filas), de la más reciente a la más antigua hasta max_rows
+            # (import local: consultas importa este módulo)
+            from consultas import iter_filtered_pages
+
+            frames = []
+            for rows in iter_filtered_pages(supabase, [ticker], page_size=self.page_size,
+                                            row_budget=self.max_rows, descending=True):
+                self.stats["consultas_delta"] += 1
+                frames.append(rows_to_frame(rows))
+            if not frames:
+                return rows_to_frame([])
+            return pd.concat(frames, ignore_index=True)
+
+        frames = []
+        cursor = newest
+        while True:
+            resp = supabase.table("apple_stock_data")\
+                .select(", ".join(COLUMNS))\
+                .eq("ticker", ticker)\
+                .gt("timestamp", cursor.isoformat())\
+                .order("timestamp")\
+                .limit(self.page_size)\
+                .execute()
+            self.stats["consultas_delta"] += 1
+
+            if not resp.data:
+                break
+            page = rows_to_frame(resp.data)
+            frames.append(page)
+            if len(page) < self.page_size:
+                break
+            cursor = page["timestamp"].iloc[-1]
+
+        if not frames:
+            return rows_to_frame([])
+        return pd.concat(frames, ignore_index=True)
+
+    def _evict(self, frame):
+        """
+        Aplica la expulsión por antigüedad y por tamaño (el frame viene ordenado desc)
+        """
+        before = len(frame)
+        cutoff = pd.Timestamp.now(tz="UTC") - pd.Timedelta(seconds=self.max_age_s)
+        frame = frame[frame["timestamp"] >= cutoff].head(self.max_rows)
+        self.stats["filas_expulsadas"] += before - len(frame)
+        return frame.reset_index(drop=True)
+
+    def get(self, supabase, ticker):
+        """
+        Devuelve las filas en caché del ticker (más reciente primero), refrescando
+        con un delta si pasó el TTL. El DataFrame devuelto es una copia superficial:
+        añadirle columnas no altera la caché
+        """
+        with self._lock:
+            frame = self._frames.get(ticker)
+            if frame is None:
+                frame = self._load_from_disk(ticker)
+
+            fresh = time.monotonic() - self._refreshed_at.get(ticker, float("-inf")) < self.ttl_s
+
+            if frame is not None and fresh:
+                self.stats["hits"] += 1
+            else:
+                self.stats["misses"] += 1
+                newest = frame["timestamp"].iloc[0] if frame is not None and not frame.empty else None
+                new_rows = self._fetch_newer(supabase, ticker, newest)
+                self.stats["filas_delta"] += len(new_rows)
+
+                if newest is None:
+                    # Carga inicial: la consulta ya viene ordenada desc
+                    frame = self._evict(new_rows)
+                    self._save_to_disk(ticker, frame)
+                elif not new_rows.empty:
+                    # Las filas nuevas (asc) van delante, invertidas, sin reordenar todo
+                    frame = self._evict(pd.concat([new_rows.iloc[::-1], frame], ignore_index=True))
+                    self._save_to_disk(ticker, frame)
+                else:
+                    frame = self._evict(frame)
+
+                self._frames[ticker] = frame
+                self._refreshed_at[ticker] = time.monotonic()
+
+            self.stats["filas_servidas"] += len(frame)
+            return frame.copy(deep=False)
+
+    def hit_ratio(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
@@ -0,0 +1,142 @@
+"""
+Caché de vistas del dashboard: resultados memoizados por (versión de los datos, filtros)
+
+Un rerun en el que no cambian ni los datos ni los filtros (un clic en otro widget, abrir
+un expander...) no necesita volver a filtrar, agrupar ni construir las gráficas. Cada
+resultado derivado (DataFrame filtrado, tabla en Arrow, agregados, figuras con su huella
+de payload) se guarda bajo una clave que incluye la versión de la instantánea de datos
+y la tupla normalizada de filtros, así que una clave nunca devuelve datos caducados.
+
+- LRU acotada por memoria (bytes estimados de cada entrada), no por número de entradas
+- Compartida por todas las sesiones (st.cache_resource): mismas claves, mismo resultado
+- Contadores de aciertos/fallos/expulsiones para el panel de diagnóstico
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time
+
+import pandas as pd
+
+# Memoria máxima de la caché (bytes estimados)
+DEFAULT_MAX_BYTES = int(float(os.getenv("CACHE_VISTAS_MB", "128")) * 1024 * 1024)
+
+def _normalize(value):
+    """Valor de filtro -> algo hashable y estable (fechas en ISO, floats redondeados)"""
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, (datetime, date, time, pd.Timestamp)):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return tuple(sorted((key, _normalize(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(item) for item in value)
+    return repr(value)
+
+def filter_key(**filters):
+    """Tupla normalizada de filtros, ordenada por nombre: mismos filtros = misma clave"""
+    return tuple((name, _normalize(value)) for name, value in sorted(filters.items()))
+
+def data_version(ticker, snapshot_version, df, origin="cache"):
+    """
+    Versión de los datos de una vista: instantánea compartida + origen (caché o consulta en
+    el servidor) + filas y última barra, por si el DataFrame se completó con barras nuevas
+    """
+    newest = df["timestamp"].max().isoformat() if not df.empty else None
+    return ticker, snapshot_version, origin, len(df), newest
+
+def arrow_table(df):
+    """
+    DataFrame -> pyarrow.Table, la misma conversión que hace st.dataframe en cada rerun
+    (guardada en la caché, el rerun solo serializa la tabla). Sin pyarrow, el DataFrame
+    """
+    try:
+        import pyarrow as pa
+        return pa.Table.from_pandas(df)
+    except Exception:
+        return df
+
+def estimate_bytes(value):
+    """Memoria aproximada de una entrada (DataFrames, tablas Arrow, figuras, tuplas de ellos)"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if hasattr(value, "nbytes"):
+        # pyarrow.Table, arrays de numpy
+        return int(value.nbytes)
+    if hasattr(value, "to_plotly_json"):
+        import plotly.io as pio
+        return len(pio.to_json(value, validate=False))
+    if isinstance(value, dict):
+        return sum(estimate_bytes(item) for item in value.values()) + 64 * len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_bytes(item) for item in value) + 8 * len(value)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return 64
+
+class ViewCache:
+    """
+    Memoización LRU acotada por bytes
+    get(clave, construir) devuelve (valor, acierto); construir() solo se llama en un fallo
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.stats = {"aciertos": 0, "fallos": 0, "expulsiones": 0, "demasiado_grandes": 0}
+
+    def get(self, key, build, size=None):
+        """
+        Valor de `key`, construido con build() si no está. `size` (opcional) calcula los
+        bytes de la entrada; por defecto estimate_bytes. Las excepciones de build() se
+        propagan y no se guarda nada
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["aciertos"] += 1
+                return entry[0], True
+            self.stats["fallos"] += 1
+
+        # Fuera del lock: dos sesiones pueden construir la misma clave a la vez (mismo resultado)
+        value = build()
+        nbytes = size(value) if size is not None else estimate_bytes(value)
+
+        with self._lock:
+            if nbytes > self.max_bytes:
+                self.stats["demasiado_grandes"] += 1
+                return value, False
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            # Expulsar las menos usadas hasta caber en el presupuesto
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.stats["expulsiones"] += 1
+        return value, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def hit_ratio(self):
+        total = self.stats["aciertos"] + self.stats["fallos"]
+        return self.stats["aciertos"] / total if total else 0.0
+
+    def memory_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
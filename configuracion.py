@@ -0,0 +1,79 @@
+import os
+
+# Función para cargar variables de entorno de forma robusta
+def load_environment_variables():
+    """Carga las variables de entorno desde .env de forma segura"""
+
+    # Ya definidas (despliegue, contenedor): sin leer .env ni recorrer directorios con find_dotenv()
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_KEY")
+    if url and key:
+        return url, key
+
+    from dotenv import load_dotenv, find_dotenv
+    
+    # Obtener el directorio del script actual
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    env_path = os.path.join(script_dir, '.env')
+    
+    # Intentar múltiples métodos para cargar el .env
+    loaded = False
+    
+    # Método 1: Usar la ruta específica
+    if os.path.exists(env_path):
+        loaded = load_dotenv(dotenv_path=env_path)
+    
+    # Método 2: Usar find_dotenv() si el método 1 falla
+    if not loaded:
+        dotenv_path = find_dotenv()
+        if dotenv_path:
+            loaded = load_dotenv(dotenv_path)
+    
+    # Método 3: Buscar en el directorio actual
+    if not loaded:
+        current_dir_env = os.path.join(os.getcwd(), '.env')
+        if os.path.exists(current_dir_env):
+            loaded = load_dotenv(dotenv_path=current_dir_env)
+    
+    # Obtener variables
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_KEY")
+    
+    return url, key
+
+def get_supabase_client():
+    """
+    Crea el cliente de Supabase a partir de las variables de entorno
+    Lanza ValueError si faltan SUPABASE_URL o SUPABASE_KEY
+    """
+    url, key = load_environment_variables()
+
+    if not url or not key:
+        raise ValueError("Variables de entorno no encontradas (SUPABASE_URL, SUPABASE_KEY)")
+
+    # supabase se importa al crear el cliente (~180 ms): los procesos que no lo usan no lo pagan
+    from supabase import create_client, Client
+
+    supabase: Client = create_client(url, key)
+    return supabase
+
+def load_tickers(default=("AAPL",)):
+    """
+    Lista de tickers a seguir: variable TICKERS (separados por coma)
+    o archivo TICKERS_FILE / tickers.txt (uno por línea, # para comentarios)
+    """
+    env_tickers = os.getenv("TICKERS")
+    if env_tickers:
+        return [t.strip().upper() for t in env_tickers.split(",") if t.strip()]
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    tickers_path = os.getenv("TICKERS_FILE", os.path.join(script_dir, "tickers.txt"))
+
+    if os.path.exists(tickers_path):
+        with open(tickers_path, encoding="utf-8") as f:
+            tickers = [line.split("#")[0].strip().upper() for line in f]
+        tickers = [t for t in tickers if t]
+        if tickers:
+            return tickers
+
+    return list(default)
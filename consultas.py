@@ -0,0 +1,112 @@
+import pandas as pd
+import os
+
+from cache_local import COLUMNS, rows_to_frame
+
+# Filas por página (el máximo que devuelve la API REST de Supabase por defecto es 1000)
+DEFAULT_PAGE_SIZE = 1000
+
+# Tope de filas por consulta filtrada (configurable)
+DEFAULT_ROW_BUDGET = int(os.getenv("CONSULTA_MAX_FILAS", "50000"))
+
+def date_range_bounds(date_range):
+    """
+    Convierte un rango de fechas inclusivo (date, date) a [inicio, fin) en UTC
+    """
+    start = pd.Timestamp(date_range[0], tz="UTC")
+    end = pd.Timestamp(date_range[1], tz="UTC") + pd.Timedelta(days=1)
+    return start, end
+
+def apply_predicates(query, tickers=None, start=None, end=None, price_range=None, volume_range=None):
+    """
+    Traduce los filtros del dashboard a predicados del servidor (eq/in, gte, lt, lte)
+    Los extremos None de un rango no generan predicado
+    """
+    if tickers:
+        query = query.eq("ticker", tickers[0]) if len(tickers) == 1 else query.in_("ticker", list(tickers))
+    if start is not None:
+        query = query.gte("timestamp", start.isoformat())
+    if end is not None:
+        query = query.lt("timestamp", end.isoformat())
+
+    for column, value_range in (("close", price_range), ("volume", volume_range)):
+        if value_range is None:
+            continue
+        low, high = value_range
+        if low is not None:
+            query = query.gte(column, low)
+        if high is not None:
+            query = query.lte(column, high)
+
+    return query
+
+def iter_filtered_pages(supabase, tickers=None, start=None, end=None, price_range=None, volume_range=None,
+                        page_size=DEFAULT_PAGE_SIZE, row_budget=DEFAULT_ROW_BUDGET, columns=COLUMNS,
+                        descending=False):
+    """
+    Recorre los resultados filtrados en páginas con paginación keyset (timestamp, ticker)
+    en orden cronológico: cada página continúa después de la última fila de la anterior,
+    sin OFFSET. Devuelve las filas JSON de cada página hasta agotar el resultado o `row_budget`
+    Con `descending` se recorre del más reciente al más antiguo: si se alcanza `row_budget`,
+    lo que queda fuera son las filas más antiguas
+    """
+    multi_ticker = not tickers or len(tickers) > 1
+    select_columns = list(columns) + (["ticker"] if multi_ticker and "ticker" not in columns else [])
+
+    cursor = None
+    remaining = row_budget
+
+    while remaining > 0:
+        query = supabase.table("apple_stock_data").select(", ".join(select_columns))
+        query = apply_predicates(query, tickers, start, end, price_range, volume_range)
+
+        if cursor is not None:
+            last_timestamp, last_ticker = cursor
+            after = "lt" if descending else "gt"
+            if multi_ticker:
+                # Con varios tickers el timestamp se repite: desempate por ticker
+                query = query.or_(
+                    f'timestamp.{after}."{last_timestamp}",'
+                    f'and(timestamp.eq."{last_timestamp}",ticker.{after}."{last_ticker}")'
+                )
+            else:
+                query = query.lt("timestamp", last_timestamp) if descending else query.gt("timestamp", last_timestamp)
+
+        query = query.order("timestamp", desc=descending)
+        if multi_ticker:
+            query = query.order("ticker", desc=descending)
+
+        limit = min(page_size, remaining)
+        rows = query.limit(limit).execute().data
+        if not rows:
+            break
+
+        yield rows
+
+        remaining -= len(rows)
+        if len(rows) < limit:
+            break
+        cursor = (rows[-1]["timestamp"], rows[-1].get("ticker"))
+
+def fetch_filtered(supabase, tickers=None, date_range=None, price_range=None, volume_range=None,
+                   page_size=DEFAULT_PAGE_SIZE, row_budget=DEFAULT_ROW_BUDGET):
+    """
+    Ejecuta la consulta filtrada en el servidor y devuelve (DataFrame tipado, truncado)
+    El DataFrame viene ordenado del más reciente al más antiguo, como el resto del dashboard
+    `truncado` indica que el resultado tiene más de `row_budget` filas: las páginas se
+    piden de la más reciente a la más antigua, así que las que faltan son las más antiguas
+    """
+    start, end = date_range_bounds(date_range) if date_range else (None, None)
+
+    # Se pide una fila más que el tope: solo si existe quedan filas fuera
+    frames = []
+    for rows in iter_filtered_pages(supabase, tickers, start, end, price_range, volume_range,
+                                    page_size=page_size, row_budget=row_budget + 1, descending=True):
+        frames.append(rows_to_frame(rows))
+
+    if not frames:
+        return rows_to_frame([]), False
+
+    df = pd.concat(frames, ignore_index=True)
+    truncated = len(df) > row_budget
+    return (df.head(row_budget) if truncated else df), truncated
@@ -0,0 +1,233 @@
+"""
+Fetcher de datos compartido por todas las sesiones del dashboard
+
+Sin él, cada pestaña abierta descarga de Yahoo Finance y consulta Supabase en cada
+autorefresco: el coste crece con el número de espectadores, no con los datos. Aquí
+hay una sola instancia por proceso (st.cache_resource) que, como mucho una vez por
+`interval_s` y ticker:
+
+- descarga las barras de Yahoo Finance e inserta las últimas (solo en modo embebido)
+- lee las filas del ticker con la caché local (consulta delta a Supabase)
+
+y publica el resultado como una instantánea inmutable. Las sesiones que llegan
+mientras se refresca esperan a ese refresco en lugar de lanzar otro, con un límite:
+si el refresco en curso pasa de `wait_timeout_s` (una consulta colgada), la siguiente
+sesión se hace cargo de la descarga en lugar de quedarse bloqueada. Los contadores
+muestran cuántas lecturas de sesión sirvió cada descarga.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from ingesta import insert_all_data_to_supabase
+from obtener_datos import obtener_datos
+
+# Segundos entre refrescos de un mismo ticker (el worker escribe una barra por minuto)
+DEFAULT_REFRESH_S = 30
+
+# Segundos que una sesión espera al refresco de otra antes de hacerse cargo de la descarga
+DEFAULT_WAIT_TIMEOUT_S = 20
+
+# Barras de Yahoo que se conservan y barras recientes que se insertan en modo embebido
+YAHOO_TAIL = 30
+INSERT_TAIL = 3
+
+# Instantánea publicada: namedtuple (inmutable); los DataFrames se entregan como copias
+# superficiales, así que añadirles columnas en una sesión no afecta a las demás
+Snapshot = namedtuple("Snapshot", [
+    "ticker", "version", "fetched_at", "data", "yahoo", "inserted", "errors", "waited"
+])
+
+def _stage(run, name, rows=None):
+    return run.stage(name, rows=rows) if run is not None else nullcontext({})
+
+class SharedFetcher:
+    """
+    Descarga de Yahoo + lectura de la base de datos, una vez por intervalo y ticker
+
+    get(supabase, ticker) devuelve la instantánea vigente; si está caducada, la primera
+    sesión la refresca y las que lleguen mientras tanto esperan al resultado (como mucho
+    `wait_timeout_s` desde que empezó ese refresco; después lo relevan)
+    """
+
+    def __init__(self, local_cache, interval_s=DEFAULT_REFRESH_S, download=False, history=100,
+                 wait_timeout_s=DEFAULT_WAIT_TIMEOUT_S):
+        self.local_cache = local_cache
+        self.interval_s = interval_s
+        self.download = download
+        self.wait_timeout_s = wait_timeout_s
+
+        self._snapshots = {}
+        self._refreshed_at = {}
+        # ticker -> (testigo, inicio) del refresco en curso; un relevo sustituye el testigo
+        self._refreshing = {}
+        self._reads = {}
+        self._cond = threading.Condition()
+
+        # Lecturas de sesión servidas por cada descarga ya sustituida (las más recientes)
+        self._reads_per_fetch = deque(maxlen=history)
+
+        self.stats = {
+            "descargas": 0,
+            "lecturas": 0,
+            "esperas": 0,
+            "esperas_agotadas": 0,
+            "errores": 0,
+            "segundos_descarga": 0.0
+        }
+
+    def _fetch(self, supabase, ticker, run):
+        """Una descarga completa; los errores se guardan en la instantánea en lugar de propagarse"""
+        errors = {}
+        yahoo = pd.DataFrame()
+        inserted = 0
+
+        if self.download:
+            with _stage(run, "descarga_yahoo") as sample:
+                try:
+                    yahoo = obtener_datos(ticker).tail(YAHOO_TAIL).reset_index(drop=True)
+                except Exception as e:
+                    errors["descarga_yahoo"] = e
+                sample["filas"] = len(yahoo)
+
+            if not yahoo.empty:
+                with _stage(run, "insercion", rows=INSERT_TAIL):
+                    try:
+                        inserted, _ = insert_all_data_to_supabase(supabase, yahoo.tail(INSERT_TAIL), ticker=ticker)
+                    except Exception as e:
+                        errors["insercion"] = e
+
+        with _stage(run, "cache_local") as sample:
+            try:
+                data = self.local_cache.get(supabase, ticker)
+            except Exception as e:
+                errors["cache_local"] = e
+                data = pd.DataFrame()
+            sample["filas"] = len(data)
+
+        if run is not None:
+            for stage, exc in errors.items():
+                run.error(stage, exc)
+        return data, yahoo, inserted, errors
+
+    def get(self, supabase, ticker, run=None):
+        """
+        Instantánea vigente del ticker. `run` (metricas.RunMetrics) registra las etapas
+        de la descarga cuando es esta sesión la que refresca
+        """
+        waited = False
+        with self._cond:
+            while True:
+                snapshot = self._snapshots.get(ticker)
+                age = time.monotonic() - self._refreshed_at.get(ticker, float("-inf"))
+                if snapshot is not None and age < self.interval_s:
+                    return self._serve(snapshot, waited)
+                if ticker not in self._refreshing:
+                    break
+                # Otra sesión está refrescando este ticker: esperar a su resultado, pero
+                # no más allá del límite de ese refresco (una descarga colgada no bloquea a nadie)
+                if not waited:
+                    self.stats["esperas"] += 1
+                waited = True
+                _, refresh_started = self._refreshing[ticker]
+                remaining = refresh_started + self.wait_timeout_s - time.monotonic()
+                if remaining <= 0:
+                    # Refresco vencido: esta sesión se hace cargo de la descarga
+                    self.stats["esperas_agotadas"] += 1
+                    break
+                self._cond.wait(remaining)
+
+            token = object()
+            fetch_started = time.monotonic()
+            self._refreshing[ticker] = (token, fetch_started)
+
+        started = time.perf_counter()
+        try:
+            result = self._fetch(supabase, ticker, run)
+        except BaseException:
+            # Sin instantánea nueva: otra sesión en espera reintenta el refresco
+            with self._cond:
+                self._release(ticker, token)
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            # Publicar y despertar a las sesiones en espera en la misma sección crítica
+            self._release(ticker, token)
+            if self._refreshed_at.get(ticker, float("-inf")) >= fetch_started:
+                # Un relevo publicó una instantánea más reciente mientras esta descarga
+                # seguía colgada: no se sustituye por datos más antiguos
+                snapshot = self._snapshots[ticker]
+            else:
+                snapshot = self._publish(ticker, *result, time.perf_counter() - started)
+            self._cond.notify_all()
+            return self._serve(snapshot, waited)
+
+    def _release(self, ticker, token):
+        """Quita la marca de refresco del ticker si sigue siendo la de esta descarga (no la de un relevo)"""
+        if self._refreshing.get(ticker, (None, None))[0] is token:
+            del self._refreshing[ticker]
+
+    def _publish(self, ticker, data, yahoo, inserted, errors, elapsed):
+        # Llamado con el lock tomado
+        previous = self._snapshots.get(ticker)
+        if previous is not None:
+            self._reads_per_fetch.append(self._reads.get(ticker, 0))
+        if "cache_local" in errors and previous is not None:
+            # Supabase no respondió: se mantienen los datos anteriores
+            data = previous.data
+
+        snapshot = Snapshot(
+            ticker=ticker,
+            version=previous.version + 1 if previous is not None else 1,
+            fetched_at=datetime.now(timezone.utc),
+            data=data,
+            yahoo=yahoo,
+            inserted=inserted,
+            errors={stage: str(exc) for stage, exc in errors.items()},
+            waited=False
+        )
+        self._snapshots[ticker] = snapshot
+        self._refreshed_at[ticker] = time.monotonic()
+        self._reads[ticker] = 0
+        self.stats["descargas"] += 1
+        self.stats["errores"] += len(errors)
+        self.stats["segundos_descarga"] += elapsed
+        return snapshot
+
+    def _serve(self, snapshot, waited):
+        # Llamado con el lock tomado
+        self._reads[snapshot.ticker] = self._reads.get(snapshot.ticker, 0) + 1
+        self.stats["lecturas"] += 1
+        return snapshot._replace(
+            data=snapshot.data.copy(deep=False),
+            yahoo=snapshot.yahoo.copy(deep=False),
+            errors=dict(snapshot.errors),
+            waited=waited
+        )
+
+    def reads_per_fetch(self):
+        """Lecturas de sesión por descarga (media de todo el proceso)"""
+        return self.stats["lecturas"] / self.stats["descargas"] if self.stats["descargas"] else 0.0
+
+    def summary(self):
+        """{ticker: {version, edad_s, lecturas}} de las instantáneas vigentes"""
+        with self._cond:
+            now = time.monotonic()
+            return {
+                ticker: {
+                    "version": snapshot.version,
+                    "edad_s": now - self._refreshed_at[ticker],
+                    "lecturas": self._reads.get(ticker, 0)
+                }
+                for ticker, snapshot in self._snapshots.items()
+            }
+
+    def recent_reads_per_fetch(self):
+        """Lecturas servidas por cada una de las últimas descargas ya sustituidas"""
+        with self._cond:
+            return list(self._reads_per_fetch)
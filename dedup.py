@@ -0,0 +1,120 @@
+"""
+Índice en memoria de las barras ya ingeridas, por (ticker, timestamp)
+
+Sustituye al `select` por fila que hacía safe_insert_to_supabase para detectar
+duplicados: cada ticker guarda un array int64 ordenado con los segundos epoch de sus
+barras recientes, y una búsqueda binaria vectorizada decide qué filas son nuevas sin
+ir a la red. El índice se siembra una sola vez desde Supabase al arrancar y está
+acotado (las `max_keys` barras más recientes por ticker).
+
+Las claves más antiguas que la ventana del índice no se pueden comprobar en local y se
+envían igualmente: la restricción UNIQUE(ticker, timestamp) de la tabla y el upsert que
+ignora duplicados siguen garantizando que no se repiten.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from consultas import iter_filtered_pages
+from marcas_agua import MAX_LOOKBACK
+
+# Barras por ticker que se conservan (7 días de barras de 1 minuto caben de sobra)
+DEFAULT_MAX_KEYS = 20_000
+
+def timestamp_keys(timestamps):
+    """Timestamps (strings ISO, con o sin zona, o datetime) -> segundos epoch UTC en int64"""
+    values = pd.to_datetime(pd.Series(timestamps), utc=True, errors="coerce")
+    return values.dt.tz_convert(None).astype("datetime64[s]").to_numpy().view("i8")
+
+def timestamp_key(timestamp):
+    """Un solo timestamp (naive = UTC) -> segundos epoch"""
+    return pd.Timestamp(timestamp).value // 1_000_000_000
+
+def bar_keys(data, ticker="AAPL"):
+    """Claves de un DataFrame de yfinance (Datetime [, Ticker]) -> (tickers, segundos epoch)"""
+    tickers = data["Ticker"].to_numpy() if "Ticker" in data.columns else np.full(len(data), ticker, dtype=object)
+    return tickers, timestamp_keys(data["Datetime"])
+
+class DedupIndex:
+    """
+    Claves (ticker, timestamp) de las barras recientes de cada ticker
+    filter_new() marca las filas nuevas; add() registra las que ya se guardaron
+    """
+
+    def __init__(self, max_keys=DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._keys = {}
+
+        self.stats = {"duplicadas_locales": 0, "nuevas": 0, "filas_semilla": 0, "consultas_semilla": 0}
+
+    def seed(self, supabase, tickers, since=None):
+        """
+        Carga una sola vez las claves de los tickers desde Supabase (por defecto, la misma
+        ventana que puede rellenar el worker). Paginación keyset, solo la columna timestamp
+        """
+        since = since if since is not None else pd.Timestamp.now(tz="UTC") - MAX_LOOKBACK
+        tickers = list(tickers)
+        collected = {ticker: [] for ticker in tickers}
+
+        for rows in iter_filtered_pages(supabase, tickers, start=since, columns=["timestamp"],
+                                        row_budget=sys.maxsize):
+            self.stats["consultas_semilla"] += 1
+            self.stats["filas_semilla"] += len(rows)
+            for row in rows:
+                collected[row.get("ticker", tickers[0])].append(row["timestamp"])
+
+        for ticker, timestamps in collected.items():
+            if timestamps:
+                self._merge(ticker, timestamp_keys(timestamps))
+        return self
+
+    def _merge(self, ticker, keys):
+        merged = np.union1d(self._keys.get(ticker, np.empty(0, dtype="i8")), keys)
+        # Acotado: solo las claves más recientes
+        self._keys[ticker] = merged[-self.max_keys:]
+
+    def filter_new(self, tickers, keys):
+        """
+        Máscara de filas nuevas: ni están en el índice ni se repiten dentro del lote
+        `tickers` y `keys` (segundos epoch) son arrays alineados, uno por fila
+        """
+        tickers = np.asarray(tickers)
+        keys = np.asarray(keys, dtype="i8")
+        new = np.ones(len(keys), dtype=bool)
+
+        for ticker in pd.unique(tickers):
+            rows = np.flatnonzero(tickers == ticker)
+            known = self._keys.get(ticker)
+            if known is not None and len(known):
+                positions = np.searchsorted(known, keys[rows])
+                found = known[np.minimum(positions, len(known) - 1)] == keys[rows]
+                new[rows[found]] = False
+
+        # Duplicados dentro del propio lote (se conserva la primera aparición)
+        frame = pd.DataFrame({"ticker": tickers, "key": keys})
+        new &= ~frame.duplicated().to_numpy()
+
+        self.stats["duplicadas_locales"] += int((~new).sum())
+        self.stats["nuevas"] += int(new.sum())
+        return new
+
+    def contains(self, ticker, key):
+        known = self._keys.get(ticker)
+        if known is None or not len(known):
+            return False
+        position = np.searchsorted(known, key)
+        return position < len(known) and known[position] == key
+
+    def add(self, tickers, keys):
+        """Registra claves ya guardadas (tras una inserción correcta)"""
+        tickers = np.asarray(tickers)
+        keys = np.asarray(keys, dtype="i8")
+        for ticker in pd.unique(tickers):
+            self._merge(ticker, keys[tickers == ticker])
+
+    def key_count(self):
+        return sum(len(keys) for keys in self._keys.values())
+
+    def memory_bytes(self):
+        return sum(keys.nbytes for keys in self._keys.values())
@@ -0,0 +1,215 @@
+"""
+Escritor asíncrono hacia la API REST de Supabase (PostgREST)
+
+- Un solo httpx.AsyncClient con conexiones persistentes (pool) entre ciclos
+- Como máximo `max_in_flight` peticiones a la vez (una por tarea emisora)
+- Filas agrupadas en lotes de `batch_size` por petición (upsert que ignora duplicados)
+- Cola acotada entre el productor y los emisores: si la base de datos va lenta, el
+  productor espera en lugar de acumular filas en memoria sin límite
+- Reintentos con backoff exponencial y jitter ante 5xx, 429 y errores de red
+  (respetando Retry-After)
+"""
+import asyncio
+import random
+import time
+
+import httpx
+
+from ingesta import prepare_supabase_records, DEFAULT_CHUNK_SIZE
+
+# Respuestas que merecen reintento (el resto de 4xx son errores definitivos del lote)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class AsyncSupabaseWriter:
+    """
+    Escribe filas en una tabla de Supabase con peticiones concurrentes acotadas
+
+    Uso síncrono (worker):  writer.write(data) por ciclo y writer.close() al terminar
+    Uso asíncrono:          await writer.write_rows(filas) dentro de un event loop propio
+    """
+
+    def __init__(self, url, key, table="apple_stock_data", on_conflict="ticker,timestamp",
+                 batch_size=DEFAULT_CHUNK_SIZE, max_in_flight=4, queue_size=None, max_retries=5,
+                 backoff_base=0.2, backoff_max=10.0, timeout=10.0, linger_s=0.01, seed=None):
+        self.url = url.rstrip("/")
+        self.key = key
+        self.table = table
+        self.on_conflict = on_conflict
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size or batch_size * max_in_flight * 2
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.linger_s = linger_s
+        self.random = random.Random(seed)
+
+        self._client = None
+        self._loop = None
+
+        self.stats = {
+            "filas_enviadas": 0,
+            "filas_fallidas": 0,
+            "lotes": 0,
+            "reintentos": 0,
+            "espera_cola_s": 0.0,
+            "segundos": 0.0
+        }
+
+    # ----- conexión -----
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=f"{self.url}/rest/v1",
+                headers={
+                    "apikey": self.key,
+                    "Authorization": f"Bearer {self.key}",
+                    "Content-Type": "application/json",
+                    "Prefer": "resolution=ignore-duplicates,return=minimal"
+                },
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_in_flight,
+                                    max_keepalive_connections=self.max_in_flight)
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ----- envío -----
+
+    def _backoff(self, attempt, retry_after=None):
+        """Backoff exponencial con jitter completo; Retry-After manda si viene en la respuesta"""
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return self.random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _post(self, batch):
+        """Envía un lote con reintentos. Devuelve None si se aceptó o el último error"""
+        client = self._get_client()
+        error = None
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = await client.post(f"/{self.table}", params={"on_conflict": self.on_conflict}, json=batch)
+                if response.status_code < 300:
+                    return None
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+                if response.status_code not in RETRY_STATUS:
+                    return error
+                retry_after = response.headers.get("Retry-After")
+            except httpx.TransportError as e:
+                error = f"{type(e).__name__}: {e}"
+
+            if attempt < self.max_retries:
+                self.stats["reintentos"] += 1
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+        return error
+
+    async def _sender(self, queue, results):
+        """Tarea emisora: junta hasta batch_size filas de la cola y las envía en una petición"""
+        while True:
+            row = await queue.get()
+            if row is None:
+                return
+            batch = [row]
+            done = False
+
+            # Completar el lote con lo que ya está en la cola (o llega en linger_s)
+            lingered = False
+            while len(batch) < self.batch_size:
+                if queue.empty():
+                    if lingered:
+                        break
+                    lingered = True
+                    await asyncio.sleep(self.linger_s)
+                    continue
+                row = queue.get_nowait()
+                if row is None:
+                    done = True
+                    break
+                batch.append(row)
+
+            error = await self._post(batch)
+            self.stats["lotes"] += 1
+            if error is None:
+                self.stats["filas_enviadas"] += len(batch)
+            else:
+                self.stats["filas_fallidas"] += len(batch)
+            results.append({"chunk": len(results), "aceptados": 0 if error else len(batch),
+                            "rechazados": len(batch) if error else 0, "error": error})
+            if done:
+                return
+
+    async def write_rows(self, rows):
+        """
+        Escribe un iterable de filas (dicts JSON). El productor espera cuando la cola está
+        llena, así que `rows` puede ser un generador arbitrariamente largo
+        Devuelve una lista con el resultado de cada lote (chunk, aceptados, rechazados, error)
+        """
+        started = time.perf_counter()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        results = []
+        senders = [asyncio.create_task(self._sender(queue, results)) for _ in range(self.max_in_flight)]
+
+        try:
+            for row in rows:
+                if queue.full():
+                    waited = time.perf_counter()
+                    await queue.put(row)
+                    self.stats["espera_cola_s"] += time.perf_counter() - waited
+                else:
+                    queue.put_nowait(row)
+            # Una marca de fin por emisor: cada uno termina tras vaciar su parte de la cola
+            for _ in senders:
+                await queue.put(None)
+            await asyncio.gather(*senders)
+        finally:
+            for task in senders:
+                task.cancel()
+            self.stats["segundos"] += time.perf_counter() - started
+
+        return results
+
+    # ----- interfaz síncrona para el worker -----
+
+    def _run(self, coroutine):
+        # Event loop propio y persistente: el pool de conexiones sobrevive entre ciclos
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coroutine)
+
+    def write(self, data, ticker="AAPL"):
+        """
+        Misma entrada y salida que ingesta.bulk_upsert_to_supabase: DataFrame de yfinance
+        (Datetime, Open... [, Ticker]) -> lista de resultados por lote
+        """
+        records, valid = prepare_supabase_records(data, ticker)
+        payload = records[valid].copy()
+        payload["volume"] = payload["volume"].astype("int64")
+
+        results = self._run(self.write_rows(payload.to_dict(orient="records")))
+        rejected = int((~valid).sum())
+        if rejected:
+            results.append({"chunk": len(results), "aceptados": 0, "rechazados": rejected, "error": None})
+        return results
+
+    def write_records(self, rows):
+        """Filas ya normalizadas (dicts JSON) -> lista de resultados por lote"""
+        return self._run(self.write_rows(rows))
+
+    def rows_per_second(self):
+        return self.stats["filas_enviadas"] / self.stats["segundos"] if self.stats["segundos"] else 0.0
+
+    def close(self):
+        if self._loop is not None:
+            self._loop.run_until_complete(self.aclose())
+            self._loop.close()
+            self._loop = None
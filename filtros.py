@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+TREND_OPTIONS = ["Todos", "Subida", "Bajada", "Estable"]
+
+def _wall_clock_ints(timestamps):
+    """
+    Timestamps como int64 en hora local de la propia columna (sin objetos Python)
+    Devuelve (valores int64, unidades por segundo)
+    """
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    values = timestamps.to_numpy()
+    unit, _ = np.datetime_data(values.dtype)
+    per_second = np.timedelta64(1, "s") // np.timedelta64(1, unit)
+    return values.view("i8"), per_second
+
+def _to_wall_int(value, unit_per_second):
+    """
+    Convierte una fecha (date/datetime) a int64 en la misma unidad que la columna
+    """
+    return pd.Timestamp(value).value // (1_000_000_000 // unit_per_second)
+
+def _range_mask(values, value_range):
+    """
+    Máscara inclusiva para (min, max); cualquiera de los dos extremos puede ser None (sin límite)
+    """
+    low, high = value_range
+    mask = np.ones(len(values), dtype=bool)
+    if low is not None:
+        mask &= values >= low
+    if high is not None:
+        mask &= values <= high
+    return mask
+
+def _seconds_of_day(value):
+    return value.hour * 3600 + value.minute * 60 + value.second + value.microsecond / 1e6
+
+def build_filter_mask(df, date_range=None, time_range=None, price_range=None,
+                      volume_range=None, volatility_range=None, trend="Todos", indicator_ranges=None):
+    """
+    Convierte el estado de todos los filtros en una sola máscara booleana
+    Fechas y horas se comparan como int64 (epoch / segundos del día), sin .dt.date ni .dt.time
+    Los rangos son inclusivos; None desactiva el filtro (o solo ese extremo del rango)
+    `indicator_ranges`: {columna de indicador: (min, max)}; las filas sin valor (NaN) no pasan
+    """
+    n = len(df)
+    mask = np.ones(n, dtype=bool)
+    if n == 0:
+        return mask
+
+    if date_range or time_range:
+        wall, per_second = _wall_clock_ints(df["timestamp"])
+        mask &= df["timestamp"].notna().to_numpy()
+
+        # Filtro por rango de fechas: [inicio del primer día, inicio del día siguiente al último)
+        if date_range:
+            start = _to_wall_int(date_range[0], per_second)
+            end = _to_wall_int(pd.Timestamp(date_range[1]) + pd.Timedelta(days=1), per_second)
+            mask &= (wall >= start) & (wall < end)
+
+        # Filtro por horario: segundos transcurridos del día
+        if time_range:
+            day = 86400 * per_second
+            time_of_day = wall % day
+            mask &= time_of_day >= int(_seconds_of_day(time_range[0]) * per_second)
+            mask &= time_of_day <= int(_seconds_of_day(time_range[1]) * per_second)
+
+    close = df["close"].to_numpy()
+
+    # Filtro por precio de cierre
+    if price_range is not None:
+        mask &= _range_mask(close, price_range)
+
+    # Filtro por volumen
+    if volume_range is not None:
+        mask &= _range_mask(df["volume"].to_numpy(), volume_range)
+
+    # Filtro por volatilidad (High - Low), sin añadir la columna al DataFrame
+    if volatility_range is not None:
+        if "volatility" in df.columns:
+            volatility = df["volatility"].to_numpy()
+        else:
+            volatility = df["high"].to_numpy() - df["low"].to_numpy()
+        mask &= _range_mask(volatility, volatility_range)
+
+    # Filtros por indicadores técnicos (rsi, atr, sma...) ya calculados en el DataFrame
+    for column, value_range in (indicator_ranges or {}).items():
+        mask &= _range_mask(df[column].to_numpy(), value_range)
+
+    # Filtro de tendencia: cambio respecto al registro anterior *que pasó los filtros*,
+    # en orden cronológico (igual que ordenar + diff sobre el DataFrame ya filtrado)
+    if trend != "Todos" and mask.sum() > 1:
+        timestamps = df["timestamp"]
+        if timestamps.is_monotonic_increasing:
+            order = np.arange(n)
+        elif timestamps.is_monotonic_decreasing:
+            order = np.arange(n)[::-1]
+        else:
+            order = np.argsort(timestamps.to_numpy(), kind="stable")
+
+        selected = order[mask[order]]
+        change = np.diff(close[selected])
+
+        if trend == "Subida":
+            keep = change > 0
+        elif trend == "Bajada":
+            keep = change < 0
+        else:
+            keep = change == 0
+
+        # El primer registro no tiene anterior (su cambio sería NaN)
+        mask = np.zeros(n, dtype=bool)
+        mask[selected[1:][keep]] = True
+
+    return mask
+
+def apply_global_filters(df, date_range, time_range, price_min, price_max, volume_min, volume_max,
+                         volatility_range=None, trend_filter="Todos", indicator_ranges=None):
+    """
+    Aplica filtros globales al DataFrame
+    Una sola máscara y una sola selección al final (sin copias intermedias)
+    """
+    mask = build_filter_mask(
+        df,
+        date_range=date_range,
+        time_range=time_range,
+        price_range=(price_min, price_max),
+        volume_range=(volume_min, volume_max),
+        volatility_range=volatility_range,
+        trend=trend_filter,
+        indicator_ranges=indicator_ranges
+    )
+    return df[mask]
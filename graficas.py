@@ -0,0 +1,222 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+import plotly.io as pio
+
+# Puntos objetivo por serie tras el downsampling (configurable desde el dashboard)
+DEFAULT_TARGET_POINTS = 1500
+
+# A partir de cuántos puntos se usa Scattergl (WebGL) en lugar de Scatter (SVG)
+GL_THRESHOLD = 1000
+
+# Duraciones "redondas" (en minutos) para agrupar velas
+CANDLE_BUCKETS_MIN = [1, 2, 5, 10, 15, 30, 60, 120, 240, 1440]
+
+def _epoch_ints(timestamps):
+    """
+    Timestamps como int64 desde epoch (UTC), sin objetos Python
+    Devuelve (valores int64, unidad de numpy: 'ns', 'us'...)
+    """
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_convert("UTC").dt.tz_localize(None)
+    values = timestamps.to_numpy()
+    unit, _ = np.datetime_data(values.dtype)
+    return values.view("i8"), unit
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: índices de los `n_out` puntos que mejor conservan
+    la forma visual de la serie (siempre incluye el primero y el último)
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    every = (n - 2) / (n_out - 2)
+
+    indices = np.empty(n_out, dtype="int64")
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+
+        # Vértice C: media del siguiente bucket (o el último punto)
+        if end < next_end:
+            avg_x = x[end:next_end].mean()
+            avg_y = y[end:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        # Área del triángulo A-B-C para cada candidato B del bucket actual
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+
+    return indices
+
+def aggregate_ohlc(df, target_points=DEFAULT_TARGET_POINTS):
+    """
+    Agrupa velas de 1 minuto en velas más largas (duración "redonda") hasta no superar
+    `target_points`. El DataFrame debe venir en orden cronológico
+    Devuelve (DataFrame OHLCV agregado, minutos por vela)
+    """
+    if len(df) <= target_points:
+        return df[["timestamp", "open", "high", "low", "close", "volume"]], 1
+
+    ts, unit = _epoch_ints(df["timestamp"])
+    per_minute = np.timedelta64(1, "m") // np.timedelta64(1, unit)
+
+    span_minutes = (ts[-1] - ts[0]) / per_minute
+    minutes = next((m for m in CANDLE_BUCKETS_MIN if span_minutes / m <= target_points), CANDLE_BUCKETS_MIN[-1])
+    width = minutes * per_minute
+
+    # Inicio de cada vela agregada: donde cambia el bucket
+    buckets = ts // width
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    ends = np.concatenate((starts[1:], [len(ts)])) - 1
+
+    aggregated = pd.DataFrame({
+        "timestamp": pd.to_datetime(buckets[starts] * width, unit=unit, utc=True)
+            .tz_convert(df["timestamp"].dt.tz),
+        "open": df["open"].to_numpy()[starts],
+        "high": np.maximum.reduceat(df["high"].to_numpy(), starts),
+        "low": np.minimum.reduceat(df["low"].to_numpy(), starts),
+        "close": df["close"].to_numpy()[ends],
+        "volume": np.add.reduceat(df["volume"].to_numpy(), starts)
+    })
+    return aggregated, minutes
+
+def payload_fingerprint(fig):
+    """(bytes, huella) del JSON de la figura: misma huella = mismo mensaje al navegador"""
+    text = pio.to_json(fig, validate=False)
+    return len(text), hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+def payload_bytes(fig):
+    """Tamaño en bytes del JSON de la figura que se envía al navegador"""
+    return payload_fingerprint(fig)[0]
+
+def table_fingerprint(df):
+    """(bytes aproximados, huella) de la tabla que se envía al navegador (st.dataframe la serializa en Arrow)"""
+    digest = hashlib.blake2b(
+        pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes() + ",".join(map(str, df.columns)).encode(),
+        digest_size=16
+    ).hexdigest()
+    try:
+        import pyarrow as pa
+        return pa.Table.from_pandas(df, preserve_index=False).nbytes, digest
+    except Exception:
+        return int(df.memory_usage(deep=True).sum()), digest
+
+def _line_trace(x, y, name, line, gl_threshold):
+    """Scatter (SVG) para pocas series; Scattergl (WebGL) y sin marcadores para muchas"""
+    if len(x) > gl_threshold:
+        return go.Scattergl(x=x, y=y, mode="lines", name=name, line=line)
+    return go.Scatter(x=x, y=y, mode="lines+markers", name=name, line=line)
+
+def _report(fig, raw_fig, original_points, points, measure=False):
+    """
+    Resumen de puntos; con `measure`, también los bytes del payload y su huella (antes solo si
+    se construyó la figura completa). Medir serializa la figura: sin `measure` no se hace
+    """
+    info = {"puntos_originales": original_points, "puntos": points}
+    if measure:
+        info["bytes_despues"], info["huella"] = payload_fingerprint(fig)
+    if raw_fig is not None:
+        info["bytes_antes"] = payload_bytes(raw_fig)
+    return info
+
+def build_line_figure(df, column, name, line, layout, target_points=DEFAULT_TARGET_POINTS,
+                      gl_threshold=GL_THRESHOLD, downsample=True, measure=False, overlays=None):
+    """
+    Gráfica de línea de `column` (Close, volatilidad...) con downsampling LTTB
+    `overlays`: lista de (columna, nombre, line) dibujadas sobre los mismos puntos (SMA, VWAP...)
+    Devuelve (figura, info de puntos/payload)
+    """
+    if downsample:
+        ts, _ = _epoch_ints(df["timestamp"])
+        indices = lttb_indices(ts, df[column].to_numpy(), target_points)
+    else:
+        indices = np.arange(len(df))
+
+    def traces(selected, threshold):
+        x_values = df["timestamp"].iloc[selected]
+        yield _line_trace(x_values, df[column].to_numpy()[selected], name, line, threshold)
+        for overlay_column, overlay_name, overlay_line in overlays or ():
+            yield _line_trace(x_values, df[overlay_column].to_numpy()[selected], overlay_name, overlay_line, threshold)
+
+    fig = go.Figure(list(traces(indices, gl_threshold)))
+    fig.update_layout(**layout)
+
+    raw_fig = None
+    if measure and downsample:
+        raw_fig = go.Figure(list(traces(np.arange(len(df)), float("inf"))))
+        raw_fig.update_layout(**layout)
+
+    return fig, _report(fig, raw_fig, len(df), len(indices), measure)
+
+def build_candlestick_figure(df, layout, target_points=DEFAULT_TARGET_POINTS, downsample=True, measure=False):
+    """
+    Candlestick con las velas agregadas por tiempo si hay más de `target_points`
+    Devuelve (figura, info de puntos/payload)
+    """
+    candles, minutes = aggregate_ohlc(df, target_points) if downsample else (df, 1)
+
+    def candlestick(data):
+        return go.Candlestick(
+            x=data["timestamp"],
+            open=data["open"],
+            high=data["high"],
+            low=data["low"],
+            close=data["close"]
+        )
+
+    fig = go.Figure(data=[candlestick(candles)])
+    fig.update_layout(**layout)
+
+    raw_fig = None
+    if measure and downsample:
+        raw_fig = go.Figure(data=[candlestick(df)])
+        raw_fig.update_layout(**layout)
+
+    info = _report(fig, raw_fig, len(df), len(candles), measure)
+    info["minutos_por_vela"] = minutes
+    return fig, info
+
+def build_histogram_figure(values, layout, bins=20, marker_color="#4834d4", downsample=True, measure=False):
+    """
+    Histograma calculado en el servidor: se envían `bins` barras en lugar de todos los valores
+    Devuelve (figura, info de puntos/payload)
+    """
+    values = np.asarray(values)
+
+    if downsample:
+        counts, edges = np.histogram(values, bins=bins)
+        fig = go.Figure(go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            width=np.diff(edges),
+            marker_color=marker_color
+        ))
+        points = bins
+    else:
+        fig = go.Figure(go.Histogram(x=values, nbinsx=bins, marker_color=marker_color))
+        points = len(values)
+    fig.update_layout(**layout)
+
+    raw_fig = None
+    if measure and downsample:
+        raw_fig = go.Figure(go.Histogram(x=values, nbinsx=bins, marker_color=marker_color))
+        raw_fig.update_layout(**layout)
+
+    return fig, _report(fig, raw_fig, len(values), points, measure)
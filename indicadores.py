@@ -0,0 +1,282 @@
+"""
+Indicadores técnicos sobre barras de 1 minuto: SMA, EMA, desviación estándar móvil,
+bandas de Bollinger, VWAP (por sesión UTC), RSI y ATR (suavizado de Wilder)
+
+Dos modos que dan el mismo resultado:
+- Lote (compute_indicators): vectorizado con pandas, para calentar sobre el histórico
+- Streaming (IndicatorEngine.update): estado por ticker y O(1) por barra nueva
+"""
+import math
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+INDICATOR_COLUMNS = ["sma", "ema", "std", "bb_upper", "bb_lower", "vwap", "rsi", "atr"]
+
+DEFAULT_WINDOW = 20
+DEFAULT_EMA_SPAN = 20
+DEFAULT_BB_K = 2.0
+DEFAULT_RSI_PERIOD = 14
+DEFAULT_ATR_PERIOD = 14
+
+def _wilder(values, period):
+    """Media de Wilder (EMA con alpha = 1/period) sin periodo mínimo"""
+    return values.ewm(alpha=1 / period, adjust=False).mean()
+
+def _rsi_value(avg_gain, avg_loss):
+    total = avg_gain + avg_loss
+    return 100 * avg_gain / total if total > 0 else np.nan
+
+def _session(timestamp):
+    """Sesión del VWAP: día UTC del timestamp"""
+    return timestamp.tz_convert("UTC").floor("D") if timestamp.tzinfo else timestamp.floor("D")
+
+def _indicators_one(df, window, ema_span, bb_k, rsi_period, atr_period):
+    """
+    Indicadores de un solo ticker (df en orden cronológico)
+    Devuelve (DataFrame de indicadores, estado final para continuar en streaming)
+    """
+    close = df["close"].astype("float64")
+    high = df["high"].astype("float64")
+    low = df["low"].astype("float64")
+    volume = df["volume"].astype("float64")
+    n = np.arange(1, len(df) + 1)
+
+    sma = close.rolling(window).mean()
+    std = close.rolling(window).std(ddof=0)
+    ema_raw = close.ewm(span=ema_span, adjust=False).mean()
+
+    timestamps = pd.to_datetime(df["timestamp"], utc=True)
+    session = timestamps.dt.floor("D")
+    cum_pv = ((high + low + close) / 3 * volume).groupby(session.to_numpy()).cumsum()
+    cum_v = volume.groupby(session.to_numpy()).cumsum()
+    vwap = (cum_pv / cum_v.where(cum_v > 0)).astype("float64")
+
+    change = close.diff()
+    avg_gain = _wilder(change.clip(lower=0), rsi_period)
+    avg_loss = _wilder((-change).clip(lower=0), rsi_period)
+    total = avg_gain + avg_loss
+    rsi = (100 * avg_gain / total.where(total > 0)).where(n > rsi_period)
+
+    prev_close = close.shift()
+    true_range = pd.concat([high - low, (high - prev_close).abs(), (low - prev_close).abs()], axis=1).max(axis=1)
+    atr_raw = _wilder(true_range, atr_period)
+
+    indicators = pd.DataFrame({
+        "sma": sma,
+        "ema": ema_raw.where(n >= ema_span),
+        "std": std,
+        "bb_upper": sma + bb_k * std,
+        "bb_lower": sma - bb_k * std,
+        "vwap": vwap,
+        "rsi": rsi,
+        "atr": atr_raw.where(n >= atr_period)
+    })
+
+    if df.empty:
+        return indicators, None
+
+    closes = close.iloc[-window:].to_numpy()
+    state = _TickerState(window, ema_span, bb_k, rsi_period, atr_period)
+    state.count = len(df)
+    state.window_values.extend(closes)
+    state.window_sum = float(closes.sum())
+    state.window_mean = float(closes.mean())
+    state.window_m2 = float(((closes - closes.mean()) ** 2).sum())
+    state.ema = float(ema_raw.iloc[-1])
+    state.session = session.iloc[-1]
+    state.cum_pv = float(cum_pv.iloc[-1])
+    state.cum_v = float(cum_v.iloc[-1])
+    state.prev_close = float(close.iloc[-1])
+    if len(df) > 1:
+        state.avg_gain = float(avg_gain.iloc[-1])
+        state.avg_loss = float(avg_loss.iloc[-1])
+    state.atr = float(atr_raw.iloc[-1])
+    state.last_timestamp = timestamps.iloc[-1]
+    return indicators, state
+
+def compute_indicators(df, window=DEFAULT_WINDOW, ema_span=DEFAULT_EMA_SPAN, bb_k=DEFAULT_BB_K,
+                       rsi_period=DEFAULT_RSI_PERIOD, atr_period=DEFAULT_ATR_PERIOD):
+    """
+    Modo lote: añade las columnas de INDICATOR_COLUMNS a una copia de `df`
+    (timestamp, high, low, close, volume[, ticker]) en cualquier orden; se calculan por
+    ticker en orden cronológico y se devuelven en el orden original de las filas
+    """
+    result = df.drop(columns=[c for c in INDICATOR_COLUMNS if c in df.columns])
+    # Índice posicional para devolver cada valor a su fila aunque el índice original se repita
+    work = result.reset_index(drop=True)
+    groups = work.groupby("ticker", sort=False, observed=True) if "ticker" in work.columns else [(None, work)]
+
+    parts = []
+    for _, group in groups:
+        chrono = group.sort_values("timestamp", kind="stable")
+        indicators, _ = _indicators_one(chrono, window, ema_span, bb_k, rsi_period, atr_period)
+        parts.append(indicators)
+
+    indicators = pd.concat(parts).reindex(work.index) if parts else pd.DataFrame(index=work.index, columns=INDICATOR_COLUMNS)
+    for column in INDICATOR_COLUMNS:
+        result[column] = indicators[column].to_numpy(dtype="float64")
+    return result
+
+class _TickerState:
+    """Estado acumulado de un ticker para actualizar los indicadores barra a barra"""
+
+    def __init__(self, window, ema_span, bb_k, rsi_period, atr_period):
+        self.window = window
+        self.ema_span = ema_span
+        self.bb_k = bb_k
+        self.rsi_period = rsi_period
+        self.atr_period = atr_period
+
+        self.count = 0
+        self.last_timestamp = None
+        # Ventana móvil: suma para la SMA; media y M2 (Welford) para la desviación
+        self.window_values = deque(maxlen=window)
+        self.window_sum = 0.0
+        self.window_mean = 0.0
+        self.window_m2 = 0.0
+        self.ema = None
+        self.session = None
+        self.cum_pv = 0.0
+        self.cum_v = 0.0
+        self.prev_close = None
+        self.avg_gain = None
+        self.avg_loss = None
+        self.atr = None
+
+    def _slide(self, close):
+        values = self.window_values
+        if len(values) < self.window:
+            values.append(close)
+            self.window_sum += close
+            delta = close - self.window_mean
+            self.window_mean += delta / len(values)
+            self.window_m2 += delta * (close - self.window_mean)
+        else:
+            oldest = values[0]
+            values.append(close)
+            self.window_sum += close - oldest
+            old_mean = self.window_mean
+            self.window_mean += (close - oldest) / self.window
+            self.window_m2 += (close - oldest) * (close - self.window_mean + oldest - old_mean)
+
+    def update(self, timestamp, high, low, close, volume):
+        """Incorpora una barra (posterior a la última) y devuelve los indicadores en ese punto"""
+        self.count += 1
+        self.last_timestamp = timestamp
+        self._slide(close)
+
+        alpha = 2 / (self.ema_span + 1)
+        self.ema = close if self.ema is None else self.ema + alpha * (close - self.ema)
+
+        session = _session(timestamp)
+        if session != self.session:
+            self.session, self.cum_pv, self.cum_v = session, 0.0, 0.0
+        self.cum_pv += (high + low + close) / 3 * volume
+        self.cum_v += volume
+
+        if self.prev_close is None:
+            true_range = high - low
+        else:
+            change = close - self.prev_close
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            if self.avg_gain is None:
+                self.avg_gain, self.avg_loss = gain, loss
+            else:
+                self.avg_gain += (gain - self.avg_gain) / self.rsi_period
+                self.avg_loss += (loss - self.avg_loss) / self.rsi_period
+            true_range = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.atr = true_range if self.atr is None else self.atr + (true_range - self.atr) / self.atr_period
+
+        full = self.count >= self.window
+        sma = self.window_sum / self.window if full else np.nan
+        std = math.sqrt(max(self.window_m2, 0.0) / self.window) if full else np.nan
+        return {
+            "sma": sma,
+            "ema": self.ema if self.count >= self.ema_span else np.nan,
+            "std": std,
+            "bb_upper": sma + self.bb_k * std,
+            "bb_lower": sma - self.bb_k * std,
+            "vwap": self.cum_pv / self.cum_v if self.cum_v > 0 else np.nan,
+            "rsi": _rsi_value(self.avg_gain, self.avg_loss) if self.count > self.rsi_period else np.nan,
+            "atr": self.atr if self.count >= self.atr_period else np.nan
+        }
+
+class IndicatorEngine:
+    """
+    Indicadores por ticker mantenidos de forma incremental
+
+    warm_up() calcula el histórico en lote y deja el estado listo; update() añade una
+    barra en O(1). extend() combina ambos para el dashboard: solo las barras nuevas
+    desde la última llamada se procesan en streaming
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, ema_span=DEFAULT_EMA_SPAN, bb_k=DEFAULT_BB_K,
+                 rsi_period=DEFAULT_RSI_PERIOD, atr_period=DEFAULT_ATR_PERIOD):
+        self.params = dict(window=window, ema_span=ema_span, bb_k=bb_k,
+                           rsi_period=rsi_period, atr_period=atr_period)
+        self._states = {}
+        self._values = {}
+        self._lock = threading.Lock()
+
+        self.stats = {"calentamientos": 0, "barras_streaming": 0}
+
+    def warm_up(self, ticker, df):
+        """
+        Calcula los indicadores de todo `df` (un ticker) en lote y guarda el estado final
+        Devuelve los indicadores indexados por timestamp
+        """
+        chrono = df.sort_values("timestamp", kind="stable")
+        indicators, state = _indicators_one(chrono, **self.params)
+        indicators.index = pd.DatetimeIndex(pd.to_datetime(chrono["timestamp"], utc=True))
+
+        self._states[ticker] = state
+        self._values[ticker] = indicators
+        self.stats["calentamientos"] += 1
+        return indicators
+
+    def update(self, ticker, timestamp, high, low, close, volume):
+        """Añade una barra posterior a la última del ticker; devuelve sus indicadores (dict)"""
+        state = self._states.get(ticker)
+        if state is None:
+            state = self._states[ticker] = _TickerState(**self.params)
+        self.stats["barras_streaming"] += 1
+        return state.update(pd.Timestamp(timestamp), float(high), float(low), float(close), float(volume))
+
+    def extend(self, ticker, df):
+        """
+        Devuelve una copia de `df` (barras de un ticker, en cualquier orden) con las columnas
+        de indicadores. Si `df` solo añade barras posteriores a las ya calculadas, esas barras
+        se procesan en streaming; si no (primera vez, huecos, otro rango), se recalcula en lote
+        """
+        result = df.drop(columns=[c for c in INDICATOR_COLUMNS if c in df.columns])
+        if result.empty:
+            return result.assign(**{c: pd.Series(dtype="float64") for c in INDICATOR_COLUMNS})
+
+        with self._lock:
+            timestamps = pd.to_datetime(result["timestamp"], utc=True)
+            state = self._states.get(ticker)
+            values = self._values.get(ticker)
+
+            if state is None or values is None:
+                values = self.warm_up(ticker, result)
+            else:
+                is_new = (timestamps > state.last_timestamp).to_numpy()
+                if not timestamps[~is_new].isin(values.index).all():
+                    values = self.warm_up(ticker, result)
+                elif is_new.any():
+                    new_bars = result[is_new].assign(timestamp=timestamps[is_new]).sort_values("timestamp")
+                    rows = [
+                        self.update(ticker, bar.timestamp, bar.high, bar.low, bar.close, bar.volume)
+                        for bar in new_bars.itertuples(index=False)
+                    ]
+                    appended = pd.DataFrame(rows, index=pd.DatetimeIndex(new_bars["timestamp"]), columns=INDICATOR_COLUMNS)
+                    values = pd.concat([values[values.index >= timestamps.min()], appended])
+                    self._values[ticker] = values
+
+        aligned = values.reindex(pd.DatetimeIndex(timestamps))
+        aligned.index = result.index
+        return result.join(aligned)
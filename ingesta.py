@@ -0,0 +1,346 @@
+import pandas as pd
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from dedup import bar_keys, timestamp_key
+from marcas_agua import plan_incremental_fetch, select_new_bars
+from normalizacion import rejection_reasons, rejection_report, rejection_summary, to_records, TIMESTAMP_FORMAT
+from obtener_datos import obtener_datos_multiples
+
+# Tamaño de bloque para los upserts en lote
+DEFAULT_CHUNK_SIZE = 500
+
+# Archivo donde el worker publica su estado (heartbeat) para el dashboard
+STATUS_PATH = os.getenv(
+    "INGESTA_ESTADO_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ingesta_estado.json")
+)
+
+def safe_insert_to_supabase(supabase, data_row, ticker="AAPL", dedup=None):
+    """
+    Función segura para insertar datos en Supabase
+    Con `dedup` (dedup.DedupIndex) los duplicados se detectan en memoria, sin select por fila
+    """
+    try:
+        # Convertir la fila a dictionary de forma segura
+        row_dict = data_row.to_dict()
+        
+        # Extraer timestamp correctamente
+        timestamp = row_dict.get('Datetime')
+        
+        # Verificar si el timestamp es válido
+        if timestamp is None or pd.isna(timestamp):
+            return False, f"Timestamp es None o NaN: {timestamp}"
+        
+        # Convertir timestamp a string ISO con zona horaria
+        try:
+            # Convertir a pandas datetime si no lo es ya
+            if not isinstance(timestamp, pd.Timestamp):
+                timestamp = pd.to_datetime(timestamp)
+            
+            # Asegurar que tenga zona horaria (UTC por defecto)
+            if timestamp.tz is None:
+                timestamp = timestamp.tz_localize('UTC')
+            
+            # Convertir a string ISO
+            timestamp_str = timestamp.isoformat()
+            
+        except Exception as e:
+            return False, f"Error al convertir timestamp: {str(e)}"
+        
+        # Preparar datos para inserción
+        insert_data = {
+            "ticker": ticker,
+            "timestamp": timestamp_str,
+            "open": float(row_dict.get('Open', 0)),
+            "high": float(row_dict.get('High', 0)),
+            "low": float(row_dict.get('Low', 0)),
+            "close": float(row_dict.get('Close', 0)),
+            "volume": int(row_dict.get('Volume', 0))
+        }
+        
+        # Validar que los datos no sean 0 o None
+        if all(insert_data[key] > 0 for key in ['open', 'high', 'low', 'close', 'volume']):
+            if dedup is not None:
+                # Índice local en lugar de consultar Supabase; si el índice no conoce una
+                # barra antigua, la restricción UNIQUE(ticker, timestamp) la descarta
+                key = timestamp_key(timestamp)
+                if dedup.contains(ticker, key):
+                    dedup.stats["duplicadas_locales"] += 1
+                    return True, "Registro ya existe (sin duplicar)"
+                supabase.table("apple_stock_data")\
+                    .upsert(insert_data, on_conflict="ticker,timestamp", ignore_duplicates=True)\
+                    .execute()
+                dedup.add([ticker], [key])
+                return True, f"Inserción exitosa: {timestamp_str}"
+
+            # Verificar si ya existe este registro (evitar duplicados)
+            existing = supabase.table("apple_stock_data")\
+                .select("id")\
+                .eq("ticker", ticker)\
+                .eq("timestamp", timestamp_str)\
+                .execute()
+            
+            if len(existing.data) > 0:
+                return True, "Registro ya existe (sin duplicar)"
+            
+            # Insertar en Supabase
+            result = supabase.table("apple_stock_data").insert(insert_data).execute()
+            return True, f"Inserción exitosa: {timestamp_str}"
+        else:
+            return False, f"Datos inválidos (valores cero): {insert_data}"
+            
+    except Exception as e:
+        return False, f"Error en inserción: {str(e)}"
+
+def prepare_supabase_records(data, ticker="AAPL"):
+    """
+    Normaliza todo el DataFrame de una vez (sin iterar filas)
+    Si el DataFrame trae una columna 'Ticker' (varios símbolos) se usa en lugar de `ticker`
+    Devuelve un DataFrame con las columnas de la tabla y una máscara de filas válidas
+    (validación de normalizacion.rejection_reasons: timestamp, nulos, valores > 0, high >= low
+    y sin (ticker, timestamp) repetidos)
+    """
+    records = to_records(data, ticker)
+    valid = rejection_reasons(records) == ""
+
+    records["ticker"] = records["ticker"].astype(object)
+    records["timestamp"] = records["timestamp"].dt.strftime(TIMESTAMP_FORMAT)
+    return records, pd.Series(valid, index=data.index)
+
+def valid_bar_mask(data, ticker="AAPL"):
+    """
+    Máscara (array) de las filas que pasan la validación. Solo esas se registran en el
+    índice de duplicados: una barra rechazada puede llegar corregida en otro ciclo
+    """
+    return rejection_reasons(to_records(data, ticker)) == ""
+
+def bulk_upsert_to_supabase(supabase, data, chunk_size=DEFAULT_CHUNK_SIZE, on_conflict="ticker,timestamp", ticker="AAPL"):
+    """
+    Inserta los datos en bloques con un solo upsert por bloque
+    Devuelve una lista con los registros aceptados/rechazados de cada bloque
+    """
+    records, valid = prepare_supabase_records(data, ticker)
+    chunk_results = []
+
+    for chunk_number, start in enumerate(range(0, len(records), chunk_size)):
+        chunk = records.iloc[start:start + chunk_size]
+        chunk_valid = valid.iloc[start:start + chunk_size]
+
+        payload = chunk[chunk_valid].copy()
+        payload["volume"] = payload["volume"].astype("int64")
+        rows = payload.to_dict(orient="records")
+
+        result = {
+            "chunk": chunk_number,
+            "aceptados": 0,
+            "rechazados": int((~chunk_valid).sum()),
+            "error": None
+        }
+
+        if rows:
+            try:
+                # Los registros que ya existen se ignoran (sin duplicar)
+                supabase.table("apple_stock_data")\
+                    .upsert(rows, on_conflict=on_conflict, ignore_duplicates=True)\
+                    .execute()
+                result["aceptados"] = len(rows)
+            except Exception as e:
+                result["rechazados"] += len(rows)
+                result["error"] = f"Error en inserción: {str(e)}"
+
+        chunk_results.append(result)
+
+    return chunk_results
+
+def insert_all_data_to_supabase(supabase, data, batch=True, chunk_size=DEFAULT_CHUNK_SIZE, ticker="AAPL",
+                                dedup=None):
+    """
+    Inserta TODOS los datos descargados en Supabase (no solo el último)
+    Con batch=True usa un upsert por bloque; con batch=False inserta fila por fila
+    Con `dedup` (dedup.DedupIndex) las barras ya ingeridas se descartan sin consultar Supabase
+    """
+    if batch:
+        if dedup is not None:
+            key_tickers, keys = bar_keys(data, ticker)
+            is_new = dedup.filter_new(key_tickers, keys)
+            data = data[is_new]
+        chunk_results = bulk_upsert_to_supabase(supabase, data, chunk_size=chunk_size, ticker=ticker)
+        if dedup is not None and not any(result["error"] for result in chunk_results):
+            stored = valid_bar_mask(data, ticker)
+            dedup.add(key_tickers[is_new][stored], keys[is_new][stored])
+        success_count = sum(result["aceptados"] for result in chunk_results)
+        error_count = sum(result["rechazados"] for result in chunk_results)
+        return success_count, error_count
+
+    success_count = 0
+    error_count = 0
+
+    for index, row in data.iterrows():
+        success, message = safe_insert_to_supabase(supabase, row, row.get('Ticker', ticker), dedup=dedup)
+        if success:
+            success_count += 1
+        else:
+            error_count += 1
+
+    return success_count, error_count
+
+
+def run_ingestion_cycle(supabase, tickers=("AAPL",), marks=None, chunk_size=DEFAULT_CHUNK_SIZE, rollups=None,
+                        writer=None, spool=None, dedup=None, now=None, download=obtener_datos_multiples):
+    """
+    Ejecuta un ciclo incremental para toda la lista de tickers:
+    descarga solo las barras posteriores a la marca de cada ticker y las inserta en lote
+    `marks` ({ticker: última barra guardada}) se actualiza en el sitio si la inserción va bien
+    Con `rollups` (agregados.RollupStore) las barras nuevas actualizan también los agregados
+    Con `writer` (escritor_async.AsyncSupabaseWriter) la inserción usa peticiones concurrentes
+    Con `spool` (spool.WriteSpool) las barras solo se añaden al spool local y un flusher
+    las envía después: el ciclo no depende de que Supabase responda
+    Con `dedup` (dedup.DedupIndex) las barras ya ingeridas se descartan en memoria
+    `now` y `download(tickers, start=...)` permiten reproducir barras grabadas con un reloj
+    simulado (benchmarks/reproduccion.py); por defecto, la hora actual y Yahoo Finance
+    Devuelve un diccionario con el resultado y los tiempos del ciclo
+    """
+    started = time.monotonic()
+    now = now if now is not None else pd.Timestamp.now(tz="UTC")
+    marks = marks if marks is not None else {}
+    result = {
+        "tickers": len(tickers),
+        "sin_datos": [],
+        "huecos": {},
+        "descargados": 0,
+        "aceptados": 0,
+        "rechazados": 0,
+        "ultima_barra": None,
+        "error": None
+    }
+
+    try:
+        groups, result["huecos"] = plan_incremental_fetch(marks, tickers, now)
+
+        # Una descarga multi-símbolo por cada marca distinta (normalmente una sola)
+        frames = {}
+        for fetch_start, group in groups.items():
+            frames.update(download(group, start=fetch_start))
+        result["descarga_s"] = round(time.monotonic() - started, 3)
+
+        new_frames = []
+        for ticker in tickers:
+            data = frames.get(ticker)
+            if data is None or data.empty:
+                result["sin_datos"].append(ticker)
+                continue
+            result["descargados"] += len(data)
+            new_bars = select_new_bars(data, marks.get(ticker), now)
+            if not new_bars.empty:
+                new_frames.append(new_bars.assign(Ticker=ticker))
+
+        if new_frames:
+            # Todos los símbolos van por el mismo camino de inserción en lote
+            fetched = pd.concat(new_frames, ignore_index=True)
+            new_data = fetched
+            if dedup is not None:
+                # Barras ya ingeridas (solapes, marcas perdidas): se descartan sin ir a la red
+                key_tickers, keys = bar_keys(fetched)
+                is_new = dedup.filter_new(key_tickers, keys)
+                result["duplicadas"] = int((~is_new).sum())
+                new_data = fetched[is_new].reset_index(drop=True)
+
+            insert_started = time.monotonic()
+            if new_data.empty:
+                chunk_results = []
+            elif spool is not None:
+                records, valid = prepare_supabase_records(new_data)
+                spool.append(records[valid])
+                chunk_results = [{"chunk": 0, "aceptados": int(valid.sum()),
+                                  "rechazados": int((~valid).sum()), "error": None}]
+            elif writer is not None:
+                chunk_results = writer.write(new_data)
+            else:
+                chunk_results = bulk_upsert_to_supabase(supabase, new_data, chunk_size=chunk_size)
+            result["insercion_s"] = round(time.monotonic() - insert_started, 3)
+            result["aceptados"] = sum(r["aceptados"] for r in chunk_results)
+            result["rechazados"] = sum(r["rechazados"] for r in chunk_results)
+            if result["rechazados"]:
+                result["motivos_rechazo"] = rejection_summary(rejection_report(to_records(new_data)))
+
+            errors = [r["error"] for r in chunk_results if r["error"]]
+            if errors:
+                # Sin avanzar marcas: el próximo ciclo vuelve a pedir estas barras
+                result["error"] = errors[0]
+            else:
+                if dedup is not None and not new_data.empty:
+                    stored = valid_bar_mask(new_data)
+                    dedup.add(key_tickers[is_new][stored], keys[is_new][stored])
+                timestamps = pd.to_datetime(fetched['Datetime'], utc=True)
+                for ticker, last_bar in timestamps.groupby(fetched['Ticker']).max().items():
+                    marks[ticker] = last_bar
+                result["ultima_barra"] = timestamps.max().isoformat()
+
+                # Agregados 5m/15m/1h/1d: solo cambian los buckets de las barras nuevas
+                if rollups is not None and not new_data.empty:
+                    try:
+                        records, valid = prepare_supabase_records(new_data)
+                        rollups.update(records[valid], supabase)
+                        result["agregados"] = rollups.flush(supabase)
+                    except Exception as e:
+                        # Las barras ya están guardadas; los buckets pendientes se guardan en el siguiente ciclo
+                        result["error_agregados"] = f"Error al guardar agregados: {str(e)}"
+        elif len(result["sin_datos"]) == len(tickers) and not marks:
+            result["error"] = "No se pudieron obtener datos de Yahoo Finance"
+
+    except Exception as e:
+        result["error"] = f"Error en el ciclo de ingesta: {str(e)}"
+
+    if spool is not None:
+        result["spool_pendientes"] = spool.pending_count()
+
+    result["duracion_s"] = round(time.monotonic() - started, 3)
+    return result
+
+def write_status(status, path=STATUS_PATH):
+    """
+    Escribe el estado del worker de forma atómica (archivo temporal + rename)
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(status, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def read_status(path=STATUS_PATH):
+    """
+    Lee el estado publicado por el worker (None si no existe o está corrupto)
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def worker_health(status, now=None):
+    """
+    Calcula la salud del worker a partir de su último heartbeat
+    Devuelve (estado, segundos desde el último ciclo, segundos de retraso de la última barra)
+    """
+    if not status or not status.get("ultimo_ciclo"):
+        return "sin_datos", None, None
+
+    now = now or datetime.now(timezone.utc)
+    interval = status.get("intervalo_s", 60)
+
+    heartbeat_age = (now - datetime.fromisoformat(status["ultimo_ciclo"])).total_seconds()
+
+    bar_lag = None
+    if status.get("ultima_barra"):
+        bar_lag = (now - datetime.fromisoformat(status["ultima_barra"])).total_seconds()
+
+    if heartbeat_age <= 2 * interval and not status.get("error"):
+        health = "ok"
+    elif heartbeat_age <= 5 * interval:
+        health = "retrasado"
+    else:
+        health = "caido"
+
+    return health, heartbeat_age, bar_lag
@@ -0,0 +1,159 @@
+"""
+Lector por bloques del histórico de apple_stock_data
+
+Lee meses de barras de 1 minuto página a página (paginación keyset) y entrega
+cada página ya tipada, sin construir nunca un DataFrame gigante a partir de la
+lista de dicts completa.
+
+Uso:
+    python lector_historico.py --tickers AAPL --desde 2024-01-01 --hasta 2024-03-31
+    python lector_historico.py --tickers AAPL,MSFT --desde 2024-01-01 --salida historico.parquet
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from consultas import iter_filtered_pages, DEFAULT_PAGE_SIZE
+
+HISTORY_COLUMNS = ["ticker", "timestamp", "open", "high", "low", "close", "volume"]
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+
+# Registro compacto: precios float32, volumen int64, timestamp en ns UTC
+HISTORY_DTYPE = np.dtype([
+    ("ticker", "U10"),
+    ("timestamp", "datetime64[ns]"),
+    ("open", "f4"),
+    ("high", "f4"),
+    ("low", "f4"),
+    ("close", "f4"),
+    ("volume", "i8")
+])
+
+def peak_rss_mb():
+    """
+    Pico de memoria residente del proceso en MB (ru_maxrss viene en KB en Linux, bytes en macOS)
+    None donde no existe el módulo resource (Windows)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def format_mb(value):
+    return f"{value:.1f} MB" if value is not None else "n/d"
+
+def page_to_columns(rows):
+    """
+    Convierte una página JSON en arrays tipados por columna (sin DataFrame intermedio)
+    """
+    n = len(rows)
+    columns = {
+        "ticker": np.array([row["ticker"] for row in rows], dtype=HISTORY_DTYPE["ticker"]),
+        "timestamp": pd.to_datetime([row["timestamp"] for row in rows], utc=True)
+            .tz_localize(None).to_numpy(dtype="datetime64[ns]")
+    }
+    for column in PRICE_COLUMNS:
+        columns[column] = np.fromiter((row[column] for row in rows), dtype="f4", count=n)
+    columns["volume"] = np.fromiter((row["volume"] for row in rows), dtype="i8", count=n)
+    return columns
+
+def columns_to_frame(columns):
+    """DataFrame tipado a partir de los arrays por columna (timestamp en UTC)"""
+    df = pd.DataFrame(columns, copy=False)
+    df["timestamp"] = df["timestamp"].dt.tz_localize("UTC")
+    return df
+
+def columns_to_records(columns):
+    """Array estructurado de NumPy a partir de los arrays por columna"""
+    records = np.empty(len(columns["timestamp"]), dtype=HISTORY_DTYPE)
+    for column in HISTORY_DTYPE.names:
+        records[column] = columns[column]
+    return records
+
+def iter_history_chunks(supabase, tickers=None, start=None, end=None, page_size=DEFAULT_PAGE_SIZE,
+                        as_numpy=False, row_budget=None, stats=None):
+    """
+    Generador: devuelve el histórico en orden cronológico, una página tipada cada vez
+    (DataFrame, o array estructurado con as_numpy=True). La página JSON se libera
+    antes de pedir la siguiente. Si se pasa `stats` (dict) se rellena con filas,
+    páginas, segundos, filas/s y pico de RSS
+    """
+    started = time.perf_counter()
+    stats = stats if stats is not None else {}
+    stats.update({"filas": 0, "paginas": 0})
+
+    pages = iter_filtered_pages(
+        supabase,
+        tickers=tickers,
+        start=pd.Timestamp(start, tz="UTC") if start is not None else None,
+        end=pd.Timestamp(end, tz="UTC") if end is not None else None,
+        page_size=page_size,
+        row_budget=row_budget if row_budget is not None else sys.maxsize,
+        columns=HISTORY_COLUMNS
+    )
+
+    for rows in pages:
+        columns = page_to_columns(rows)
+        del rows
+
+        stats["filas"] += len(columns["timestamp"])
+        stats["paginas"] += 1
+        elapsed = time.perf_counter() - started
+        stats["segundos"] = round(elapsed, 3)
+        stats["filas_por_s"] = round(stats["filas"] / elapsed, 1) if elapsed > 0 else 0.0
+        peak = peak_rss_mb()
+        stats["pico_rss_mb"] = round(peak, 1) if peak is not None else None
+
+        yield columns_to_records(columns) if as_numpy else columns_to_frame(columns)
+
+def read_history(supabase, tickers=None, start=None, end=None, page_size=DEFAULT_PAGE_SIZE,
+                 as_numpy=False, row_budget=None, stats=None):
+    """
+    Lee todo el rango y concatena los bloques en un solo DataFrame (o array estructurado)
+    Solo se acumulan los bloques ya tipados; nunca conviven el JSON completo y el resultado
+    """
+    chunks = list(iter_history_chunks(supabase, tickers, start, end, page_size,
+                                      as_numpy=True, row_budget=row_budget, stats=stats))
+
+    records = np.concatenate(chunks) if chunks else np.empty(0, dtype=HISTORY_DTYPE)
+    del chunks
+
+    if as_numpy:
+        return records
+
+    df = pd.DataFrame({column: records[column] for column in HISTORY_DTYPE.names})
+    df["ticker"] = df["ticker"].astype("category")
+    df["timestamp"] = df["timestamp"].dt.tz_localize("UTC")
+    return df
+
+def main():
+    from configuracion import get_supabase_client
+
+    parser = argparse.ArgumentParser(description="Lectura por bloques del histórico de apple_stock_data")
+    parser.add_argument("--tickers", default="AAPL", help="Tickers separados por coma")
+    parser.add_argument("--desde", default=None, help="Fecha/hora inicial (UTC)")
+    parser.add_argument("--hasta", default=None, help="Fecha/hora final, exclusiva (UTC)")
+    parser.add_argument("--pagina", type=int, default=DEFAULT_PAGE_SIZE, help="Filas por página")
+    parser.add_argument("--salida", default=None, help="Guardar el resultado en Parquet")
+    args = parser.parse_args()
+
+    supabase = get_supabase_client()
+    tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+
+    stats = {}
+    df = read_history(supabase, tickers, args.desde, args.hasta, page_size=args.pagina, stats=stats)
+
+    print(f"{stats.get('filas', 0):,} filas en {stats.get('paginas', 0)} páginas · "
+          f"{stats.get('filas_por_s', 0):,.0f} filas/s · pico RSS {format_mb(stats.get('pico_rss_mb', peak_rss_mb()))}")
+
+    if args.salida:
+        df.to_parquet(args.salida, index=False)
+        print(f"Guardado en {args.salida}")
+
+if __name__ == "__main__":
+    main()
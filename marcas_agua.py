@@ -0,0 +1,94 @@
+import pandas as pd
+import json
+import os
+from datetime import timedelta
+
+# Archivo local con la última barra guardada por ticker (high-water mark)
+MARKS_PATH = os.getenv(
+    "INGESTA_MARCAS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".marcas_agua.json")
+)
+
+# Yahoo solo sirve barras de 1 minuto de los últimos ~30 días, en ventanas de hasta 8 días
+MAX_LOOKBACK = timedelta(days=7)
+BAR_INTERVAL = timedelta(minutes=1)
+
+def load_high_water_marks(supabase, tickers, path=MARKS_PATH):
+    """
+    Carga la última barra guardada de cada ticker
+    Primero desde el archivo local; los tickers que falten se consultan una sola vez en Supabase
+    Devuelve un diccionario {ticker: pd.Timestamp UTC}
+    """
+    marks = {}
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            stored = json.load(f)
+        marks = {t: pd.Timestamp(ts) for t, ts in stored.items() if t in tickers}
+    except (OSError, ValueError):
+        pass
+
+    for ticker in tickers:
+        if ticker in marks:
+            continue
+        try:
+            resp = supabase.table("apple_stock_data")\
+                .select("timestamp")\
+                .eq("ticker", ticker)\
+                .order("timestamp", desc=True)\
+                .limit(1)\
+                .execute()
+            if resp.data:
+                marks[ticker] = pd.to_datetime(resp.data[0]["timestamp"], utc=True)
+        except Exception:
+            # Sin marca: el ticker se descargará completo (period='1d')
+            pass
+
+    return marks
+
+def save_high_water_marks(marks, path=MARKS_PATH):
+    """
+    Guarda las marcas de forma atómica (archivo temporal + rename)
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({t: ts.isoformat() for t, ts in marks.items()}, f, indent=2)
+    os.replace(tmp_path, path)
+
+def plan_incremental_fetch(marks, tickers, now):
+    """
+    Agrupa los tickers por el instante desde el que hay que descargar
+    (los que comparten marca van en la misma descarga multi-símbolo)
+    Devuelve ({start o None: [tickers]}, {ticker: minutos de hueco detectados})
+    """
+    groups = {}
+    gaps = {}
+    oldest_allowed = (now - MAX_LOOKBACK).floor("min")
+
+    for ticker in tickers:
+        mark = marks.get(ticker)
+        if mark is None:
+            groups.setdefault(None, []).append(ticker)
+            continue
+
+        start = mark + BAR_INTERVAL
+        missing_minutes = int((now - start) / BAR_INTERVAL)
+
+        # Más de una barra pendiente: hueco (app caída, reinicio...) que se rellena ahora
+        if missing_minutes > 1:
+            gaps[ticker] = missing_minutes
+
+        groups.setdefault(max(start, oldest_allowed), []).append(ticker)
+
+    return groups, gaps
+
+def select_new_bars(data, mark, now):
+    """
+    Deja solo las barras posteriores a la marca y ya cerradas
+    (la barra del minuto en curso todavía puede cambiar)
+    """
+    timestamps = pd.to_datetime(data['Datetime'], utc=True)
+    keep = timestamps + BAR_INTERVAL <= now
+    if mark is not None:
+        keep &= timestamps > mark
+    return data[keep]
@@ -0,0 +1,304 @@
+"""
+Métricas por etapa de cada ejecución (rerun) del dashboard
+
+Cada etapa registra tiempo de reloj, filas y bytes de payload; los errores que el
+dashboard captura y no propaga se cuentan por etapa. Cada ejecución registra además
+su tipo (rerun completo o fragmento en vivo), el tiempo de CPU y los bytes enviados. Se conservan las últimas
+muestras de cada etapa para calcular p50/p95 y, opcionalmente, se exportan a un
+archivo local en formato texto de Prometheus o en JSON lines (una línea por rerun).
+Una ejecución cortada antes de terminar (st.stop, st.rerun o una excepción) se registra
+como interrumpida, medida hasta el final de su última etapa.
+
+Configuración:
+    METRICAS_PATH=metricas.prom METRICAS_FORMATO=prometheus   (o METRICAS_FORMATO=jsonl)
+
+Resumen p50/p95 de un archivo JSON lines:
+    python metricas.py --archivo metricas.jsonl
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+METRICS_PATH = os.getenv("METRICAS_PATH")
+METRICS_FORMAT = os.getenv("METRICAS_FORMATO", "prometheus")
+
+QUANTILES = (0.5, 0.95)
+
+def summarize(samples):
+    """{n, p50, p95, media} de una lista de segundos"""
+    values = np.asarray(samples, dtype="float64")
+    if values.size == 0:
+        return {"n": 0, "p50": None, "p95": None, "media": None}
+    p50, p95 = np.percentile(values, [q * 100 for q in QUANTILES])
+    return {"n": int(values.size), "p50": float(p50), "p95": float(p95), "media": float(values.mean())}
+
+class RunMetrics:
+    """Etapas y errores de una sola ejecución del script (o de un fragmento)"""
+
+    def __init__(self, parent, number, kind="completo"):
+        self.parent = parent
+        self.number = number
+        self.kind = kind
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        # CPU del hilo del script (las sesiones se ejecutan en hilos distintos)
+        self._cpu_started = time.thread_time()
+        # (reloj, CPU) al final de la última etapa y al cerrar la ejecución
+        self._last_activity = (self._started, self._cpu_started)
+        self._ended = None
+        self.finished = False
+        self.interrupted = False
+        self.stages = []
+        self.errors = []
+
+    @contextmanager
+    def stage(self, name, rows=None, bytes=None):
+        """
+        Mide el bloque como etapa `name`. El dict devuelto admite 'filas' y 'bytes'
+        calculados dentro del bloque. Una excepción que atraviese el bloque se cuenta
+        como error de la etapa y se vuelve a lanzar
+        """
+        sample = {"etapa": name, "segundos": None, "filas": rows, "bytes": bytes}
+        started = time.perf_counter()
+        try:
+            yield sample
+        except Exception as e:
+            self.error(name, e)
+            raise
+        finally:
+            sample["segundos"] = time.perf_counter() - started
+            self.stages.append(sample)
+            self._last_activity = (time.perf_counter(), time.thread_time())
+
+    def error(self, stage, exc):
+        """Cuenta un error capturado (y no propagado) en la etapa `stage`"""
+        self.errors.append({"etapa": stage, "error": f"{type(exc).__name__}: {exc}"})
+
+    def total_seconds(self):
+        ended = self._ended[0] if self._ended else time.perf_counter()
+        return ended - self._started
+
+    def cpu_seconds(self):
+        ended = self._ended[1] if self._ended else time.thread_time()
+        return ended - self._cpu_started
+
+    def bytes_sent(self):
+        """Bytes de payload registrados en las etapas (gráficas y tablas enviadas al navegador)"""
+        return sum(sample["bytes"] or 0 for sample in self.stages)
+
+    def finish(self, interrupted=False):
+        """
+        Cierra la ejecución: acumula las muestras y exporta si está configurado (solo la
+        primera vez). `interrupted`: la ejecución no llegó al final; se mide hasta el final
+        de su última etapa, porque se puede cerrar más tarde y desde otro hilo
+        """
+        if self.finished:
+            return
+        self._ended = self._last_activity if interrupted else (time.perf_counter(), time.thread_time())
+        self.interrupted = interrupted
+        self.finished = True
+        self.parent._finish(self)
+
+    def to_dict(self):
+        return {
+            "run": self.number,
+            "tipo": self.kind,
+            "inicio": self.started_at.isoformat(timespec="milliseconds"),
+            "total_s": round(self.total_seconds(), 6),
+            "cpu_s": round(self.cpu_seconds(), 6),
+            "bytes": self.bytes_sent(),
+            "interrumpida": self.interrupted,
+            "etapas": [
+                {**sample, "segundos": round(sample["segundos"], 6)} for sample in self.stages
+            ],
+            "errores": self.errors
+        }
+
+class PipelineMetrics:
+    """
+    Métricas acumuladas del proceso, compartidas por todas las sesiones
+    Se guardan las últimas `max_samples` duraciones por etapa (para p50/p95)
+    """
+
+    def __init__(self, max_samples=1000, export_path=METRICS_PATH, export_format=METRICS_FORMAT):
+        self.max_samples = max_samples
+        self.export_path = export_path
+        self.export_format = export_format
+
+        self._samples = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self._totals = defaultdict(lambda: {"count": 0, "sum": 0.0, "filas": None, "bytes": None})
+        self._errors = defaultdict(int)
+        self._runs = 0
+        self._interrupted = 0
+        self._run_samples = deque(maxlen=max_samples)
+        # Por tipo de ejecución: (segundos, CPU, bytes) de las últimas ejecuciones
+        self._refreshes = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self._lock = threading.Lock()
+
+    def start_run(self, kind="completo"):
+        with self._lock:
+            self._runs += 1
+            return RunMetrics(self, self._runs, kind)
+
+    def _finish(self, run):
+        with self._lock:
+            for sample in run.stages:
+                name = sample["etapa"]
+                self._samples[name].append(sample["segundos"])
+                totals = self._totals[name]
+                totals["count"] += 1
+                totals["sum"] += sample["segundos"]
+                totals["filas"] = sample["filas"]
+                totals["bytes"] = sample["bytes"]
+            for error in run.errors:
+                self._errors[error["etapa"]] += 1
+            if run.interrupted:
+                self._interrupted += 1
+            self._run_samples.append(run.total_seconds())
+            self._refreshes[run.kind].append((run.total_seconds(), run.cpu_seconds(), run.bytes_sent()))
+
+        if self.export_path:
+            try:
+                if self.export_format == "jsonl":
+                    self.export_jsonl(run, self.export_path)
+                else:
+                    self.export_prometheus(self.export_path)
+            except OSError:
+                # La exportación es opcional: no debe romper el dashboard
+                self._errors["exportar_metricas"] += 1
+
+    def summary(self):
+        """{etapa: {n, p50, p95, media, filas, bytes, errores}} más la fila 'total'"""
+        with self._lock:
+            result = {}
+            for name, samples in self._samples.items():
+                result[name] = {
+                    **summarize(samples),
+                    "filas": self._totals[name]["filas"],
+                    "bytes": self._totals[name]["bytes"],
+                    "errores": self._errors.get(name, 0)
+                }
+            result["total"] = {**summarize(self._run_samples), "filas": None, "bytes": None,
+                               "errores": sum(self._errors.values())}
+            return result
+
+    def refresh_summary(self):
+        """{tipo: {n, p50_s, cpu_p50_s, cpu_p95_s, bytes_p50}} para comparar reruns completos y fragmentos"""
+        with self._lock:
+            result = {}
+            for kind, samples in self._refreshes.items():
+                seconds, cpu, sent = (np.asarray(column, dtype="float64") for column in zip(*samples))
+                cpu_stats = summarize(cpu)
+                result[kind] = {
+                    "n": len(samples),
+                    "p50_s": float(np.median(seconds)),
+                    "cpu_p50_s": cpu_stats["p50"],
+                    "cpu_p95_s": cpu_stats["p95"],
+                    "bytes_p50": float(np.median(sent))
+                }
+            return result
+
+    def error_counts(self):
+        with self._lock:
+            return dict(self._errors)
+
+    def interrupted_runs(self):
+        with self._lock:
+            return self._interrupted
+
+    def to_prometheus(self):
+        """Texto en formato de exposición de Prometheus (summary por etapa + contadores)"""
+        with self._lock:
+            lines = [
+                "# HELP dashboard_stage_seconds Tiempo de reloj por etapa del dashboard",
+                "# TYPE dashboard_stage_seconds summary"
+            ]
+            for name, samples in sorted(self._samples.items()):
+                stats = summarize(samples)
+                for quantile, key in zip(QUANTILES, ("p50", "p95")):
+                    lines.append(f'dashboard_stage_seconds{{stage="{name}",quantile="{quantile}"}} {stats[key]:.6f}')
+                lines.append(f'dashboard_stage_seconds_sum{{stage="{name}"}} {self._totals[name]["sum"]:.6f}')
+                lines.append(f'dashboard_stage_seconds_count{{stage="{name}"}} {self._totals[name]["count"]}')
+
+            for metric, field, help_text in (
+                ("dashboard_stage_rows", "filas", "Filas procesadas en la última ejecución de la etapa"),
+                ("dashboard_stage_bytes", "bytes", "Bytes de payload en la última ejecución de la etapa")
+            ):
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+                for name, totals in sorted(self._totals.items()):
+                    if totals[field] is not None:
+                        lines.append(f'{metric}{{stage="{name}"}} {totals[field]}')
+
+            lines += ["# HELP dashboard_errors_total Errores capturados por etapa",
+                      "# TYPE dashboard_errors_total counter"]
+            for name, count in sorted(self._errors.items()):
+                lines.append(f'dashboard_errors_total{{stage="{name}"}} {count}')
+
+            for metric, position, help_text in (
+                ("dashboard_refresh_cpu_seconds", 1, "Tiempo de CPU por ejecución (completa o fragmento)"),
+                ("dashboard_refresh_bytes", 2, "Bytes enviados al navegador por ejecución")
+            ):
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} summary"]
+                for kind, samples in sorted(self._refreshes.items()):
+                    values = [sample[position] for sample in samples]
+                    stats = summarize(values)
+                    for quantile, key in zip(QUANTILES, ("p50", "p95")):
+                        lines.append(f'{metric}{{kind="{kind}",quantile="{quantile}"}} {stats[key]:.6f}')
+                    lines.append(f'{metric}_sum{{kind="{kind}"}} {sum(values):.6f}')
+                    lines.append(f'{metric}_count{{kind="{kind}"}} {len(values)}')
+
+            lines += ["# HELP dashboard_runs_total Ejecuciones del script",
+                      "# TYPE dashboard_runs_total counter",
+                      f"dashboard_runs_total {self._runs}",
+                      "# HELP dashboard_runs_interrupted_total Ejecuciones cortadas antes de terminar",
+                      "# TYPE dashboard_runs_interrupted_total counter",
+                      f"dashboard_runs_interrupted_total {self._interrupted}"]
+            return "\n".join(lines) + "\n"
+
+    def export_prometheus(self, path):
+        """Reescribe el archivo de forma atómica (válido para el textfile collector de node_exporter)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def export_jsonl(run, path):
+        """Añade una línea con las etapas y errores de la ejecución"""
+        with open(path, "a") as f:
+            f.write(json.dumps(run.to_dict()) + "\n")
+
+def summarize_jsonl(path):
+    """p50/p95 por etapa a partir de un archivo JSON lines exportado"""
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            run = json.loads(line)
+            samples["total"].append(run["total_s"])
+            for stage in run["etapas"]:
+                samples[stage["etapa"]].append(stage["segundos"])
+            for error in run["errores"]:
+                errors[error["etapa"]] += 1
+    return {name: {**summarize(values), "errores": errors.get(name, 0)} for name, values in samples.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumen p50/p95 de las métricas exportadas en JSON lines")
+    parser.add_argument("--archivo", default=METRICS_PATH or "metricas.jsonl")
+    args = parser.parse_args()
+
+    print(f"{'etapa':<24} {'n':>6} {'p50 (ms)':>10} {'p95 (ms)':>10} {'errores':>8}")
+    for name, stats in sorted(summarize_jsonl(args.archivo).items(), key=lambda item: -(item[1]["p95"] or 0)):
+        print(f"{name:<24} {stats['n']:>6} {stats['p50'] * 1000:>10.1f} {stats['p95'] * 1000:>10.1f} {stats['errores']:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Normalización vectorizada de las descargas de yf.download
+
+Una sola etapa para cualquier forma de la descarga y cualquier número de tickers:
+
+- columnas planas, MultiIndex (Price, Ticker) o (Ticker, Price) con group_by='ticker',
+  y DataFrames ya aplanados con columna Datetime [y Ticker]
+- timestamps convertidos a UTC de una vez (naive = UTC)
+- tipos compactos: ticker como category, volumen int64, sin columnas que no se guardan
+- validación de todas las filas en una sola pasada, con el motivo de cada rechazo
+
+normalize_download(raw) -> (DataFrame limpio con las columnas de la tabla, informe de rechazos)
+"""
+import numpy as np
+import pandas as pd
+
+# Columnas de precio de yfinance y su nombre en apple_stock_data
+PRICE_FIELDS = {"Open": "open", "High": "high", "Low": "low", "Close": "close", "Volume": "volume"}
+RECORD_COLUMNS = ["ticker", "timestamp", "open", "high", "low", "close", "volume"]
+VALUE_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# Formato de los timestamps enviados a Supabase (siempre UTC)
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S+00:00"
+
+# Motivos de rechazo, en orden de prioridad (cada fila se informa con el primero que cumple)
+REJECTION_REASONS = [
+    "timestamp_invalido",
+    "valores_nulos",
+    "valores_no_positivos",
+    "high_menor_que_low",
+    "duplicado"
+]
+
+def flatten_download(raw, ticker="AAPL"):
+    """
+    Cualquier forma de yf.download -> formato largo: Datetime, Ticker, Open, High, Low, Close, Volume
+    Las filas sin ningún valor (huecos de un ticker en una descarga multi-símbolo) se descartan
+    """
+    if isinstance(raw.columns, pd.MultiIndex):
+        # El nivel de precios es el que contiene Open/Close...; el otro es el ticker
+        price_level = 0 if "Close" in raw.columns.get_level_values(0) else 1
+        long = raw.stack(level=1 - price_level, future_stack=True)
+        long.index = long.index.set_names(["Datetime", "Ticker"])
+        long = long.reset_index()
+    else:
+        long = raw.reset_index() if "Datetime" not in raw.columns else raw.copy(deep=False)
+        if "Datetime" not in long.columns:
+            # Índice sin nombre o llamado Date (barras diarias)
+            long = long.rename(columns={long.columns[0]: "Datetime"})
+        if "Ticker" not in long.columns:
+            long["Ticker"] = ticker
+
+    long.columns.name = None
+    fields = [field for field in PRICE_FIELDS if field in long.columns]
+    long = long[["Datetime", "Ticker"] + fields]
+    return long[long[fields].notna().any(axis=1)].reset_index(drop=True)
+
+def to_records(long, ticker="AAPL"):
+    """
+    Formato largo de yfinance (Datetime, [Ticker,] Open...) -> columnas de la tabla
+    Sin validar y alineado fila a fila con la entrada; sin columna Ticker se usa `ticker`
+    """
+    tickers = long["Ticker"] if "Ticker" in long.columns else pd.Series(ticker, index=long.index)
+    records = pd.DataFrame({
+        "ticker": tickers.astype("category"),
+        "timestamp": pd.to_datetime(long["Datetime"], utc=True, errors="coerce"),
+        **{
+            column: pd.to_numeric(long[field], errors="coerce") if field in long.columns else np.nan
+            for field, column in PRICE_FIELDS.items()
+        }
+    })
+    return records
+
+def rejection_reasons(records):
+    """
+    Motivo de rechazo de cada fila ("" si es válida), calculado de una vez para todo el frame
+    Duplicado = misma (ticker, timestamp) que una fila anterior del mismo frame
+    """
+    values = records[VALUE_COLUMNS].to_numpy(dtype="float64")
+    with np.errstate(invalid="ignore"):
+        conditions = [
+            records["timestamp"].isna().to_numpy(),
+            np.isnan(values).any(axis=1),
+            (values <= 0).any(axis=1),
+            records["high"].to_numpy() < records["low"].to_numpy(),
+            records.duplicated(subset=["ticker", "timestamp"]).to_numpy()
+        ]
+    return np.select(conditions, REJECTION_REASONS, default="")
+
+def normalize_download(raw, ticker="AAPL"):
+    """
+    Descarga cruda de yf.download (uno o varios tickers) -> (limpio, rechazados)
+    `limpio`: RECORD_COLUMNS con timestamp UTC, precios float64, volumen int64, ticker category
+    `rechazados`: las filas descartadas con su columna `motivo`
+    """
+    records = to_records(flatten_download(raw, ticker))
+    reasons = rejection_reasons(records)
+    valid = reasons == ""
+
+    clean = records[valid].reset_index(drop=True)
+    clean["volume"] = clean["volume"].astype("int64")
+    return clean, rejection_report(records, reasons)
+
+def rejection_report(records, reasons=None):
+    """Filas rechazadas de `records` con su columna `motivo`"""
+    reasons = rejection_reasons(records) if reasons is None else reasons
+    rejected = reasons != ""
+    return records[rejected].assign(motivo=reasons[rejected]).reset_index(drop=True)
+
+def json_rows(clean):
+    """Registros limpios (salida de normalize_download) -> lista de dicts JSON para PostgREST"""
+    payload = clean.assign(
+        ticker=clean["ticker"].astype(object),
+        timestamp=clean["timestamp"].dt.strftime(TIMESTAMP_FORMAT)
+    )
+    return payload[RECORD_COLUMNS].to_dict(orient="records")
+
+def rejection_summary(rejected):
+    """{motivo: filas rechazadas}"""
+    return {reason: int(count) for reason, count in rejected["motivo"].value_counts().items()}
@@ -1,6 +1,66 @@
-import yfinance as yf
+from normalizacion import flatten_download
+
+# yfinance se importa al descargar (~130 ms): el dashboard en modo solo lectura no lo carga
+
+def obtener_datos(ticker='AAPL', period='1d', interval='1m'):
+    """
+    Descarga las barras de Yahoo Finance con Datetime como columna
+    """
+    import yfinance as yf
+
+    data = yf.download(tickers=ticker, period=period, interval=interval, progress=False)
+
+    if data.empty:
+        return data
+
+    # Columnas planas (MultiIndex (Price, Ticker) incluido) y Datetime como columna
+    return flatten_download(data, ticker).drop(columns="Ticker")
 
 def obtener_datos_aapl():
-    data = yf.download(tickers='AAPL', period='1d', interval='1m')
-    data.reset_index(inplace=True)
-    return data
\ No newline at end of file
+    return obtener_datos('AAPL')
+
+def _split_by_ticker(data, tickers):
+    """
+    Separa la descarga multi-símbolo (columnas Ticker/Price) en un DataFrame por ticker
+    """
+    frames = {}
+
+    if data.empty:
+        return frames
+
+    long = flatten_download(data)
+    wanted = set(tickers)
+    for ticker, frame in long.groupby("Ticker", sort=False):
+        if ticker in wanted:
+            frames[ticker] = frame.drop(columns="Ticker").reset_index(drop=True)
+
+    return frames
+
+def obtener_datos_multiples(tickers, period='1d', interval='1m', batch_size=100, max_workers=8, start=None):
+    """
+    Descarga varios tickers en lotes multi-símbolo
+    Cada lote es una sola llamada a yf.download con un pool de `max_workers` hilos;
+    los lotes van en serie porque yf.download guarda resultados en estado global compartido
+    Con `start` solo se piden las barras desde ese instante (en lugar de todo `period`)
+    Devuelve un diccionario {ticker: DataFrame con Datetime como columna}
+    """
+    import yfinance as yf
+
+    frames = {}
+    tickers = list(dict.fromkeys(tickers))
+
+    for offset in range(0, len(tickers), batch_size):
+        batch = tickers[offset:offset + batch_size]
+        # Rango pedido: desde `start` (incremental) o el periodo completo
+        time_range = {'start': start} if start is not None else {'period': period}
+        data = yf.download(
+            tickers=batch,
+            interval=interval,
+            **time_range,
+            group_by='ticker',
+            threads=min(max_workers, len(batch)),
+            progress=False
+        )
+        frames.update(_split_by_ticker(data, batch))
+
+    return frames
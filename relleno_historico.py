@@ -0,0 +1,281 @@
+"""
+Relleno histórico (backfill) de barras de 1 minuto, en paralelo y reanudable
+
+Yahoo Finance solo sirve las barras de 1 minuto en ventanas de pocos días, así que un
+rango largo se divide en ventanas [inicio, fin) por ticker:
+
+- plan_windows() reparte el rango en ventanas alineadas a múltiplos fijos de `window`
+  (desde epoch), así que dos ejecuciones con el mismo rango generan las mismas ventanas
+- run_backfill() descarga y normaliza las ventanas en un pool acotado de hilos y guarda
+  los resultados con escrituras en lote (un `send(filas)` como los del spool)
+- BackfillCheckpoint registra en SQLite cada ventana terminada: tras un corte, la
+  siguiente ejecución salta las ventanas ya hechas y continúa por las pendientes
+
+La fuente de datos es una función fetch(ticker, inicio, fin) -> DataFrame con la forma de
+yfinance, de modo que puede sustituirse por una fuente sintética en pruebas.
+"""
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from agregados import complete_rollup_rows
+from normalizacion import json_rows, normalize_download
+
+CHECKPOINT_PATH = os.getenv(
+    "INGESTA_RELLENO_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".relleno_historico.sqlite3")
+)
+
+# Yahoo: barras de 1 minuto de los últimos 30 días, como mucho 8 días por petición
+YAHOO_1M_LOOKBACK = timedelta(days=30)
+DEFAULT_WINDOW = timedelta(days=7)
+
+# Filas por escritura en lote
+DEFAULT_WRITE_BATCH = 5000
+
+# Sesión regular del mercado (hora de Nueva York)
+MARKET_TZ = "America/New_York"
+MARKET_OPEN = timedelta(hours=9, minutes=30)
+MARKET_CLOSE = timedelta(hours=16)
+
+Window = namedtuple("Window", ["ticker", "start", "end"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ventanas (
+    ticker TEXT NOT NULL,
+    inicio TEXT NOT NULL,
+    fin TEXT NOT NULL,
+    filas INTEGER NOT NULL,
+    rechazadas INTEGER NOT NULL,
+    completada TEXT NOT NULL,
+    PRIMARY KEY (ticker, inicio, fin)
+);
+"""
+
+def _utc(timestamp):
+    timestamp = pd.Timestamp(timestamp)
+    return timestamp.tz_localize("UTC") if timestamp.tz is None else timestamp.tz_convert("UTC")
+
+def plan_windows(tickers, start, end, window=DEFAULT_WINDOW):
+    """
+    Ventanas [inicio, fin) de cada ticker que cubren [start, end)
+    Los cortes caen en múltiplos de `window` desde epoch (estables entre ejecuciones);
+    solo la primera y la última ventana se recortan al rango pedido
+    """
+    start, end = _utc(start), _utc(end)
+    epoch = pd.Timestamp(0, tz="UTC")
+    width = pd.Timedelta(window)
+
+    bounds = [start]
+    cut = epoch + ((start - epoch) // width + 1) * width
+    while cut < end:
+        bounds.append(cut)
+        cut += width
+    bounds.append(end)
+
+    return [
+        Window(ticker, window_start, window_end)
+        for ticker in dict.fromkeys(tickers)
+        for window_start, window_end in zip(bounds[:-1], bounds[1:])
+        if window_start < window_end
+    ]
+
+def yahoo_fetch(ticker, start, end, interval="1m"):
+    """
+    Barras de un ticker en [start, end) con yf.Ticker (sin el estado global de yf.download)
+    raise_errors: sin él, un límite de peticiones o un fallo de red llegan como un DataFrame vacío
+    """
+    import yfinance as yf
+
+    return yf.Ticker(ticker).history(start=start, end=end, interval=interval, actions=False, raise_errors=True)
+
+def has_trading_session(start, end):
+    """
+    Si [start, end) se solapa con alguna sesión regular (9:30-16:00 de Nueva York, de lunes
+    a viernes). Los festivos no se conocen: cuentan como días con sesión
+    """
+    start, end = _utc(start), _utc(end)
+    local_start = start.tz_convert(MARKET_TZ)
+    local_end = end.tz_convert(MARKET_TZ)
+    for day in pd.date_range(local_start.tz_localize(None).normalize(), local_end.tz_localize(None).normalize(), freq="D"):
+        if day.dayofweek >= 5:
+            continue
+        # Hora local de apertura y cierre (también los días de cambio de horario)
+        open_ = (day + MARKET_OPEN).tz_localize(MARKET_TZ)
+        close = (day + MARKET_CLOSE).tz_localize(MARKET_TZ)
+        if open_ < local_end and close > local_start:
+            return True
+    return False
+
+class BackfillCheckpoint:
+    """Ventanas ya guardadas (SQLite); solo la usa el hilo principal de run_backfill"""
+
+    def __init__(self, path=CHECKPOINT_PATH):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _key(window):
+        return window.ticker, window.start.isoformat(), window.end.isoformat()
+
+    def completed(self):
+        """Claves (ticker, inicio, fin) de las ventanas terminadas"""
+        return set(self._conn.execute("SELECT ticker, inicio, fin FROM ventanas").fetchall())
+
+    def is_done(self, window, completed=None):
+        return self._key(window) in (completed if completed is not None else self.completed())
+
+    def mark_done(self, window, rows, rejected):
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ventanas (ticker, inicio, fin, filas, rechazadas, completada) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (*self._key(window), rows, rejected, datetime.now(timezone.utc).isoformat())
+            )
+
+    def totals(self):
+        """(ventanas, filas, rechazadas) registradas"""
+        count, rows, rejected = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(filas), 0), COALESCE(SUM(rechazadas), 0) FROM ventanas"
+        ).fetchone()
+        return count, rows, rejected
+
+    def reset(self):
+        with self._conn:
+            self._conn.execute("DELETE FROM ventanas")
+
+    def close(self):
+        self._conn.close()
+
+def fetch_window(fetch, window, retries=2, backoff_s=1.0):
+    """
+    Descarga y normaliza una ventana (en un hilo del pool), con reintentos y backoff
+    Una respuesta vacía solo vale para ventanas sin sesiones de mercado (fines de semana,
+    noches); si no, la ventana falla y queda pendiente para la siguiente ejecución
+    Devuelve (limpio dentro de [inicio, fin), filas rechazadas)
+    """
+    for attempt in range(retries + 1):
+        try:
+            raw = fetch(window.ticker, window.start, window.end)
+            break
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff_s * 2 ** attempt)
+
+    if raw is None or raw.empty:
+        if has_trading_session(window.start, window.end):
+            # Sin barras en una ventana con sesiones: respuesta incompleta, no se da por hecha
+            raise ValueError("la fuente no devolvió barras para una ventana con sesiones de mercado")
+        return pd.DataFrame(), 0
+
+    clean, rejected = normalize_download(raw, window.ticker)
+    # Las fuentes pueden devolver la barra de `fin` o barras previas: solo [inicio, fin)
+    in_window = (clean["timestamp"] >= window.start) & (clean["timestamp"] < window.end)
+    return clean[in_window].reset_index(drop=True), len(rejected)
+
+def run_backfill(windows, fetch, send, checkpoint, workers=4, batch_size=DEFAULT_WRITE_BATCH,
+                 send_rollups=None, retries=2, progress=None):
+    """
+    Ejecuta las ventanas pendientes: descarga en `workers` hilos y escritura en lote en el
+    hilo principal con send(filas), que lanza si falla. Cada ventana se registra en el
+    checkpoint solo después de guardarse entera
+
+    - Como mucho 2 * workers ventanas descargadas a la espera de escribirse (memoria acotada)
+    - Una ventana cuya descarga falla se anota y se reintenta en la siguiente ejecución
+    - Un fallo de escritura detiene el relleno (la base de datos no responde): lo ya
+      registrado no se repite al reanudar
+    - `send_rollups(filas)` (opcional) guarda los agregados completos de cada ventana
+    - `progress(stats)` se llama tras cada ventana
+
+    Devuelve las estadísticas: ventanas, omitidas, completadas, fallidas, filas,
+    rechazadas, segundos y error (de escritura, o None)
+    """
+    completed = checkpoint.completed()
+    pending = [window for window in windows if not checkpoint.is_done(window, completed)]
+
+    stats = {
+        "ventanas": len(windows),
+        "omitidas": len(windows) - len(pending),
+        "completadas": 0,
+        "fallidas": [],
+        "filas": 0,
+        "rechazadas": 0,
+        "segundos": 0.0,
+        "error": None
+    }
+    started = time.perf_counter()
+    queue = iter(pending)
+    in_flight = {}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="relleno") as pool:
+        def submit():
+            window = next(queue, None)
+            if window is not None:
+                in_flight[pool.submit(fetch_window, fetch, window, retries)] = window
+
+        for _ in range(2 * workers):
+            submit()
+
+        try:
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    window = in_flight.pop(future)
+                    try:
+                        clean, rejected = future.result()
+                    except Exception as e:
+                        stats["fallidas"].append((window, f"{type(e).__name__}: {e}"))
+                    else:
+                        rows = json_rows(clean) if not clean.empty else []
+                        for offset in range(0, len(rows), batch_size):
+                            send(rows[offset:offset + batch_size])
+                        if send_rollups is not None and not clean.empty:
+                            send_rollups(complete_rollup_rows(clean, window.start, window.end))
+
+                        checkpoint.mark_done(window, len(rows), rejected)
+                        stats["completadas"] += 1
+                        stats["filas"] += len(rows)
+                        stats["rechazadas"] += rejected
+
+                    stats["segundos"] = time.perf_counter() - started
+                    if progress is not None:
+                        progress(stats)
+                    submit()
+        except Exception as e:
+            stats["error"] = f"Error al guardar el relleno: {str(e)}"
+            for future in in_flight:
+                future.cancel()
+
+    stats["segundos"] = time.perf_counter() - started
+    return stats
+
+def format_progress(stats):
+    """Una línea de progreso: ventanas hechas, filas, rendimiento y tiempo restante estimado"""
+    total = stats["ventanas"] - stats["omitidas"]
+    if total == 0:
+        return f"[{0:>6,}/0] {stats['omitidas']:,} ventanas ya estaban en el checkpoint: nada pendiente"
+
+    done = stats["completadas"] + len(stats["fallidas"])
+    seconds = stats["segundos"] or 1e-9
+    rate = done / seconds
+    if done == total:
+        remaining = "terminado"
+    elif rate:
+        remaining = f"quedan {(total - done) / rate:,.0f}s"
+    else:
+        remaining = "calculando el tiempo restante"
+    return (f"[{done:>6,}/{total:,}] {done / total:6.1%} de las ventanas · "
+            f"{stats['filas']:,} filas · {stats['filas'] / seconds:,.0f} filas/s · "
+            f"{rate:.1f} ventanas/s · {remaining}"
+            + (f" · {len(stats['fallidas'])} fallidas" if stats["fallidas"] else ""))
@@ -0,0 +1,230 @@
+"""
+Spool local de escritura anticipada (SQLite) entre la ingesta y Supabase
+
+La ingesta solo añade las barras al spool (una transacción local, sin red) y sigue;
+un flusher las envía a Supabase en lotes grandes cuando la base de datos responde.
+
+- Duradero: cada append es una transacción confirmada en disco (modo WAL)
+- Sin duplicados: UNIQUE(ticker, timestamp) en el spool y upsert que ignora duplicados
+  en Supabase, así que reenviar un lote tras un fallo o un reinicio es inofensivo
+- Reanudable: las filas solo se marcan como confirmadas después de que Supabase acepta
+  el lote; tras un corte, el flusher continúa por la primera fila sin confirmar
+- Compactación: las filas confirmadas se borran y el archivo se recorta de forma incremental
+"""
+import os
+import sqlite3
+import threading
+import time
+
+SPOOL_PATH = os.getenv(
+    "INGESTA_SPOOL_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ingesta_spool.sqlite3")
+)
+
+# Filas por lote enviado a Supabase
+DEFAULT_FLUSH_BATCH = 5000
+
+SPOOL_COLUMNS = ["ticker", "timestamp", "open", "high", "low", "close", "volume"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticker TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    open REAL NOT NULL,
+    high REAL NOT NULL,
+    low REAL NOT NULL,
+    close REAL NOT NULL,
+    volume INTEGER NOT NULL,
+    acked INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (ticker, timestamp)
+);
+CREATE INDEX IF NOT EXISTS spool_pendientes ON spool (acked, seq);
+"""
+
+def supabase_sender(supabase, table="apple_stock_data", on_conflict="ticker,timestamp"):
+    """Envío de un lote con el cliente de supabase-py (lanza excepción si falla)"""
+    def send(rows):
+        supabase.table(table).upsert(rows, on_conflict=on_conflict, ignore_duplicates=True).execute()
+    return send
+
+def writer_sender(writer):
+    """Envío de un lote con escritor_async.AsyncSupabaseWriter (lanza excepción si algún sublote falla)"""
+    def send(rows):
+        errors = [result["error"] for result in writer.write_records(rows) if result["error"]]
+        if errors:
+            raise RuntimeError(errors[0])
+    return send
+
+class WriteSpool:
+    """
+    Cola duradera de barras pendientes de guardar en Supabase
+    Una conexión SQLite por hilo; la ingesta y el flusher pueden trabajar a la vez
+    """
+
+    def __init__(self, path=SPOOL_PATH, batch_size=DEFAULT_FLUSH_BATCH):
+        self.path = path
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._flush_lock = threading.Lock()
+
+        self.stats = {"anadidas": 0, "duplicadas": 0, "enviadas": 0, "lotes": 0, "fallos": 0, "compactadas": 0}
+
+        conn = self._conn()
+        with conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            # auto_vacuum debe fijarse antes de crear las tablas para poder recortar el archivo
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, records):
+        """
+        Añade filas (DataFrame con SPOOL_COLUMNS o lista de dicts) en una sola transacción
+        Las barras ya presentes en el spool se ignoran. Devuelve las filas nuevas
+        """
+        if hasattr(records, "itertuples"):
+            rows = records[SPOOL_COLUMNS].itertuples(index=False, name=None)
+        else:
+            rows = (tuple(row[column] for column in SPOOL_COLUMNS) for row in records)
+        rows = [
+            (ticker, timestamp, float(open_), float(high), float(low), float(close), int(volume))
+            for ticker, timestamp, open_, high, low, close, volume in rows
+        ]
+
+        conn = self._conn()
+        with conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO spool (ticker, timestamp, open, high, low, close, volume) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            added = conn.total_changes - before
+
+        self.stats["anadidas"] += added
+        self.stats["duplicadas"] += len(rows) - added
+        return added
+
+    def pending_count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM spool WHERE acked = 0").fetchone()[0]
+
+    def _next_batch(self, conn, after_seq):
+        return conn.execute(
+            "SELECT seq, ticker, timestamp, open, high, low, close, volume FROM spool "
+            "WHERE acked = 0 AND seq > ? ORDER BY seq LIMIT ?",
+            (after_seq, self.batch_size)
+        ).fetchall()
+
+    def flush(self, send, max_batches=None):
+        """
+        Envía las filas pendientes en lotes de batch_size con `send(filas)` (que lanza si falla)
+        y marca cada lote como confirmado solo después de que se acepte. Se detiene en el
+        primer fallo (las filas siguen pendientes). Devuelve (filas enviadas, error o None)
+        """
+        with self._flush_lock:
+            conn = self._conn()
+            sent = 0
+            last_seq = 0
+            batches = 0
+
+            while max_batches is None or batches < max_batches:
+                batch = self._next_batch(conn, last_seq)
+                if not batch:
+                    break
+
+                rows = [dict(zip(SPOOL_COLUMNS, row[1:])) for row in batch]
+                try:
+                    send(rows)
+                except Exception as e:
+                    self.stats["fallos"] += 1
+                    return sent, f"Error al vaciar el spool: {str(e)}"
+
+                first_seq, last_seq = batch[0][0], batch[-1][0]
+                with conn:
+                    conn.execute("UPDATE spool SET acked = 1 WHERE acked = 0 AND seq BETWEEN ? AND ?",
+                                 (first_seq, last_seq))
+                sent += len(rows)
+                batches += 1
+                self.stats["enviadas"] += len(rows)
+                self.stats["lotes"] += 1
+
+            return sent, None
+
+    def compact(self):
+        """Borra las filas ya confirmadas y devuelve al sistema las páginas libres del archivo"""
+        conn = self._conn()
+        with conn:
+            deleted = conn.execute("DELETE FROM spool WHERE acked = 1").rowcount
+        if deleted:
+            # executescript ejecuta el pragma hasta el final (execute() solo libera una página)
+            conn.executescript("PRAGMA incremental_vacuum;")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.stats["compactadas"] += deleted
+        return deleted
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+class SpoolFlusher:
+    """
+    Hilo que vacía el spool cada `interval_s` segundos (o antes, con notify())
+    La ingesta no espera a Supabase: solo añade al spool y avisa al flusher
+    """
+
+    def __init__(self, spool, send, interval_s=5.0, compact_every=10):
+        self.spool = spool
+        self.send = send
+        self.interval_s = interval_s
+        self.compact_every = compact_every
+
+        self.last_error = None
+        self.last_flush = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="spool-flusher", daemon=True)
+        self._thread.start()
+        return self
+
+    def notify(self):
+        self._wake.set()
+
+    def _run(self):
+        rounds = 0
+        while not self._stop.is_set():
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+
+            _, self.last_error = self.spool.flush(self.send)
+            self.last_flush = time.time()
+            rounds += 1
+            if self.last_error is None and rounds % self.compact_every == 0:
+                self.spool.compact()
+
+        self.spool.close()
+
+    def stop(self, drain=True):
+        """Detiene el hilo; con drain=True hace un último vaciado antes de salir"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        if drain:
+            _, self.last_error = self.spool.flush(self.send)
+            if self.last_error is None:
+                self.spool.compact()
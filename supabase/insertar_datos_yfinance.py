@@ -1,35 +1,176 @@
-import requests
-import yfinance as yf
-from datetime import datetime
-
-# Supabase config
-SUPABASE_URL = "https://hgsutzzwbssbqfibrnyw.supabase.co/rest/v1/apple_stock_data"
-API_KEY = "sb_publishable_EUe5TZWME9W4V_gLcmhubA_yqxEnOpp"
-
-headers = {
-    "apikey": API_KEY,
-    "Authorization": f"Bearer {API_KEY}",
-    "Content-Type": "application/json"
-}
-
-# Descargar datos en tiempo real de AAPL (último minuto)
-data = yf.download(tickers='AAPL', period='1d', interval='1m')
-
-# Tomar solo el último registro
-ultimo_dato = data.tail(1)
-
-# Convertir a JSON y enviar a Supabase
-for index, row in ultimo_dato.iterrows():
-    data_row = {
-        "ticker": "AAPL",
-        "timestamp": index.isoformat(),
-        "open": float(row["Open"]),
-        "high": float(row["High"]),
-        "low": float(row["Low"]),
-        "close": float(row["Close"]),
-        "volume": int(row["Volume"])
+"""
+Worker de ingesta independiente del dashboard
+
+Descarga las barras de 1 minuto de Yahoo Finance para toda la lista de tickers
+y las inserta en Supabase una vez por minuto (alineado al inicio de cada minuto).
+Solo se piden las barras posteriores a la última guardada de cada ticker, así que
+los huecos (worker detenido, reinicios) se rellenan solos. El dashboard solo lee.
+
+Las barras nuevas se guardan primero en un spool local (SQLite) y un hilo las envía
+a Supabase en lotes grandes: si Supabase está lento o caído, la ingesta sigue y las
+barras se envían cuando vuelva (también tras reiniciar el worker).
+
+Uso:
+    python supabase/insertar_datos_yfinance.py            # bucle continuo
+    python supabase/insertar_datos_yfinance.py --once     # un solo ciclo
+    python supabase/insertar_datos_yfinance.py --tickers AAPL,MSFT,NVDA
+    python supabase/insertar_datos_yfinance.py --escritor-async --en-vuelo 8   # muchos tickers
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+# Permitir importar los módulos de la raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agregados import RollupStore
+from configuracion import get_supabase_client, load_environment_variables, load_tickers
+from dedup import DedupIndex
+from escritor_async import AsyncSupabaseWriter
+from spool import SpoolFlusher, WriteSpool, SPOOL_PATH, supabase_sender, writer_sender
+from ingesta import run_ingestion_cycle, write_status, STATUS_PATH
+from marcas_agua import load_high_water_marks, save_high_water_marks, MARKS_PATH
+
+def seconds_until_next_run(interval, offset, now=None):
+    """
+    Segundos hasta el próximo múltiplo de `interval` más `offset`
+    (el offset da tiempo a Yahoo para publicar la barra que acaba de cerrar)
+    """
+    now = now if now is not None else time.time()
+    next_run = (now // interval + 1) * interval + offset
+    if next_run - interval > now:
+        next_run -= interval
+    return next_run - now
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker de ingesta de Yahoo Finance hacia Supabase")
+    parser.add_argument("--tickers", default=None, help="Tickers separados por coma (por defecto TICKERS o tickers.txt)")
+    parser.add_argument("--intervalo", type=int, default=60, help="Segundos entre ciclos")
+    parser.add_argument("--offset", type=float, default=5.0, help="Segundos después del inicio del minuto")
+    parser.add_argument("--marcas", default=MARKS_PATH, help="Archivo local con la última barra por ticker")
+    parser.add_argument("--estado", default=STATUS_PATH, help="Archivo de estado para el dashboard")
+    parser.add_argument("--sin-agregados", action="store_true", help="No mantener los agregados 5m/15m/1h/1d")
+    parser.add_argument("--escritor-async", action="store_true",
+                        help="Insertar con peticiones HTTP concurrentes (pool persistente, reintentos)")
+    parser.add_argument("--en-vuelo", type=int, default=4, help="Peticiones simultáneas del escritor async")
+    parser.add_argument("--lote", type=int, default=500, help="Filas por petición del escritor async")
+    parser.add_argument("--spool", default=SPOOL_PATH, help="Archivo SQLite del spool de escritura")
+    parser.add_argument("--sin-spool", action="store_true", help="Insertar directamente en Supabase en cada ciclo")
+    parser.add_argument("--vaciado", type=float, default=5.0, help="Segundos entre vaciados del spool")
+    parser.add_argument("--sin-dedup", action="store_true", help="No usar el índice local de barras ya ingeridas")
+    parser.add_argument("--once", action="store_true", help="Ejecutar un solo ciclo y salir")
+    args = parser.parse_args()
+
+    supabase = get_supabase_client()
+    tickers = [t.strip().upper() for t in args.tickers.split(",")] if args.tickers else load_tickers()
+
+    # Marcas de agua: archivo local o, si falta, una consulta por ticker al arrancar
+    marks = load_high_water_marks(supabase, tickers, args.marcas)
+
+    # Agregados incrementales: se cargan los buckets abiertos una vez al arrancar
+    rollups = None
+    if not args.sin_agregados:
+        rollups = RollupStore()
+        try:
+            rollups.seed(supabase, tickers)
+        except Exception as e:
+            # Sin tabla stock_rollups o sin Supabase: update() lee los buckets que falten
+            print(f"⚠️ No se pudieron cargar los agregados abiertos, se empieza vacío: {e}")
+            rollups = RollupStore()
+
+    # Índice (ticker, timestamp) de las barras recientes: se siembra una vez al arrancar
+    dedup = None
+    if not args.sin_dedup:
+        try:
+            dedup = DedupIndex().seed(supabase, tickers)
+        except Exception as e:
+            # Sin Supabase al arrancar el worker sigue (spool): el upsert sobre
+            # (ticker, timestamp) descarta los duplicados que el índice vacío no detecte
+            print(f"⚠️ No se pudo sembrar el índice de duplicados, se empieza vacío: {e}")
+            dedup = DedupIndex()
+        print(f"Índice de duplicados: {dedup.key_count():,} barras en {dedup.stats['consultas_semilla']} consultas "
+              f"({dedup.memory_bytes() / 1024:,.0f} KB)")
+
+    # Escritor async: una sola conexión persistente para todos los ciclos
+    writer = None
+    if args.escritor_async:
+        url, key = load_environment_variables()
+        writer = AsyncSupabaseWriter(url, key, batch_size=args.lote, max_in_flight=args.en_vuelo)
+
+    status = {
+        "pid": os.getpid(),
+        "tickers": tickers,
+        "intervalo_s": args.intervalo,
+        "inicio": datetime.now(timezone.utc).isoformat(),
+        "ciclos": 0,
+        "ultimo_exito": None,
+        "ultima_barra": None
     }
 
-    response = requests.post(SUPABASE_URL, json=data_row, headers=headers)
-    print(f"Status: {response.status_code}")
-    print(response.text)
+    # Spool local: el ciclo solo añade barras; el flusher las envía (y reanuda lo pendiente)
+    spool, flusher = None, None
+    if not args.sin_spool:
+        spool = WriteSpool(args.spool)
+        send = writer_sender(writer) if writer is not None else supabase_sender(supabase)
+        flusher = SpoolFlusher(spool, send, interval_s=args.vaciado).start()
+        flusher.notify()
+
+    try:
+        run_worker(args, supabase, tickers, marks, rollups, writer, spool, flusher, dedup, status)
+    finally:
+        if flusher is not None:
+            flusher.stop(drain=True)
+            if flusher.last_error:
+                print(f"⚠️ Quedan {spool.pending_count()} barras en el spool: {flusher.last_error}")
+        if writer is not None:
+            writer.close()
+
+def run_worker(args, supabase, tickers, marks, rollups, writer, spool, flusher, dedup, status):
+    while True:
+        if not args.once:
+            time.sleep(seconds_until_next_run(args.intervalo, args.offset))
+
+        result = run_ingestion_cycle(
+            supabase, tickers=tickers, marks=marks, rollups=rollups,
+            writer=writer if spool is None else None, spool=spool, dedup=dedup
+        )
+        if flusher is not None:
+            flusher.notify()
+        if result["error"] is None:
+            save_high_water_marks(marks, args.marcas)
+
+        status["ciclos"] += 1
+        status["ultimo_ciclo"] = datetime.now(timezone.utc).isoformat()
+        status["ultimo_resultado"] = result
+        status["error"] = result["error"]
+        if flusher is not None:
+            status["spool_pendientes"] = result.get("spool_pendientes", 0)
+            status["error_spool"] = flusher.last_error
+        if result["error"] is None:
+            status["ultimo_exito"] = status["ultimo_ciclo"]
+            status["ultima_barra"] = result["ultima_barra"] or status["ultima_barra"]
+
+        write_status(status, args.estado)
+        print(f"[{status['ultimo_ciclo']}] {len(tickers)} tickers: "
+              f"{result['aceptados']} aceptados, {result['rechazados']} rechazados "
+              f"en {result['duracion_s']}s (descarga {result.get('descarga_s', 0)}s, "
+              f"inserción {result.get('insercion_s', 0)}s)"
+              + (f", {result['duplicadas']} duplicadas descartadas" if result.get("duplicadas") else "")
+              + (f" - {result['error']}" if result["error"] else ""))
+        if result.get("motivos_rechazo"):
+            print(f"   rechazos: {result['motivos_rechazo']}")
+        if writer is not None:
+            print(f"   escritor async: {writer.rows_per_second():,.0f} filas/s acumulado, "
+                  f"{writer.stats['reintentos']} reintentos, {writer.stats['filas_fallidas']} filas fallidas")
+
+        # El ciclo completo debe caber holgadamente dentro del intervalo de la barra
+        if result["duracion_s"] > args.intervalo / 2:
+            print(f"⚠️ El ciclo tardó {result['duracion_s']}s, más de la mitad del intervalo de {args.intervalo}s")
+
+        if args.once:
+            break
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Relleno histórico de barras de 1 minuto en Supabase (backfill)
+
+Divide el rango pedido en ventanas por ticker, las descarga en paralelo y las guarda
+con upserts en lote. Cada ventana terminada queda registrada en un checkpoint local:
+si el proceso se corta, volver a lanzar el mismo comando continúa donde se quedó.
+
+Uso:
+    python supabase/rellenar_historico.py --tickers AAPL,MSFT --desde 2024-01-01
+    python supabase/rellenar_historico.py --hilos 8 --escritor-async --agregados
+    python supabase/rellenar_historico.py --fuente sintetica --simulacro --desde 2024-01-01 --hasta 2024-03-01
+"""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+# Permitir importar los módulos de la raíz del proyecto
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from agregados import ROLLUP_TABLE
+from configuracion import get_supabase_client, load_environment_variables, load_tickers
+from escritor_async import AsyncSupabaseWriter
+from relleno_historico import (
+    BackfillCheckpoint, CHECKPOINT_PATH, DEFAULT_WRITE_BATCH, YAHOO_1M_LOOKBACK,
+    format_progress, plan_windows, run_backfill, yahoo_fetch
+)
+from spool import supabase_sender, writer_sender
+
+def synthetic_fetch():
+    """Fuente sintética (benchmarks/sinteticos.py): sin red, mismas formas que yfinance"""
+    sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+    from sinteticos import FakeYahoo
+
+    source = FakeYahoo()
+    return lambda ticker, start, end: source.download(ticker, start=start, end=end)
+
+def progress_printer(every_s=1.0):
+    """Imprime el progreso como mucho una vez por `every_s` segundos (en la misma línea si es una terminal)"""
+    last = {"segundos": float("-inf")}
+    end = "\r" if sys.stdout.isatty() else "\n"
+
+    def report(stats):
+        if stats["segundos"] - last["segundos"] >= every_s:
+            last["segundos"] = stats["segundos"]
+            print(format_progress(stats), end=end, flush=True)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Relleno histórico de barras de 1 minuto hacia Supabase")
+    parser.add_argument("--tickers", default=None, help="Tickers separados por coma (por defecto TICKERS o tickers.txt)")
+    parser.add_argument("--desde", default=None,
+                        help="Inicio del rango (por defecto, el primer día completo de los 30 que sirve Yahoo; "
+                             "para reanudar otro día, pasa el mismo --desde/--hasta)")
+    parser.add_argument("--hasta", default=None, help="Fin del rango, excluido (por defecto, ahora)")
+    parser.add_argument("--ventana-dias", type=float, default=7, help="Días por ventana descargada")
+    parser.add_argument("--hilos", type=int, default=4, help="Ventanas descargándose a la vez")
+    parser.add_argument("--lote", type=int, default=DEFAULT_WRITE_BATCH, help="Filas por escritura en lote")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH, help="Archivo SQLite con las ventanas terminadas")
+    parser.add_argument("--reiniciar", action="store_true", help="Olvidar el checkpoint y rellenar todo de nuevo")
+    parser.add_argument("--fuente", choices=["yahoo", "sintetica"], default="yahoo", help="Origen de las barras")
+    parser.add_argument("--simulacro", action="store_true", help="Descargar y normalizar sin escribir en Supabase")
+    parser.add_argument("--escritor-async", action="store_true",
+                        help="Escribir con peticiones HTTP concurrentes (pool persistente, reintentos)")
+    parser.add_argument("--en-vuelo", type=int, default=4, help="Peticiones simultáneas del escritor async")
+    parser.add_argument("--agregados", action="store_true", help="Guardar también los agregados 5m/15m/1h/1d")
+    args = parser.parse_args()
+
+    tickers = [t.strip().upper() for t in args.tickers.split(",")] if args.tickers else load_tickers()
+    now = pd.Timestamp.now(tz="UTC").floor("min")
+    end = pd.Timestamp(args.hasta, tz="UTC") if args.hasta else now
+    # Inicio por defecto redondeado al día: las ventanas (y sus claves en el checkpoint) son
+    # las mismas en todas las ejecuciones del mismo día, así que relanzar el comando reanuda
+    oldest = (now - YAHOO_1M_LOOKBACK).ceil("D")
+    start = pd.Timestamp(args.desde, tz="UTC") if args.desde else oldest
+
+    if args.fuente == "yahoo":
+        fetch = yahoo_fetch
+        if start < oldest:
+            # Fuera de ese margen Yahoo devuelve ventanas vacías que quedarían como terminadas
+            print(f"⚠️ Yahoo solo sirve barras de 1 minuto de los últimos {YAHOO_1M_LOOKBACK.days} días: "
+                  f"el relleno empieza en {oldest:%Y-%m-%d %H:%M} UTC")
+            start = oldest
+    else:
+        fetch = synthetic_fetch()
+
+    windows = plan_windows(tickers, start, end, pd.Timedelta(days=args.ventana_dias))
+
+    writer = None
+    send_rollups = None
+    if args.simulacro:
+        send = lambda rows: None
+    else:
+        supabase = get_supabase_client()
+        if args.escritor_async:
+            url, key = load_environment_variables()
+            writer = AsyncSupabaseWriter(url, key, max_in_flight=args.en_vuelo)
+            send = writer_sender(writer)
+        else:
+            send = supabase_sender(supabase)
+        if args.agregados:
+            send_rollups = supabase_sender(supabase, table=ROLLUP_TABLE, on_conflict="ticker,resolution,bucket")
+
+    checkpoint = BackfillCheckpoint(args.checkpoint)
+    if args.reiniciar:
+        checkpoint.reset()
+
+    print(f"Relleno de {len(tickers)} tickers, {start:%Y-%m-%d %H:%M} → {end:%Y-%m-%d %H:%M} UTC: "
+          f"{len(windows):,} ventanas de {args.ventana_dias:g} días, {args.hilos} hilos")
+
+    try:
+        stats = run_backfill(windows, fetch, send, checkpoint, workers=args.hilos, batch_size=args.lote,
+                             send_rollups=send_rollups, progress=progress_printer())
+    finally:
+        if writer is not None:
+            writer.close()
+
+    print(format_progress(stats))
+    print(f"{stats['completadas']:,} ventanas guardadas, {stats['omitidas']:,} ya estaban en el checkpoint, "
+          f"{stats['filas']:,} filas ({stats['rechazadas']:,} rechazadas) en {stats['segundos']:.1f}s")
+    for window, error in stats["fallidas"][:10]:
+        print(f"⚠️ {window.ticker} {window.start:%Y-%m-%d} → {window.end:%Y-%m-%d}: {error}")
+    if stats["fallidas"]:
+        print(f"⚠️ {len(stats['fallidas'])} ventanas fallidas: vuelve a lanzar el comando para reintentarlas")
+    if stats["error"]:
+        print(f"❌ {stats['error']}. Vuelve a lanzar el comando para continuar")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()